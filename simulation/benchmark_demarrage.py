@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Mesure du démarrage d'un processus de simulation : import du module,
+compilation des noyaux (ou chargement du cache disque) et premier tour
+
+Chaque mesure est faite dans un processus neuf, d'abord avec un cache numba
+vide puis avec le cache du module.
+
+Usage : python benchmark_demarrage.py [--repetitions N]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+CHEMIN_MODULE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "modele_simulation_silesia_hybridation_streamlit.py")
+
+
+def mesurer():
+    """Durées d'import, de compilation et du premier tour dans ce processus"""
+    from pool_simulation import charger_module
+    
+    debut = time.perf_counter()
+    module = charger_module(CHEMIN_MODULE)
+    duree_import = time.perf_counter() - debut
+    
+    duree_compilation = module.warmup()
+    
+    debut = time.perf_counter()
+    module.simuler_vehicule_optimise(module.donnees_piste().longueur, module.bornes_vitesse,
+                                     temps_max=module.temps_max, moteur_elec=True, plot=False)
+    duree_tour = time.perf_counter() - debut
+    
+    return {'import': duree_import, 'compilation': duree_compilation, 'premier_tour': duree_tour}
+
+def mesurer_processus(cache_dir=None):
+    """Lance mesurer() dans un processus neuf (cache numba dans cache_dir s'il est donné)"""
+    env = dict(os.environ)
+    if cache_dir is not None:
+        env['NUMBA_CACHE_DIR'] = cache_dir
+    sortie = subprocess.run([sys.executable, os.path.abspath(__file__), '--mesure'],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(sortie.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repetitions', type=int, default=2, help="mesures avec le cache du module")
+    parser.add_argument('--mesure', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.mesure:
+        print(json.dumps(mesurer()))
+        return
+    
+    with tempfile.TemporaryDirectory() as cache_vide:
+        mesures = [('cache vide', mesurer_processus(cache_vide))]
+    mesures += [(f'avec cache #{i + 1}', mesurer_processus()) for i in range(args.repetitions)]
+    
+    print(f"{'':<16}{'import':>10}{'compilation':>14}{'premier tour':>15}{'total':>10}")
+    for nom, m in mesures:
+        total = m['import'] + m['compilation'] + m['premier_tour']
+        print(f"{nom:<16}{m['import']:>9.2f}s{m['compilation']:>13.2f}s{m['premier_tour']:>14.2f}s{total:>9.2f}s")
+
+if __name__ == "__main__":
+    main()
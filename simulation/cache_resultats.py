@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Cache persistant des résultats de simulation
+
+Deux niveaux : un LRU en mémoire limité en octets, devant un stockage sur
+disque (index sqlite et un fichier .npz par résultat) que plusieurs
+processus ou plusieurs postes peuvent partager. La clé est l'empreinte
+canonique de la stratégie normalisée, de la configuration et de
+l'empreinte des données d'entrée.
+
+Le niveau disque ne contient que des données (tableau des canaux, noms des
+canaux, métriques et configuration en JSON), relues sans pickle : un
+dossier partagé ne peut pas faire exécuter de code à ses lecteurs.
+"""
+
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+from resultat_simulation import SimulationResult
+
+# Taille maximale du niveau mémoire par défaut (octets)
+BUDGET_MEMOIRE = 256 * 1024 ** 2
+
+# Taille comptée en plus des canaux pour les métriques et la configuration
+# d'un résultat du niveau mémoire (octets)
+TAILLE_METADONNEES = 1024
+
+# Paramètres sans effet sur le résultat, exclus de la clé
+CLES_IGNOREES = ('plot', 'debug_mode')
+
+
+def _normaliser(valeur):
+    """Valeur JSON canonique (entiers et flottants confondus, tuples en listes)"""
+    if isinstance(valeur, dict):
+        return {str(cle): _normaliser(v) for cle, v in valeur.items()}
+    if isinstance(valeur, (list, tuple)):
+        return [_normaliser(v) for v in valeur]
+    if isinstance(valeur, bool) or valeur is None or isinstance(valeur, str):
+        return valeur
+    if hasattr(valeur, 'tolist'):  # tableau ou scalaire numpy
+        return _normaliser(valeur.tolist())
+    return float(valeur)
+
+def cle_simulation(bornes_vitesse, config, empreinte_donnees):
+    """Empreinte SHA-256 d'une simulation (stratégie, configuration, données)"""
+    config = {cle: valeur for cle, valeur in config.items() if cle not in CLES_IGNOREES}
+    description = json.dumps(
+        [_normaliser(bornes_vitesse), _normaliser(config), empreinte_donnees],
+        sort_keys=True, separators=(',', ':')
+    )
+    return hashlib.sha256(description.encode()).hexdigest()
+
+def serialiser(resultat):
+    """Fichier .npz (octets) d'un SimulationResult : canaux, noms et métadonnées JSON"""
+    metadonnees = json.dumps({'metriques': resultat.metriques, 'config': resultat.config},
+                             default=lambda v: v.tolist() if hasattr(v, 'tolist') else str(v))
+    tampon = io.BytesIO()
+    np.savez(tampon, donnees=resultat.donnees, canaux=np.array(resultat.canaux, dtype=str),
+             metadonnees=np.array(metadonnees))
+    return tampon.getvalue()
+
+def deserialiser(blob):
+    """SimulationResult relu depuis les octets de serialiser() (sans pickle)"""
+    with np.load(io.BytesIO(blob), allow_pickle=False) as archive:
+        metadonnees = json.loads(str(archive['metadonnees']))
+        donnees = archive['donnees']
+        canaux = [str(nom) for nom in archive['canaux']]
+    return SimulationResult(donnees, metadonnees['metriques'], metadonnees['config'], canaux)
+
+class CacheResultats:
+    """
+    Cache à deux niveaux (mémoire puis disque) de SimulationResult
+
+    Le niveau mémoire, propre au processus, garde les objets eux-mêmes :
+    une lecture rend le résultat en cache sans copie (canaux en lecture
+    seule ; métriques et configuration ne doivent pas être modifiées). Le
+    niveau disque est au format de serialiser().
+    """
+
+    def __init__(self, dossier, budget_memoire=BUDGET_MEMOIRE, budget_disque=None):
+        """
+        Args:
+            dossier: dossier du niveau disque (créé au besoin)
+            budget_memoire: taille maximale du niveau mémoire en octets
+            budget_disque: taille maximale du niveau disque en octets (illimitée par défaut)
+        """
+        self.dossier = dossier
+        self.budget_memoire = budget_memoire
+        self.budget_disque = budget_disque
+        self._memoire = OrderedDict()
+        self._taille_memoire = 0
+        self._verrou = threading.Lock()
+        self.succes_memoire = 0
+        self.succes_disque = 0
+        self.echecs = 0
+
+        os.makedirs(os.path.join(dossier, 'blobs'), exist_ok=True)
+        with self._connexion() as connexion:
+            connexion.execute(
+                "CREATE TABLE IF NOT EXISTS resultats ("
+                "cle TEXT PRIMARY KEY, taille INTEGER NOT NULL, "
+                "cree REAL NOT NULL, acces REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connexion(self):
+        """Connexion à l'index, validée puis fermée en sortie de bloc"""
+        connexion = sqlite3.connect(os.path.join(self.dossier, 'index.sqlite'), timeout=30)
+        try:
+            connexion.execute("PRAGMA journal_mode=WAL")
+            with connexion:
+                yield connexion
+        finally:
+            connexion.close()
+
+    def _chemin(self, cle):
+        return os.path.join(self.dossier, 'blobs', cle[:2], f"{cle}.npz")
+
+    @staticmethod
+    def _taille(resultat):
+        return resultat.nbytes + TAILLE_METADONNEES
+
+    def _garder_en_memoire(self, cle, resultat):
+        with self._verrou:
+            if cle in self._memoire:
+                self._memoire.move_to_end(cle)
+                return
+            if self._taille(resultat) > self.budget_memoire:
+                return
+            self._memoire[cle] = resultat
+            self._taille_memoire += self._taille(resultat)
+            while self._taille_memoire > self.budget_memoire:
+                _, ancien = self._memoire.popitem(last=False)
+                self._taille_memoire -= self._taille(ancien)
+
+    def lire(self, cle):
+        """Résultat associé à `cle`, ou None"""
+        with self._verrou:
+            resultat = self._memoire.get(cle)
+            if resultat is not None:
+                self._memoire.move_to_end(cle)
+                self.succes_memoire += 1
+        if resultat is not None:
+            return resultat
+
+        try:
+            with open(self._chemin(cle), 'rb') as fichier:
+                resultat = deserialiser(fichier.read())
+        except FileNotFoundError:
+            self.echecs += 1
+            return None
+        except (ValueError, KeyError, OSError, zipfile.BadZipFile):
+            # Fichier illisible ou d'un autre format : traité comme absent
+            self.echecs += 1
+            return None
+        with self._connexion() as connexion:
+            connexion.execute("UPDATE resultats SET acces = ? WHERE cle = ?", (time.time(), cle))
+        self.succes_disque += 1
+        self._garder_en_memoire(cle, resultat)
+        return resultat
+
+    def ecrire(self, cle, resultat):
+        """Enregistre `resultat` (SimulationResult) dans les deux niveaux"""
+        self._garder_en_memoire(cle, resultat)
+        blob = serialiser(resultat)
+
+        chemin = self._chemin(cle)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        # Écriture atomique : un lecteur concurrent ne voit jamais de fichier partiel
+        descripteur, temporaire = tempfile.mkstemp(dir=os.path.dirname(chemin), suffix='.tmp')
+        with os.fdopen(descripteur, 'wb') as fichier:
+            fichier.write(blob)
+        os.replace(temporaire, chemin)
+        maintenant = time.time()
+        with self._connexion() as connexion:
+            connexion.execute(
+                "INSERT OR REPLACE INTO resultats (cle, taille, cree, acces) VALUES (?, ?, ?, ?)",
+                (cle, len(blob), maintenant, maintenant)
+            )
+        if self.budget_disque is not None:
+            self.nettoyer(self.budget_disque)
+
+    def nettoyer(self, budget_disque):
+        """Supprime du disque les résultats les moins récemment lus au-delà de `budget_disque` octets"""
+        with self._connexion() as connexion:
+            lignes = connexion.execute("SELECT cle, taille FROM resultats ORDER BY acces DESC").fetchall()
+            total = 0
+            supprimees = []
+            for cle, taille in lignes:
+                total += taille
+                if total > budget_disque:
+                    supprimees.append(cle)
+            connexion.executemany("DELETE FROM resultats WHERE cle = ?", [(cle,) for cle in supprimees])
+        for cle in supprimees:
+            try:
+                os.remove(self._chemin(cle))
+            except FileNotFoundError:
+                pass
+        return len(supprimees)
+
+    def statistiques(self):
+        """Compteurs de lecture et occupation des deux niveaux"""
+        with self._connexion() as connexion:
+            n_disque, taille_disque = connexion.execute(
+                "SELECT COUNT(*), COALESCE(SUM(taille), 0) FROM resultats").fetchone()
+        return {
+            'succes_memoire': self.succes_memoire,
+            'succes_disque': self.succes_disque,
+            'echecs': self.echecs,
+            'n_memoire': len(self._memoire),
+            'taille_memoire': self._taille_memoire,
+            'n_disque': n_disque,
+            'taille_disque': taille_disque,
+        }
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+Export des résultats de simulation en Parquet
+
+Un tour s'écrit en un fichier Parquet compressé (une colonne par canal) dont
+le schéma porte la stratégie, la configuration, les métriques et
+l'empreinte des données d'entrée. Les lots de l'optimiseur s'ajoutent à un
+jeu de données partitionné par lot :
+
+    dossier/runs/lot=<lot>/part-<n>-<id>.parquet        une ligne par simulation
+    dossier/telemetrie/lot=<lot>/part-<n>-<id>.parquet  canaux, une ligne par échantillon
+
+La télémétrie de tous les tours d'un ajout est concaténée, repérée par la
+colonne run_id ; chaque ajout à un lot écrit ses propres fichiers (numéro
+d'ordre et suffixe aléatoire : deux ajouts simultanés ne s'écrasent pas).
+CSV et XLSX restent disponibles en formats secondaires, écrits par blocs
+sans construire de DataFrame.
+"""
+
+import json
+import os
+import time
+import uuid
+
+import numpy as np
+
+from resultat_simulation import SimulationResult
+
+# Compression des fichiers Parquet
+COMPRESSION = 'zstd'
+
+# Clé des métadonnées du schéma Parquet
+CLE_METADONNEES = b'eta_one'
+
+# Métriques stockées en colonnes de la table des simulations (les autres
+# restent dans la colonne JSON 'metriques')
+COLONNES_METRIQUES = (
+    'temps_total', 'distance_finale', 'consommation_ml', 'consommation_thermique',
+    'energie_electrique_j', 'vitesse_moyenne', 'efficacite_km_l',
+)
+
+# Lignes par bloc des écritures CSV et XLSX
+TAILLE_BLOC = 65536
+
+
+def _pyarrow():
+    """Modules pyarrow utilisés par l'export (dépendance optionnelle)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.csv
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("L'export Parquet nécessite pyarrow (pip install pyarrow)") from e
+    return pa
+
+def _json(valeur):
+    """JSON compact ; tableaux et scalaires numpy convertis en listes et nombres"""
+    return json.dumps(valeur, separators=(',', ':'), ensure_ascii=False,
+                      default=lambda v: v.tolist() if hasattr(v, 'tolist') else str(v))
+
+def metadonnees_run(resultat, empreinte_donnees=None, run_id=None):
+    """Stratégie, configuration, métriques et empreinte des données d'un résultat"""
+    config = resultat.config or {}
+    return {
+        'run_id': run_id,
+        'bornes_vitesse': config.get('bornes_vitesse'),
+        'config': config,
+        'metriques': resultat.metriques,
+        'empreinte_donnees': empreinte_donnees,
+    }
+
+def ecrire_run(resultat, chemin, empreinte_donnees=None, run_id=None):
+    """Écrit la télémétrie d'un résultat en Parquet, métadonnées dans le schéma"""
+    pa = _pyarrow()
+    table = pa.table({nom: resultat.channel(nom) for nom in resultat.canaux})
+    metadonnees = metadonnees_run(resultat, empreinte_donnees, run_id)
+    table = table.replace_schema_metadata({CLE_METADONNEES: _json(metadonnees).encode()})
+    pa.parquet.write_table(table, chemin, compression=COMPRESSION)
+    return chemin
+
+def lire_run(chemin):
+    """SimulationResult relu depuis un fichier de ecrire_run()"""
+    pa = _pyarrow()
+    table = pa.parquet.read_table(chemin)
+    metadonnees = json.loads(table.schema.metadata[CLE_METADONNEES])
+    donnees = np.vstack([table.column(nom).to_numpy() for nom in table.column_names]) \
+        if table.num_columns else np.empty((0, 0))
+    return SimulationResult(donnees, metadonnees['metriques'], metadonnees['config'], table.column_names)
+
+def exporter_csv(resultat, chemin, colonnes=None):
+    """
+    Écrit les canaux d'un résultat en CSV par blocs de TAILLE_BLOC lignes
+
+    colonnes : {canal: en-tête} (tous les canaux sous leur nom par défaut)
+    """
+    pa = _pyarrow()
+    colonnes = colonnes or {nom: nom for nom in resultat.canaux}
+    table = pa.table({entete: resultat.channel(nom) for nom, entete in colonnes.items()})
+    with pa.csv.CSVWriter(chemin, table.schema) as ecrivain:
+        for bloc in table.to_batches(max_chunksize=TAILLE_BLOC):
+            ecrivain.write_batch(bloc)
+    return chemin
+
+def exporter_xlsx(resultat, chemin, colonnes=None):
+    """Écrit les canaux d'un résultat en XLSX (classeur en écriture seule, ligne à ligne)"""
+    from openpyxl import Workbook
+
+    colonnes = colonnes or {nom: nom for nom in resultat.canaux}
+    classeur = Workbook(write_only=True)
+    feuille = classeur.create_sheet('telemetrie')
+    feuille.append(list(colonnes.values()))
+    canaux = [resultat.channel(nom) for nom in colonnes]
+    for debut in range(0, len(resultat), TAILLE_BLOC):
+        for ligne in zip(*(canal[debut:debut + TAILLE_BLOC].tolist() for canal in canaux)):
+            feuille.append(ligne)
+    classeur.save(chemin)
+    return chemin
+
+class JeuResultats:
+    """
+    Jeu de données Parquet partitionné par lot : table des simulations
+    (métadonnées et métriques) et télémétrie concaténée
+    """
+
+    def __init__(self, dossier):
+        self.dossier = dossier
+        self.pa = _pyarrow()
+        self._partitionnement = self.pa.dataset.partitioning(
+            self.pa.schema([('lot', self.pa.string())]), flavor='hive')
+
+    def _parties(self, table, lot):
+        """Fichiers Parquet déjà écrits pour `lot`"""
+        dossier = os.path.join(self.dossier, table, f'lot={lot}')
+        if not os.path.isdir(dossier):
+            return []
+        return sorted(os.path.join(dossier, nom) for nom in os.listdir(dossier)
+                      if nom.startswith('part-') and nom.endswith('.parquet'))
+
+    def _chemin(self, table, lot, partie):
+        dossier = os.path.join(self.dossier, table, f'lot={lot}')
+        os.makedirs(dossier, exist_ok=True)
+        return os.path.join(dossier, f'part-{partie}.parquet')
+
+    def ajouter_lot(self, resultats, lot=None, empreinte_donnees=None, run_ids=None):
+        """
+        Ajoute un lot de résultats (SimulationResult, échecs ignorés) ; les
+        résumés sans télémétrie n'ont qu'une ligne dans la table des
+        simulations. Un lot existant est complété par de nouveaux fichiers.
+        Retourne l'identifiant du lot.
+
+        run_ids : identifiants des résultats (par ex. les clés du cache),
+        '<lot>-<i>' par défaut, numérotés à la suite des simulations du lot
+        """
+        pa = self.pa
+        lot = lot or f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        parties = self._parties('runs', lot)
+        partie = f'{len(parties):04d}-{uuid.uuid4().hex[:8]}'
+        if run_ids is None:
+            debut = sum(pa.parquet.read_metadata(chemin).num_rows for chemin in parties)
+            run_ids = [f'{lot}-{debut + i}' for i in range(len(resultats))]
+        retenus = [(run_id, r) for run_id, r in zip(run_ids, resultats)
+                   if isinstance(r, SimulationResult)]
+
+        runs = {
+            'run_id': [run_id for run_id, _ in retenus],
+            'bornes_vitesse': [_json(r.config.get('bornes_vitesse')) for _, r in retenus],
+            'config': [_json(r.config) for _, r in retenus],
+            'empreinte_donnees': [empreinte_donnees] * len(retenus),
+            'n_echantillons': pa.array([len(r) for _, r in retenus], pa.int64()),
+        }
+        for cle in COLONNES_METRIQUES:
+            runs[cle] = pa.array([r.metriques.get(cle) for _, r in retenus], pa.float64())
+        runs['metriques'] = [_json(r.metriques) for _, r in retenus]
+        table_runs = pa.table(runs).replace_schema_metadata(
+            {CLE_METADONNEES: _json({'lot': lot, 'empreinte_donnees': empreinte_donnees}).encode()})
+        pa.parquet.write_table(table_runs, self._chemin('runs', lot, partie), compression=COMPRESSION)
+
+        telemetrie = [(run_id, r) for run_id, r in retenus if len(r)]
+        if telemetrie:
+            canaux = telemetrie[0][1].canaux
+            if any(r.canaux != canaux for _, r in telemetrie):
+                raise ValueError("Les résultats d'un lot doivent avoir les mêmes canaux")
+            longueurs = np.array([len(r) for _, r in telemetrie])
+            colonnes = {
+                'run_id': pa.DictionaryArray.from_arrays(
+                    pa.array(np.repeat(np.arange(len(telemetrie), dtype=np.int32), longueurs)),
+                    pa.array([run_id for run_id, _ in telemetrie])),
+            }
+            donnees = np.hstack([r.donnees for _, r in telemetrie])
+            for i, nom in enumerate(canaux):
+                colonnes[nom] = donnees[i]
+            pa.parquet.write_table(pa.table(colonnes), self._chemin('telemetrie', lot, partie),
+                                   compression=COMPRESSION)
+        return lot
+
+    def _jeu(self, table):
+        chemin = os.path.join(self.dossier, table)
+        if not os.path.isdir(chemin):
+            return None
+        return self.pa.dataset.dataset(chemin, format='parquet', partitioning=self._partitionnement)
+
+    def lots(self):
+        """Identifiants des lots enregistrés"""
+        chemin = os.path.join(self.dossier, 'runs')
+        if not os.path.isdir(chemin):
+            return []
+        return sorted(nom[len('lot='):] for nom in os.listdir(chemin) if nom.startswith('lot='))
+
+    def runs(self, lots=None):
+        """Table des simulations (DataFrame), limitée aux `lots` donnés"""
+        jeu = self._jeu('runs')
+        if jeu is None:
+            return None
+        filtre = None if lots is None else self.pa.dataset.field('lot').isin(list(lots))
+        return jeu.to_table(filter=filtre).to_pandas()
+
+    def telemetrie(self, run_ids=None, canaux=None, lots=None):
+        """Table pyarrow de la télémétrie, filtrée par simulation, canal et lot"""
+        jeu = self._jeu('telemetrie')
+        if jeu is None:
+            return None
+        ds = self.pa.dataset
+        filtre = None
+        if lots is not None:
+            filtre = ds.field('lot').isin(list(lots))
+        if run_ids is not None:
+            condition = ds.field('run_id').isin(list(run_ids))
+            filtre = condition if filtre is None else filtre & condition
+        colonnes = None if canaux is None else ['run_id', *canaux]
+        return jeu.to_table(columns=colonnes, filter=filtre)
+
+    def resultat(self, run_id):
+        """SimulationResult d'une simulation du jeu"""
+        runs = self._jeu('runs').to_table(filter=self.pa.dataset.field('run_id') == run_id)
+        if not runs.num_rows:
+            raise KeyError(run_id)
+        ligne = runs.slice(0, 1).to_pylist()[0]
+        metriques, config = json.loads(ligne['metriques']), json.loads(ligne['config'])
+        if not ligne['n_echantillons']:
+            return SimulationResult.resume(metriques, config)
+        table = self.telemetrie([run_id], lots=[ligne['lot']]).drop_columns(['run_id', 'lot'])
+        donnees = np.vstack([table.column(nom).to_numpy() for nom in table.column_names])
+        return SimulationResult(donnees, metriques, config, table.column_names)
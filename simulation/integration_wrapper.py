@@ -8,14 +8,40 @@ Created on Thu Jun  5 18:30:32 2025
 
 import sys
 import os
-import importlib.util
 import pandas as pd
 import numpy as np
 import json
 import traceback
-from typing import Tuple, Dict, List, Optional
+from typing import Tuple, Dict, List, Optional, Iterator, Union
 import streamlit as st
 
+from pool_simulation import PoolSimulation, charger_module
+from modele_substitution import ModelesSubstitution
+from cache_resultats import CacheResultats, cle_simulation
+from resultat_simulation import SimulationResult
+from export_resultats import JeuResultats, ecrire_run, exporter_csv, exporter_xlsx
+from registre_courses import RegistreCourses
+from rendu_graphiques import PoolRendu
+
+# Colonnes des exports CSV et XLSX de export_results (canal -> en-tête)
+EXPORT_COLUMNS = {
+    'temps': 'Temps (s)',
+    'position': 'Position (m)',
+    'vitesse': 'Vitesse (m/s)',
+    'vitesse_kmh': 'Vitesse (km/h)',
+    'regimes_moteur': 'Régime moteur (RPM)',
+    'ratios_enviolo': 'Ratio Enviolo',
+    'consommation_cumul': 'Consommation cumul (g)',
+    'energie_supercap': 'Énergie supercap (J)',
+    'joules_elec': 'Énergie élec cumul (J)',
+    'moteur_thermique_actif': 'Moteur thermique',
+    'moteur_electrique_actif': 'Moteur électrique',
+    'force_moteur': 'Force moteur (N)',
+    'force_aerodynamique': 'Force aéro (N)',
+    'force_roulement': 'Force roulement (N)',
+    'force_gravite': 'Force gravité (N)',
+}
+
 class EtaOneSimulationWrapper:
     """Wrapper pour la simulation Eta-One"""
     
@@ -28,6 +54,16 @@ class EtaOneSimulationWrapper:
         """
         self.simulation_module = None
         self.module_path = simulation_module_path
+        self.pool = None
+        # Modèles de substitution (un par jeu de conditions) alimentés par
+        # chaque tour achevé (simulé, en cache ou du registre), archivés dans
+        # le dossier du cache
+        self.surrogate = ModelesSubstitution()
+        self.surrogate_path = None
+        self.cache = None
+        self.export_dir = None
+        self.runs = None
+        self.render_pool = None
         self.load_simulation_module()
         
         # Configuration par défaut
@@ -44,8 +80,23 @@ class EtaOneSimulationWrapper:
             'coef_aero': 1.63,
             'coef_roul': 1.0,
             'plot': False,  # Désactivé pour Streamlit
-            'debug_mode': False
+            'debug_mode': False,
+            # Télémétrie : 'full' (pas acceptés), 'decimated' (toutes les
+            # record_step secondes), 'distance' (tous les record_distance
+            # mètres), 'sectors' (aux limites de secteur sectors, en mètres)
+            # ou 'summary' (grandeurs scalaires seulement)
+            'record': 'full',
+            'record_step': 0.5,
+            'record_distance': 1.0,
+            'sectors': [],
+            # Nom de la stratégie dans le registre des simulations
+            # ('<n> phases' par défaut)
+            'strategy_name': None
         }
+        
+        # Conditions de course transmises au simulateur par lot
+        self.conditions_keys = ['vent_active', 'vitesse_vent', 'wind_angle_global', 'aero_active',
+                                'gravite_active', 'enviolo_on', 'moteur_elec', 'coef_aero', 'coef_roul']
     
     def load_simulation_module(self):
         """Charge dynamiquement le module de simulation"""
@@ -53,9 +104,25 @@ class EtaOneSimulationWrapper:
             if not os.path.exists(self.module_path):
                 raise FileNotFoundError(f"Module de simulation non trouvé: {self.module_path}")
             
-            spec = importlib.util.spec_from_file_location("simulation", self.module_path)
-            self.simulation_module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(self.simulation_module)
+            self.simulation_module = charger_module(self.module_path)
+            # Compilation des noyaux (ou chargement du cache disque) dès le
+            # chargement plutôt qu'à la première simulation
+            duree = self.simulation_module.warmup()
+            print(f"⚙️ Noyaux prêts en {duree:.1f}s")
+            
+            # Cache des résultats (ETA_ONE_RESULTATS pour un dossier partagé)
+            cache_dir = os.environ.get('ETA_ONE_RESULTATS') or os.path.join(
+                self.simulation_module.RACINE_DONNEES, '.cache', 'resultats')
+            self.cache = CacheResultats(cache_dir)
+            # Jeu de données Parquet des lots exportés (ETA_ONE_EXPORTS)
+            self.export_dir = os.environ.get('ETA_ONE_EXPORTS') or os.path.join(
+                self.simulation_module.RACINE_DONNEES, 'exports')
+            # Registre des simulations de la page Analyses (ETA_ONE_COURSES)
+            self.runs = RegistreCourses()
+            # Modèle de substitution des données actuelles
+            self.surrogate_path = os.path.join(
+                cache_dir, f"substitution_{self.simulation_module.empreinte_donnees()[:16]}.npz")
+            self._load_surrogate()
             
             print(f"✅ Module de simulation chargé: {self.module_path}")
             return True
@@ -82,16 +149,20 @@ class EtaOneSimulationWrapper:
     
     def run_simulation(self, 
                       bornes_vitesse: List[Tuple[float, float]],
-                      **kwargs) -> Optional[Dict]:
+                      **kwargs) -> Optional[Union[SimulationResult, Dict]]:
         """
-        Lance une simulation avec les paramètres donnés
+        Lance une simulation avec les paramètres donnés, ou renvoie le
+        résultat en cache d'une simulation identique (même stratégie, mêmes
+        paramètres, mêmes données d'entrée)
         
         Args:
             bornes_vitesse: Liste des bornes de vitesse [(min1, max1), (min2, max2), ...]
-            **kwargs: Autres paramètres de simulation
+            **kwargs: Autres paramètres de simulation (record='summary' pour
+                les seules métriques, sans télémétrie)
             
         Returns:
-            Dictionnaire avec les résultats de simulation ou None si erreur
+            SimulationResult (canaux et métriques, accessibles par clé comme
+            un dictionnaire), dictionnaire d'erreur en cas d'échec ou None
         """
         
         if not self.simulation_module:
@@ -103,97 +174,40 @@ class EtaOneSimulationWrapper:
         # Fusion avec la configuration par défaut
         config = {**self.default_config, **kwargs}
         
+        key = self._cache_key(bornes_vitesse, config)
+        cached = self.cache.lire(key)
+        if cached is not None:
+            print(f"♻️ Résultat en cache ({len(bornes_vitesse)} phases)")
+            self._update_surrogate(cached)
+            return cached
+        
         try:
             print(f"🚀 Lancement simulation avec {len(bornes_vitesse)} phases")
             print(f"   Bornes: {bornes_vitesse}")
             print(f"   Temps max: {config['temps_max']}s")
             
             # Appel de ta fonction de simulation
-            result = self.simulation_module.simuler_vehicule_optimise(
-                distance_totale=config['distance_totale'],
-                bornes_vitesse=bornes_vitesse,
-                temps_max=config['temps_max'],
-                vent_active=config['vent_active'],
-                vitesse_vent=config['vitesse_vent'],
-                wind_angle_global=config['wind_angle_global'],
-                aero_active=config['aero_active'],
-                gravite_active=config['gravite_active'],
-                enviolo_on=config['enviolo_on'],
-                moteur_elec=config['moteur_elec'],
-                coef_aero=config['coef_aero'],
-                coef_roul=config['coef_roul'],
-                plot=config['plot'],
-                debug_mode=config['debug_mode']
-            )
+            arguments = self._simulation_arguments(config)
+            if arguments.pop('resume', False):
+                result = self.simulation_module.simuler_resume(bornes_vitesse=bornes_vitesse, **arguments)
+            else:
+                result = self.simulation_module.simuler_vehicule_optimise(
+                    bornes_vitesse=bornes_vitesse,
+                    **arguments
+                )
             
             if result is None:
                 return None
             
-            # Extraction et formatage des résultats
-            (t_eval, position, vitesse, forces, regimes_moteur,
-             conso_g, conso_ml, ratios_utilises, conso_cumul,
-             joules_elec, energie_supercap, moteur_th_etat, 
-             moteur_elec_etat, ml_total) = result
-            
-            # Calcul de métriques dérivées
-            temps_total = t_eval[-1]
-            distance_finale = position[-1]
-            vitesse_moyenne = (distance_finale / temps_total) * 3.6  # km/h
-            efficacite = (distance_finale / 1000) / (ml_total / 1000)  # km/l
-            
-            # Formatage des résultats pour Streamlit
-            simulation_results = {
-                # Métriques principales
-                'temps_total': temps_total,
-                'distance_finale': distance_finale,
-                'consommation_ml': ml_total,
-                'consommation_thermique': conso_ml,
-                'energie_electrique_j': joules_elec[-1],
-                'vitesse_moyenne': vitesse_moyenne,
-                'efficacite_km_l': efficacite,
-                
-                # Données temporelles
-                'temps': t_eval.tolist(),
-                'position': position.tolist(),
-                'vitesse': vitesse.tolist(),
-                'vitesse_kmh': (vitesse * 3.6).tolist(),
-                'regimes_moteur': regimes_moteur.tolist(),
-                'ratios_enviolo': ratios_utilises.tolist(),
-                'consommation_cumul': conso_cumul.tolist(),
-                'energie_supercap': energie_supercap.tolist(),
-                'joules_elec': joules_elec.tolist(),
-                'moteur_thermique_actif': moteur_th_etat.tolist(),
-                'moteur_electrique_actif': moteur_elec_etat.tolist(),
-                
-                # Forces
-                'forces': {
-                    'moteur': forces['motor'].tolist(),
-                    'aerodynamique': forces['aero'].tolist(),
-                    'roulement': forces['rolling'].tolist(),
-                    'gravite': forces['gravity'].tolist(),
-                    'vent': forces['wind'].tolist(),
-                    'electrique': forces['elec'].tolist()
-                },
-                
-                # Configuration utilisée
-                'config': {
-                    'bornes_vitesse': bornes_vitesse,
-                    'temps_max': config['temps_max'],
-                    'coef_aero': config['coef_aero'],
-                    'coef_roul': config['coef_roul'],
-                    'moteur_elec': config['moteur_elec'],
-                    'enviolo_on': config['enviolo_on']
-                },
-                
-                # Statut
-                'success': True,
-                'message': f"Simulation réussie en {temps_total:.1f}s"
-            }
+            simulation_results = self._format_results(result, bornes_vitesse, config)
+            self._update_surrogate(simulation_results)
+            self._record_run(simulation_results, bornes_vitesse, config)
+            self.cache.ecrire(key, simulation_results)
             
             print(f"✅ Simulation terminée:")
-            print(f"   Temps: {temps_total:.1f}s")
-            print(f"   Consommation: {ml_total:.1f}ml")
-            print(f"   Efficacité: {efficacite:.1f}km/l")
+            print(f"   Temps: {simulation_results['temps_total']:.1f}s")
+            print(f"   Consommation: {simulation_results['consommation_ml']:.1f}ml")
+            print(f"   Efficacité: {simulation_results['efficacite_km_l']:.1f}km/l")
             
             return simulation_results
             
@@ -208,10 +222,340 @@ class EtaOneSimulationWrapper:
                 'message': f"Échec de la simulation: {type(e).__name__}"
             }
     
-    def optimize_strategy(self, 
+    def _simulation_arguments(self, config: Dict) -> Dict:
+        """
+        Arguments de simuler_vehicule_optimise tirés d'une configuration
+        complète ; avec 'resume': True, ceux de simuler_resume (record='summary')
+        """
+        record = config.get('record', 'full')
+        if record == 'summary':
+            keys = ['distance_totale', 'temps_max'] + self.conditions_keys
+            return {**{key: config[key] for key in keys}, 'resume': True}
+        
+        keys = ['distance_totale', 'temps_max', 'plot', 'debug_mode'] + self.conditions_keys
+        arguments = {key: config[key] for key in keys}
+        if record == 'decimated':
+            arguments['t_sortie'] = np.arange(0.0, config['temps_max'], config['record_step'])
+        elif record == 'distance':
+            arguments['d_sortie'] = np.arange(0.0, config['distance_totale'], config['record_distance'])
+        elif record == 'sectors':
+            if not len(config['sectors']):
+                raise ValueError("record='sectors' nécessite les limites de secteur (sectors)")
+            arguments['d_sortie'] = np.concatenate([[0.0], np.sort(np.asarray(config['sectors'], dtype=float))])
+        elif record != 'full':
+            raise ValueError(f"Mode d'enregistrement inconnu: {record} "
+                             f"(full, decimated, distance, sectors, summary)")
+        return arguments
+    
+    def _cache_key(self, bornes_vitesse: List[Tuple[float, float]], config: Dict) -> str:
+        """Clé du cache : stratégie, arguments de simulation et empreinte des données"""
+        return cle_simulation(bornes_vitesse, self._simulation_arguments(config),
+                              self.simulation_module.empreinte_donnees())
+    
+    def _record_run(self, results: SimulationResult, bornes_vitesse: List[Tuple[float, float]],
+                    config: Dict, telemetry: bool = True):
+        """
+        Enregistre une nouvelle simulation dans le registre (télémétrie
+        comprise pour les simulations unitaires, métriques seules pour les lots).
+        Appelé avant l'écriture dans le cache : une erreur du registre
+        (verrou sqlite, disque plein...) est signalée sans changer le résultat
+        de la simulation.
+        """
+        conditions = 'Venteux' if config['vent_active'] and config['vitesse_vent'] else 'Sec'
+        strategy = config.get('strategy_name') or f"{len(bornes_vitesse)} phases"
+        try:
+            self.runs.enregistrer_simulation(results, strategy, conditions,
+                                             empreinte_donnees=self.simulation_module.empreinte_donnees(),
+                                             telemetrie=telemetry)
+        except Exception as e:
+            print(f"⚠️ Simulation non enregistrée dans le registre: {e}")
+    
+    def _update_surrogate(self, *results: SimulationResult):
+        """
+        Ajoute des résultats au modèle de substitution de leurs conditions
+        (tours non achevés et stratégies déjà apprises ignorés) et archive le
+        modèle s'il a changé ; une erreur du modèle est signalée sans changer
+        le résultat des simulations
+        """
+        try:
+            added = sum(self.surrogate.ajouter_resultat(r) for r in results)
+            if added:
+                self.surrogate.sauvegarder(self.surrogate_path)
+        except Exception as e:
+            print(f"⚠️ Modèle de substitution non mis à jour: {e}")
+    
+    def _load_surrogate(self):
+        """
+        Modèle de substitution de la session précédente (archive du cache pour
+        les données actuelles), complété par les simulations du registre faites
+        sur ces données ; les archives d'autres données sont supprimées
+        """
+        directory = os.path.dirname(self.surrogate_path)
+        for name in os.listdir(directory):
+            if name.startswith('substitution_') and name != os.path.basename(self.surrogate_path):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+        try:
+            if os.path.exists(self.surrogate_path):
+                self.surrogate.charger(self.surrogate_path)
+            runs = self.runs.resultats_simulation(self.simulation_module.empreinte_donnees())
+        except Exception as e:
+            print(f"⚠️ Archive du modèle de substitution illisible: {e}")
+            runs = []
+        self._update_surrogate(*runs)
+        print(f"📈 Modèle de substitution: {len(self.surrogate)} tours appris")
+    
+    def _result_config(self, bornes_vitesse: List[Tuple[float, float]], config: Dict) -> Dict:
+        """Configuration utilisée, jointe aux résultats"""
+        return {
+            'bornes_vitesse': bornes_vitesse,
+            'distance_totale': config['distance_totale'],
+            'temps_max': config['temps_max'],
+            **{key: config[key] for key in self.conditions_keys},
+            'record': config.get('record', 'full')
+        }
+    
+    def _format_results(self, result: Union[tuple, Dict], bornes_vitesse: List[Tuple[float, float]],
+                        config: Dict) -> SimulationResult:
+        """Regroupe le tuple retourné par simuler_vehicule_optimise en un SimulationResult"""
+        if isinstance(result, dict):
+            return self._format_summary(result, bornes_vitesse, config)
+        
+        # Extraction des résultats
+        (t_eval, position, vitesse, forces, regimes_moteur,
+         conso_g, conso_ml, ratios_utilises, conso_cumul,
+         joules_elec, energie_supercap, moteur_th_etat, 
+         moteur_elec_etat, ml_total) = result
+        
+        # Calcul de métriques dérivées
+        temps_total = float(t_eval[-1])
+        distance_finale = float(position[-1])
+        metrics = {
+            'temps_total': temps_total,
+            'distance_finale': distance_finale,
+            'consommation_ml': float(ml_total),
+            'consommation_thermique': float(conso_ml),
+            'energie_electrique_j': float(joules_elec[-1]),
+            'vitesse_moyenne': (distance_finale / temps_total) * 3.6,  # km/h
+            'efficacite_km_l': (distance_finale / 1000) / (ml_total / 1000),  # km/l
+        }
+        
+        # Canaux dans l'ordre de resultat_simulation.CANAUX (une seule copie)
+        channels = np.vstack([
+            t_eval, position, vitesse, regimes_moteur, ratios_utilises,
+            conso_cumul, energie_supercap, joules_elec, moteur_th_etat, moteur_elec_etat,
+            forces['motor'], forces['aero'], forces['rolling'], forces['gravity'],
+            forces['wind'], forces['elec']
+        ])
+        return SimulationResult(channels, metrics, self._result_config(bornes_vitesse, config))
+    
+    def _format_summary(self, summary: Dict, bornes_vitesse: List[Tuple[float, float]],
+                        config: Dict) -> SimulationResult:
+        """Résumé de simuler_resume (record='summary') : métriques sans télémétrie"""
+        temps_total = float(summary['temps_total'])
+        distance_finale = float(summary['distance_finale'])
+        ml_total = float(summary['ml_total'])
+        temps_phases = summary['temps_phases']
+        
+        metrics = {
+            'temps_total': temps_total,
+            'distance_finale': distance_finale,
+            'consommation_ml': ml_total,
+            'consommation_thermique': float(summary['conso_totale_ml']),
+            'energie_electrique_j': float(summary['joules_elec']),
+            'vitesse_moyenne': (distance_finale / temps_total) * 3.6,  # km/h
+            'efficacite_km_l': (distance_finale / 1000) / (ml_total / 1000),  # km/l
+            
+            # Instants des événements
+            'temps_phases': None if temps_phases is None else temps_phases.tolist(),
+            'temps_redemarrage': float(summary['temps_redemarrage']),
+        }
+        return SimulationResult.resume(metrics, self._result_config(bornes_vitesse, config))
+    
+    def run_batch(self,
+                  strategies: List[Union[List[Tuple[float, float]], Dict]],
+                  workers: int = None,
+                  timeout: float = None,
+                  seed: int = None,
+                  **kwargs) -> Iterator[Tuple[int, Union[SimulationResult, Dict]]]:
+        """
+        Lance un lot de simulations sur un pool de processus persistant
+        
+        Le pool est créé au premier appel (ou si `workers` change) puis
+        réutilisé : chaque worker charge le module et compile les noyaux une
+        seule fois, et lit les tables d'interpolation en mémoire partagée.
+        
+        Args:
+            strategies: Liste de bornes de vitesse, ou de dictionnaires
+                {'bornes_vitesse': [...], <paramètres propres à la stratégie>}
+            workers: Nombre de processus (tous les cœurs par défaut)
+            timeout: Durée maximale d'une simulation en secondes
+            seed: Graine des générateurs aléatoires des workers
+            **kwargs: Paramètres de simulation communs au lot
+            
+        Yields:
+            (indice de la stratégie, résultats au format de run_simulation),
+            d'abord ceux déjà en cache puis dans l'ordre d'achèvement
+        """
+        
+        if not self.simulation_module:
+            raise RuntimeError("Module de simulation non chargé")
+        
+        jobs = []
+        for strategy in strategies:
+            if isinstance(strategy, dict):
+                strategy = dict(strategy)
+                bornes_vitesse = strategy.pop('bornes_vitesse')
+            else:
+                bornes_vitesse, strategy = strategy, {}
+            self.validate_bornes_vitesse(bornes_vitesse)
+            config = {**self.default_config, **kwargs, **strategy, 'plot': False}
+            jobs.append((bornes_vitesse, config))
+        
+        # Résultats déjà en cache, les autres sont simulés par le pool
+        keys = [self._cache_key(bornes_vitesse, config) for bornes_vitesse, config in jobs]
+        pending = []
+        for index, key in enumerate(keys):
+            cached = self.cache.lire(key)
+            if cached is not None:
+                self._update_surrogate(cached)
+                yield index, cached
+            else:
+                pending.append(index)
+        if not pending:
+            return
+        
+        workers = workers or os.cpu_count() or 1
+        if self.pool is None or self.pool.n_workers != workers:
+            self.close_pool()
+            self.pool = PoolSimulation(self.module_path, workers, seed, self.simulation_module)
+        
+        tasks = [(jobs[index][0], self._simulation_arguments(jobs[index][1])) for index in pending]
+        for position, status, value in self.pool.executer(tasks, timeout=timeout):
+            index = pending[position]
+            bornes_vitesse, config = jobs[index]
+            if status == 'ok':
+                simulation_results = self._format_results(value, bornes_vitesse, config)
+                self._update_surrogate(simulation_results)
+                self._record_run(simulation_results, bornes_vitesse, config, telemetry=False)
+                self.cache.ecrire(keys[index], simulation_results)
+                yield index, simulation_results
+            else:
+                yield index, {
+                    'success': False,
+                    'error': f"Erreur simulation: {value}",
+                    'message': "Simulation trop longue" if status == 'timeout' else "Échec de la simulation"
+                }
+    
+    def close_pool(self):
+        """Arrête les pools de processus de run_batch et de render_report"""
+        if self.pool is not None:
+            self.pool.fermer()
+            self.pool = None
+        if self.render_pool is not None:
+            self.render_pool.fermer()
+            self.render_pool = None
+    
+    def render_report(self, results: SimulationResult, formats: Tuple[str, ...] = ('png',)):
+        """
+        Rend les figures d'un résultat en fichiers (PNG, SVG...) dans un pool
+        de processus en arrière-plan, sans bloquer l'appelant ; les figures
+        d'un résultat déjà rendu sont reprises du cache
+        
+        Args:
+            results: Résultat de run_simulation ou run_batch (avec télémétrie)
+            formats: Formats de fichier
+            
+        Returns:
+            Future de {figure: [chemins]} (dossier ETA_ONE_RAPPORTS, data/rapports par défaut)
+        """
+        formats = tuple(formats)
+        if self.render_pool is None or self.render_pool.formats != formats:
+            if self.render_pool is not None:
+                self.render_pool.fermer()
+            track = self.simulation_module.donnees_piste()
+            directory = os.environ.get('ETA_ONE_RAPPORTS') or os.path.join(
+                self.simulation_module.RACINE_DONNEES, 'rapports')
+            self.render_pool = PoolRendu(directory, piste=(track.distance, track.pos_x, track.pos_y),
+                                         formats=formats)
+        return self.render_pool.soumettre(results)
+    
+    def render_batch(self, results: List[SimulationResult], formats: Tuple[str, ...] = ('png',)) -> List[Dict]:
+        """Rend les figures d'un lot de résultats (voir render_report) ; chemins dans l'ordre"""
+        futures = [self.render_report(r, formats) for r in results]
+        return [future.result() for future in futures]
+    
+    def screen_strategies(self,
+                          strategies: List[List[Tuple[float, float]]],
+                          n_select: int = 10,
+                          objective: str = "consumption",
+                          kappa: float = 2.0,
+                          **kwargs) -> List[int]:
+        """
+        Présélectionne les stratégies à simuler avec le modèle de substitution
+
+        Args:
+            strategies: Liste de bornes de vitesse candidates
+            n_select: Nombre de stratégies retenues
+            objective: "time" ou "consumption"
+            kappa: Poids de l'incertitude (0 = seulement les plus prometteuses)
+            **kwargs: Paramètres de simulation communs aux candidates
+
+        Returns:
+            Indices des stratégies retenues (les premières tant qu'aucune
+            simulation n'a été faite dans les mêmes conditions)
+        """
+
+        config = {**self.default_config, **kwargs}
+        output = 'temps_total' if objective == 'time' else 'consommation_ml'
+        return self.surrogate.selectionner(strategies, config, n=n_select, sortie=output,
+                                           kappa=kappa, temps_max=config['temps_max'])
+
+    def compute_sensitivities(self,
+                              bornes_vitesse: List[Tuple[float, float]],
+                              **kwargs) -> Dict:
+        """
+        Dérivées du temps et de la consommation d'un tour par rapport aux
+        bornes de vitesse et aux coefficients coef_aero / coef_roul
+
+        Args:
+            bornes_vitesse: Liste des bornes de vitesse [(min1, max1), (min2, max2), ...]
+            **kwargs: Paramètres de simulation, plus pas_bornes, pas_coef et
+                n_points de sensibilites_tour
+
+        Returns:
+            Dictionnaire de sensibilites_tour (tableaux convertis en listes)
+        """
+
+        if not self.simulation_module:
+            raise RuntimeError("Module de simulation non chargé")
+
+        self.validate_bornes_vitesse(bornes_vitesse)
+        options = {key: kwargs.pop(key) for key in ('pas_bornes', 'pas_coef', 'n_points') if key in kwargs}
+        config = {**self.default_config, **kwargs}
+        conditions = {key: config[key] for key in self.conditions_keys}
+
+        sensitivities = self.simulation_module.sensibilites_tour(
+            bornes_vitesse, distance_totale=config['distance_totale'],
+            temps_max=config['temps_max'], **options, **conditions
+        )
+        return {
+            'temps_total': float(sensitivities['temps_total']),
+            'ml_total': float(sensitivities['ml_total']),
+            'd_temps_d_bornes': sensitivities['d_temps_d_bornes'].tolist(),
+            'd_ml_d_bornes': sensitivities['d_ml_d_bornes'].tolist(),
+            'd_temps_d_coef': {key: float(v) for key, v in sensitivities['d_temps_d_coef'].items()},
+            'd_ml_d_coef': {key: float(v) for key, v in sensitivities['d_ml_d_coef'].items()},
+            'valide': sensitivities['valide']
+        }
+
+    def optimize_strategy(self,
                          objective: str = "efficiency",
                          constraints: Dict = None,
-                         n_iterations: int = 50) -> Dict:
+                         n_iterations: int = 50,
+                         export: bool = False) -> Dict:
         """
         Optimise la stratégie selon un objectif donné
         
@@ -219,6 +563,8 @@ class EtaOneSimulationWrapper:
             objective: "time", "consumption", "efficiency"
             constraints: Contraintes (temps_max, conso_max)
             n_iterations: Nombre d'itérations
+            export: Ajoute la population simulée au jeu de données des lots
+                (export_batch)
             
         Returns:
             Résultats d'optimisation
@@ -238,6 +584,8 @@ class EtaOneSimulationWrapper:
         best_overall = None
         best_score = float('inf') if objective in ['time', 'consumption'] else 0
         
+        # Génération de toutes les stratégies candidates
+        candidats = []
         for iteration in range(n_iterations):
             try:
                 # Génération aléatoire de bornes de vitesse
@@ -262,54 +610,86 @@ class EtaOneSimulationWrapper:
                     'temps_max': constraints['temps_max']
                 }
                 
-                # Simulation
-                result = self.run_simulation(bornes_vitesse, **config)
-                
-                if result and result['success']:
-                    # Vérification des contraintes
-                    temps = result['temps_total']
-                    conso = result['consommation_ml']
-                    efficacite = result['efficacite_km_l']
-                    
-                    if temps <= constraints['temps_max'] and conso <= constraints['conso_max']:
-                        # Calcul du score selon l'objectif
-                        if objective == 'time':
-                            score = temps
-                        elif objective == 'consumption':
-                            score = conso
-                        else:  # efficiency
-                            score = efficacite
-                        
-                        result_summary = {
-                            'iteration': iteration + 1,
-                            'bornes_vitesse': bornes_vitesse,
-                            'temps': temps,
-                            'consommation': conso,
-                            'efficacite': efficacite,
-                            'score': score,
-                            'config': config
-                        }
-                        
-                        best_results.append(result_summary)
-                        
-                        # Nouveau meilleur résultat ?
-                        if objective in ['time', 'consumption']:
-                            if score < best_score:
-                                best_score = score
-                                best_overall = result_summary
-                        else:  # efficiency
-                            if score > best_score:
-                                best_score = score
-                                best_overall = result_summary
-                
-                # Progression
-                if (iteration + 1) % 10 == 0:
-                    print(f"   Itération {iteration + 1}/{n_iterations}")
+                self.validate_bornes_vitesse(bornes_vitesse)
+                candidats.append((iteration, bornes_vitesse, config))
                     
             except Exception as e:
                 print(f"   Erreur itération {iteration + 1}: {e}")
                 continue
         
+        # Simulation de toute la population en un seul lot, avec l'intégrateur
+        # par défaut de run_simulation : le classement est celui des tours affichés
+        if candidats:
+            conditions = {cle: self.default_config[cle] for cle in self.conditions_keys}
+            lot = self.simulation_module.simuler_lot(
+                [bornes for _, bornes, _ in candidats],
+                [{**conditions, 'coef_aero': config['coef_aero'], 'coef_roul': config['coef_roul']}
+                 for _, _, config in candidats],
+                distance_totale=self.default_config['distance_totale'],
+                temps_max=constraints['temps_max']
+            )
+            print(f"   {len(candidats)} stratégies simulées")
+            population = []
+            for k, (_, bornes_vitesse, config) in enumerate(candidats):
+                metrics = {
+                    'temps_total': float(lot['temps_total'][k]),
+                    'distance_finale': float(lot['distance_finale'][k]),
+                    'consommation_ml': float(lot['ml_total'][k]),
+                    'consommation_thermique': float(lot['conso_totale_ml'][k]),
+                    'energie_electrique_j': float(lot['joules_elec'][k]),
+                }
+                run_config = {**self.default_config, **config, 'record': 'summary'}
+                population.append(SimulationResult.resume(
+                    metrics, self._result_config(bornes_vitesse, run_config)))
+            # Échecs d'intégration exclus du modèle de substitution
+            self._update_surrogate(*[result for k, result in enumerate(population) if lot['statut'][k] == 0])
+            if export:
+                lot_id = self.export_batch(population)
+                print(f"   Lot exporté: {lot_id}")
+        
+        for k, (iteration, bornes_vitesse, config) in enumerate(candidats):
+            # Tour non achevé (temps_max atteint ou échec d'intégration) :
+            # candidat rejeté. Un tour achevé se termine à l'arrêt en fin de
+            # freinage, juste avant la ligne (temps_arrivee = -1), ou sur la ligne.
+            if lot['statut'][k] != 0 or lot['temps_total'][k] >= constraints['temps_max']:
+                continue
+            
+            # Vérification des contraintes
+            temps = float(lot['temps_total'][k])
+            conso = float(lot['ml_total'][k])
+            efficacite = float(lot['distance_finale'][k] / 1000) / (conso / 1000)  # km/l
+            
+            if temps <= constraints['temps_max'] and conso <= constraints['conso_max']:
+                # Calcul du score selon l'objectif
+                if objective == 'time':
+                    score = temps
+                elif objective == 'consumption':
+                    score = conso
+                else:  # efficiency
+                    score = efficacite
+                
+                result_summary = {
+                    'iteration': iteration + 1,
+                    'bornes_vitesse': bornes_vitesse,
+                    'temps': temps,
+                    'consommation': conso,
+                    'efficacite': efficacite,
+                    'score': score,
+                    'config': config
+                }
+                
+                best_results.append(result_summary)
+                
+                # Nouveau meilleur résultat ?
+                if objective in ['time', 'consumption']:
+                    if score < best_score:
+                        best_score = score
+                        best_overall = result_summary
+                else:  # efficiency
+                    if score > best_score:
+                        best_score = score
+                        best_overall = result_summary
+        
         # Tri des résultats
         if objective in ['time', 'consumption']:
             best_results.sort(key=lambda x: x['score'])
@@ -335,34 +715,25 @@ class EtaOneSimulationWrapper:
         
         return optimization_results
     
-    def export_results(self, results: Dict, filename: str = None) -> str:
-        """Exporte les résultats vers un fichier CSV"""
+    def export_results(self, results: SimulationResult, filename: str = None) -> str:
+        """
+        Exporte les résultats d'une simulation, au format déduit de
+        l'extension : Parquet par défaut (stratégie, configuration et
+        empreinte des données dans le schéma), .csv ou .xlsx
+        """
         
         if filename is None:
             timestamp = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"eta_one_results_{timestamp}.csv"
+            filename = f"eta_one_results_{timestamp}.parquet"
         
         try:
-            # Création d'un DataFrame avec les résultats temporels
-            df = pd.DataFrame({
-                'Temps (s)': results['temps'],
-                'Position (m)': results['position'],
-                'Vitesse (m/s)': results['vitesse'],
-                'Vitesse (km/h)': results['vitesse_kmh'],
-                'Régime moteur (RPM)': results['regimes_moteur'],
-                'Ratio Enviolo': results['ratios_enviolo'],
-                'Consommation cumul (g)': results['consommation_cumul'],
-                'Énergie supercap (J)': results['energie_supercap'],
-                'Énergie élec cumul (J)': results['joules_elec'],
-                'Moteur thermique': results['moteur_thermique_actif'],
-                'Moteur électrique': results['moteur_electrique_actif'],
-                'Force moteur (N)': results['forces']['moteur'],
-                'Force aéro (N)': results['forces']['aerodynamique'],
-                'Force roulement (N)': results['forces']['roulement'],
-                'Force gravité (N)': results['forces']['gravite']
-            })
-            
-            df.to_csv(filename, index=False, encoding='utf-8')
+            extension = os.path.splitext(filename)[1].lower()
+            if extension == '.csv':
+                exporter_csv(results, filename, EXPORT_COLUMNS)
+            elif extension == '.xlsx':
+                exporter_xlsx(results, filename, EXPORT_COLUMNS)
+            else:
+                ecrire_run(results, filename, self.simulation_module.empreinte_donnees())
             print(f"✅ Résultats exportés vers: {filename}")
             return filename
             
@@ -370,17 +741,37 @@ class EtaOneSimulationWrapper:
             print(f"❌ Erreur export: {e}")
             return None
 
+    def export_batch(self, results: List[SimulationResult], batch: str = None,
+                     directory: str = None) -> str:
+        """
+        Ajoute un lot de résultats au jeu de données Parquet partitionné par lot
+        
+        Args:
+            results: Résultats de run_simulation ou run_batch (échecs ignorés)
+            batch: Identifiant du lot (horodatage par défaut)
+            directory: Dossier du jeu de données (export_dir par défaut)
+            
+        Returns:
+            Identifiant du lot
+        """
+        dataset = JeuResultats(directory or self.export_dir)
+        return dataset.ajouter_lot(results, batch, self.simulation_module.empreinte_donnees())
+    
+    def load_batches(self, directory: str = None) -> JeuResultats:
+        """Jeu de données des lots exportés (runs(), telemetrie(), resultat())"""
+        return JeuResultats(directory or self.export_dir)
+
 # =============================================================================
 # FONCTIONS UTILITAIRES POUR STREAMLIT
 # =============================================================================
 
-@st.cache_data
+@st.cache_resource
 def get_simulation_wrapper():
-    """Retourne une instance du wrapper (avec cache Streamlit)"""
+    """Retourne l'instance du wrapper partagée par les sessions (ressource Streamlit, non sérialisée)"""
     return EtaOneSimulationWrapper()
 
 def run_cached_simulation(bornes_vitesse_str: str, config_str: str):
-    """Version cachée de la simulation pour Streamlit"""
+    """Simulation depuis des paramètres JSON (résultats servis par le cache du wrapper)"""
     import json
     
     wrapper = get_simulation_wrapper()
@@ -7,11 +7,33 @@ Created on Thu May 22 15:27:15 2025
 
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from scipy.interpolate import interp1d
-from scipy.integrate import solve_ivp
-from numba import njit
+from numba import njit, typeof, float64, int64
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+import hashlib
+import shutil
+import tempfile
+from collections import namedtuple
+from functools import cached_property, lru_cache
 import time
+
+# Modules voisins (rendu_graphiques, export_resultats...) importables quel
+# que soit le répertoire courant : ce module est aussi chargé par son chemin
+# (wrapper, pool_simulation.charger_module)
+DOSSIER_SIMULATION = os.path.dirname(os.path.abspath(__file__))
+if DOSSIER_SIMULATION not in sys.path:
+    sys.path.insert(0, DOSSIER_SIMULATION)
+
+# Empreinte du source de ce module (entre dans l'empreinte des données). Le
+# cache disque des noyaux (cache=True) est celui de numba, invalidé par
+# numba quand le source change ; NUMBA_CACHE_DIR se règle depuis le
+# lanceur. Les chargeurs par chemin importent le module sous le nom de son
+# fichier (pool_simulation.charger_module) : les noyaux en cache désignent
+# les tables et enregistrements par ce nom.
+with open(__file__, 'rb') as fichier_source:
+    EMPREINTE_SOURCE = hashlib.sha256(fichier_source.read()).hexdigest()[:16]
+
 bornes_vitesse =[(0.0, 8.47), (8.29, 8.93), (6.99, 8.43), (7.24, 8.98), (6.44, 8.87)]
 temps_max = 189
 nom_fichier="simulation_results_opti_5accèl_189_V3.csv"
@@ -19,60 +41,247 @@ nom_fichier="simulation_results_opti_5accèl_189_V3.csv"
 rendement_recup = 0.6
 a_max_freinage = 0.4
 # =============================================================================
-# 1) Chargement des données initiales
-#=============================================================================
-
-# Chargement des données moteur
-moteur_consomini = pd.read_csv("moteur_consomini.csv")
-x = moteur_consomini["n moteur"]
-f_interpol_couple = interp1d(x, moteur_consomini["m corr"]*0.55*1.06, kind="linear", fill_value="extrapolate")
-f_interpol_csp = interp1d(x, moteur_consomini["csp"]*1.7, kind="linear", fill_value="extrapolate")
-
-# Moteur électrique
-moteur_elec = pd.read_csv("moteur_elec.csv")
-x_elec = moteur_elec["vitesse rotor"]
-
-
-moteur_elec2=pd.read_csv("moteur_elec_2.csv")
-rpm_elec=moteur_elec2["rpm"]
-f_interpol_couple_elec=interp1d(rpm_elec, moteur_elec2["Couple"],kind="linear",fill_value="extrapolate")
-#f_interpol_P_elec = interp1d(rpm_elec, moteur_elec["pelec calc"], kind="linear", fill_value="extrapolate")
-
-
-# Enviolo
-data_enviolo = pd.read_csv("data_enviolo.csv")
-x_env = data_enviolo["vitesse moteur"]
-y_env = data_enviolo["rapport enviolo"]
-f_interp_env = interp1d(x_env, y_env, kind="linear", fill_value="extrapolate")
-
-# Piste
-xyz = pd.read_csv("sem_2025_eu.csv")
-xyz.columns = [col.lower() for col in xyz.columns]
-distance = xyz["distance from lap line (m)"]
-altitude = xyz["elevation (m)"]
-pos_x = xyz["utmx"]
-pos_y = xyz["utmy"]
-
-heading = np.arctan2(np.gradient(pos_y), np.gradient(pos_x))
-heading_interp = interp1d(distance, heading, fill_value="extrapolate")
-
-# Cx variable
-data_cx = pd.read_excel("Cx_voiture_vent.xlsx", skiprows=3)
-data_cx.columns = [col.lower() for col in data_cx.columns]
-angle = data_cx["angle (°)"]
-Cx = data_cx["cx (-)"]
-f_interp_cx = interp1d(angle, Cx, kind="linear", fill_value="extrapolate")
+# 1) Accès aux données
+# =============================================================================
+
+# Dossier data/ du dépôt (ETA_ONE_DATA pour en utiliser un autre)
+RACINE_DONNEES = os.environ.get('ETA_ONE_DATA') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+# Version du format des paquets binaires (à incrémenter si les tableaux
+# extraits des fichiers sources changent)
+VERSION_PAQUET = 1
+
+def empreinte_sources(prefixe, sources):
+    """Empreinte SHA-256 (hexadécimale) du préfixe, des noms et du contenu des fichiers `sources`"""
+    empreinte = hashlib.sha256(prefixe.encode())
+    for chemin in sources:
+        with open(chemin, 'rb') as fichier:
+            empreinte.update(os.path.basename(chemin).encode())
+            empreinte.update(fichier.read())
+    return empreinte.hexdigest()
+
+def charger_paquet(nom, sources, lire, dossier_cache=None):
+    """
+    Tableaux d'entrée depuis le paquet binaire `nom` : un dossier de fichiers
+    .npy projetés en mémoire en lecture seule, identifié par l'empreinte
+    SHA-256 des fichiers `sources`. Si une source a changé, le paquet est
+    reconstruit depuis `lire()` (dictionnaire de tableaux) et les anciens
+    paquets du même nom sont supprimés.
+    """
+    dossier_cache = dossier_cache or os.path.join(RACINE_DONNEES, '.cache')
+    dossier = os.path.join(dossier_cache, f"{nom}_{empreinte_sources(f'{nom}:{VERSION_PAQUET}', sources)[:16]}")
+    
+    if not os.path.isdir(dossier):
+        tableaux = lire()
+        try:
+            os.makedirs(dossier_cache, exist_ok=True)
+            temporaire = tempfile.mkdtemp(prefix=f".{nom}_", dir=dossier_cache)
+            for cle, valeur in tableaux.items():
+                np.save(os.path.join(temporaire, f"{cle}.npy"), np.ascontiguousarray(valeur))
+            os.rename(temporaire, dossier)
+        except OSError:
+            # Dossier en lecture seule, ou paquet écrit entre-temps par un autre processus
+            if not os.path.isdir(dossier):
+                return tableaux
+            shutil.rmtree(temporaire, ignore_errors=True)
+        for ancien in os.listdir(dossier_cache):
+            if ancien.startswith(f"{nom}_") and ancien != os.path.basename(dossier):
+                shutil.rmtree(os.path.join(dossier_cache, ancien), ignore_errors=True)
+    
+    return {
+        os.path.splitext(fichier)[0]: np.load(os.path.join(dossier, fichier), mmap_mode='r')
+        for fichier in os.listdir(dossier) if fichier.endswith('.npy')
+    }
+
+class VehicleData:
+    """
+    Cartographies du véhicule (data/vehicle), lues au premier accès depuis le
+    paquet binaire puis gardées en mémoire
+    """
+    def __init__(self, dossier=None):
+        self.dossier = dossier or os.path.join(RACINE_DONNEES, 'vehicle')
+    
+    def chemin(self, nom):
+        chemin = os.path.join(self.dossier, nom)
+        if not os.path.exists(chemin):
+            raise FileNotFoundError(f"Fichier de données véhicule introuvable: {chemin}")
+        return chemin
+    
+    @property
+    def sources(self):
+        noms = ["moteur_consomini.csv", "moteur_elec_2.csv", "data_enviolo.csv", "Cx_voiture_vent.xlsx"]
+        if os.path.exists(os.path.join(self.dossier, "moteur_elec.csv")):
+            noms.append("moteur_elec.csv")
+        return [self.chemin(nom) for nom in noms]
+    
+    def lire_sources(self):
+        """Lecture des CSV et de la feuille Excel (pandas), utilisée pour construire le paquet"""
+        tableaux = {}
+        
+        donnees = pd.read_csv(self.chemin("moteur_consomini.csv"))
+        tableaux['moteur_rpm'] = donnees["n moteur"].to_numpy(np.float64)
+        tableaux['moteur_couple'] = (donnees["m corr"] * 0.55 * 1.06).to_numpy(np.float64)
+        tableaux['moteur_csp'] = (donnees["csp"] * 1.7).to_numpy(np.float64)
+        
+        donnees = pd.read_csv(self.chemin("moteur_elec_2.csv"))
+        tableaux['elec_rpm'] = donnees["rpm"].to_numpy(np.float64)
+        tableaux['elec_couple'] = donnees["Couple"].to_numpy(np.float64)
+        if os.path.exists(os.path.join(self.dossier, "moteur_elec.csv")):
+            tableaux['elec_power'] = pd.read_csv(self.chemin("moteur_elec.csv"))["pelec calc"].to_numpy(np.float64)
+        
+        donnees = pd.read_csv(self.chemin("data_enviolo.csv"))
+        tableaux['env_rpm'] = donnees["vitesse moteur"].to_numpy(np.float64)
+        tableaux['env_ratio'] = donnees["rapport enviolo"].to_numpy(np.float64)
+        
+        donnees = pd.read_excel(self.chemin("Cx_voiture_vent.xlsx"), skiprows=3)
+        donnees.columns = [col.lower() for col in donnees.columns]
+        tableaux['cx_angle'] = donnees["angle (°)"].to_numpy(np.float64)
+        tableaux['cx'] = donnees["cx (-)"].to_numpy(np.float64)
+        return tableaux
+    
+    @cached_property
+    def tableaux(self):
+        return charger_paquet("vehicule", self.sources, self.lire_sources)
+    
+    @property
+    def moteur_thermique(self):
+        """(régime tr/min, couple N.m, consommation spécifique g/kWh) corrigés"""
+        t = self.tableaux
+        return t['moteur_rpm'], t['moteur_couple'], t['moteur_csp']
+    
+    @property
+    def moteur_electrique(self):
+        """(régime tr/min, couple N.m)"""
+        return self.tableaux['elec_rpm'], self.tableaux['elec_couple']
+    
+    @property
+    def puissance_electrique(self):
+        """Puissance électrique calculée selon le régime rotor, None sans moteur_elec.csv"""
+        return self.tableaux.get('elec_power')
+    
+    @property
+    def enviolo(self):
+        """(régime moteur tr/min, rapport Enviolo)"""
+        return self.tableaux['env_rpm'], self.tableaux['env_ratio']
+    
+    @property
+    def cx_vent(self):
+        """(angle du vent relatif en degrés, Cx)"""
+        return self.tableaux['cx_angle'], self.tableaux['cx']
+
+class TrackData:
+    """
+    Relevé du circuit (data/circuit, format sem_2025_eu_with_rayon.csv), lu
+    au premier accès depuis le paquet binaire puis gardé en mémoire avec son
+    profil rééchantillonné
+    """
+    def __init__(self, chemin=None):
+        self.chemin = chemin or os.path.join(RACINE_DONNEES, 'circuit', 'sem_2025_eu_with_rayon.csv')
+    
+    def lire_sources(self):
+        """Lecture du CSV (pandas), utilisée pour construire le paquet"""
+        donnees = pd.read_csv(self.chemin)
+        donnees.columns = [col.lower() for col in donnees.columns]
+        tableaux = {
+            'distance': donnees["distance from lap line (m)"].to_numpy(np.float64),
+            'altitude': donnees["elevation (m)"].to_numpy(np.float64),
+            'pos_x': donnees["utmx"].to_numpy(np.float64),
+            'pos_y': donnees["utmy"].to_numpy(np.float64),
+        }
+        if "rayon_de_courbure_clipped" in donnees:
+            tableaux['rayon_courbure'] = donnees["rayon_de_courbure_clipped"].to_numpy(np.float64)
+        return tableaux
+    
+    @cached_property
+    def tableaux(self):
+        if not os.path.exists(self.chemin):
+            raise FileNotFoundError(f"Fichier de circuit introuvable: {self.chemin}")
+        nom = "circuit_" + os.path.splitext(os.path.basename(self.chemin))[0]
+        return charger_paquet(nom, [self.chemin], self.lire_sources)
+    
+    @property
+    def distance(self):
+        return self.tableaux['distance']
+    
+    @property
+    def altitude(self):
+        return self.tableaux['altitude']
+    
+    @property
+    def pos_x(self):
+        return self.tableaux['pos_x']
+    
+    @property
+    def pos_y(self):
+        return self.tableaux['pos_y']
+    
+    @property
+    def rayon_courbure(self):
+        """Rayon de courbure écrêté (m), None si le relevé n'en contient pas"""
+        return self.tableaux.get('rayon_courbure')
+    
+    @property
+    def longueur(self):
+        """Distance de la ligne de départ au dernier point relevé (m)"""
+        return float(self.distance[-1])
+    
+    def construire_profil(self, resolution=None):
+        """TrackProfile rééchantillonné au pas `resolution` (RESOLUTION_PISTE par défaut)"""
+        return construire_profil_piste(self.distance, self.altitude, self.pos_x, self.pos_y,
+                                       self.rayon_courbure, resolution or RESOLUTION_PISTE)
+    
+    @cached_property
+    def profil(self):
+        """TrackProfile à la résolution par défaut"""
+        return self.construire_profil()
+
+@lru_cache(maxsize=None)
+def donnees_vehicule(dossier=None):
+    """VehicleData partagé par le processus (un par dossier)"""
+    return VehicleData(dossier)
+
+@lru_cache(maxsize=None)
+def donnees_piste(chemin=None):
+    """TrackData partagé par le processus (un par fichier)"""
+    return TrackData(chemin)
+
+@lru_cache(maxsize=None)
+def empreinte_donnees(dossier_vehicule=None, chemin_piste=None):
+    """
+    Empreinte des entrées d'une simulation : fichiers du véhicule et du
+    circuit, et source de ce module
+    """
+    sources = donnees_vehicule(dossier_vehicule).sources + [donnees_piste(chemin_piste).chemin]
+    return empreinte_sources(EMPREINTE_SOURCE, sources)
+
+def construire_paquets(dossier_vehicule=None, chemin_piste=None):
+    """Convertit (si nécessaire) les données du véhicule et du circuit en paquets binaires"""
+    donnees_vehicule(dossier_vehicule).tableaux
+    donnees_piste(chemin_piste).tableaux
 
 # =============================================================================
 # 2) Fonctions njit optimisées
 # =============================================================================
 
-@njit
+@njit(cache=True)
 def interp_linear_njit(x, xp, fp):
     """Interpolation linéaire compatible njit"""
     return np.interp(x, xp, fp)
 
-@njit
+@njit(cache=True)
+def interp_grille_njit(x, x0, inv_dx, valeurs):
+    """Interpolation linéaire en O(1) sur une grille uniforme (valeurs bornées hors grille)"""
+    u = (x - x0) * inv_dx
+    n = valeurs.shape[0]
+    if u <= 0.0:
+        return valeurs[0]
+    if u >= n - 1:
+        return valeurs[n - 1]
+    i = int(u)
+    return valeurs[i] + (u - i) * (valeurs[i + 1] - valeurs[i])
+
+@njit(cache=True)
 def calcul_embrayage_njit(omega_m, m_mass, r_mass, N_mass, F_ressort, mu_clutch, R_cloche):
     """Calcul du couple d'embrayage optimisé"""
     F_centrifuge = m_mass * (omega_m * omega_m) * r_mass
@@ -83,7 +292,7 @@ def calcul_embrayage_njit(omega_m, m_mass, r_mass, N_mass, F_ressort, mu_clutch,
         C_embre_max = 0.0
     return C_embre_max, embrayage_actif
 
-@njit
+@njit(cache=True)
 def gestion_phases_njit(v, v_last, phase_actuelle, bornes_flat, phases_terminees, phases_activees, moteur_actif):
     """Gestion optimisée des phases de vitesse - CORRIGÉE pour éviter activation simultanée"""
     franchissement_min = False
@@ -115,25 +324,12 @@ def gestion_phases_njit(v, v_last, phase_actuelle, bornes_flat, phases_terminees
     
     return moteur_actif, phase_actuelle, franchissement_min, franchissement_max
 
-@njit
-def calcul_forces_njit(pos, v, couple_moteur, ratio_enviolo, couple_transmis,
-                       resistance_roulement, coefficient_trainee, surface_frontale,
-                       masse, rayon_roue, rendement_chaine1, rendement_chaine2,
-                       rendement_transmission, rapport_chaine1, rapport_chaine2,
-                       g, densite_air, angle_pente, aero_active, gravite_active,
+@njit(cache=True)
+def calcul_forces_njit(v, resistance_roulement, coefficient_trainee, surface_frontale,
+                       masse, g, densite_air, sin_pente, aero_active, gravite_active,
                        vent_active, vitesse_vent, wind_angle_global, heading, Cx_wind):
-    """Calcul optimisé des forces"""
+    """Calcul optimisé des forces résistantes (la force moteur est lue dans les tables)"""
     
-    # Force moteur
-    if couple_transmis > 0:
-        F_moteur = (couple_transmis * rapport_chaine1 * rapport_chaine2 / ratio_enviolo * 
-                   rendement_chaine1 * rendement_chaine2 * rendement_transmission) / rayon_roue
-    elif couple_moteur > 0:
-        F_moteur = (couple_moteur * rapport_chaine1 * rapport_chaine2 / ratio_enviolo * 
-                   rendement_chaine1 * rendement_chaine2 * rendement_transmission) / rayon_roue
-    else:
-        F_moteur = 0.0
-
     # Force aérodynamique
     if aero_active:
         F_aero = 0.5 * coefficient_trainee * surface_frontale * densite_air * (v * v)
@@ -145,7 +341,7 @@ def calcul_forces_njit(pos, v, couple_moteur, ratio_enviolo, couple_transmis,
 
     # Force gravitationnelle
     if gravite_active:
-        F_gravite = masse * g * np.sin(angle_pente)
+        F_gravite = masse * g * sin_pente
     else:
         F_gravite = 0.0
         
@@ -161,9 +357,9 @@ def calcul_forces_njit(pos, v, couple_moteur, ratio_enviolo, couple_transmis,
         F_wind = 0.0
     
 
-    return F_moteur, F_aero, F_roulement, F_gravite, F_wind
+    return F_aero, F_roulement, F_gravite, F_wind
 
-@njit
+@njit(cache=True)
 def calcul_dynamique_njit(pos, v, omega_m, couple_moteur, C_transmis_brut, ratio_enviolo,
                           masse, rayon_roue, rapport_chaine1, rapport_chaine2,
                           F_moteur, F_aero, F_roulement, F_gravite, F_wind, F_elec, F_freinage,
@@ -191,9 +387,225 @@ def calcul_dynamique_njit(pos, v, omega_m, couple_moteur, C_transmis_brut, ratio
     return dpos_dt, dv_dt, domega_m_dt, roue_libre_active
 
 # =============================================================================
-# 3) Classe de données pour lookup tables
+# 3) Structures typées pour les noyaux njit
 # =============================================================================
 
+# Paramètres véhicule, embrayage et conditions de course (un enregistrement)
+PARAMETRES_DTYPE = np.dtype([
+    ('resistance_roulement', np.float64),
+    ('coefficient_trainee', np.float64),
+    ('surface_frontale', np.float64),
+    ('masse', np.float64),
+    ('rayon_roue', np.float64),
+    ('rendement_chaine1', np.float64),
+    ('rendement_chaine2', np.float64),
+    ('rendement_transmission', np.float64),
+    ('rapport_chaine1', np.float64),
+    ('rapport_chaine2', np.float64),
+    ('g', np.float64),
+    ('densite_air', np.float64),
+    # Embrayage centrifuge
+    ('m_mass', np.float64),
+    ('r_mass', np.float64),
+    ('N_mass', np.float64),
+    ('F_ressort', np.float64),
+    ('mu_clutch', np.float64),
+    ('R_cloche', np.float64),
+    # Supercondensateurs et freinage récupératif
+    ('rendement_recup', np.float64),
+    ('a_max_freinage', np.float64),
+    ('energie_supercap_initiale', np.float64),
+    # Conditions de simulation
+    ('distance_totale', np.float64),
+    ('vitesse_vent', np.float64),
+    ('wind_angle_global', np.float64),
+    ('coef_aero', np.float64),
+    ('coef_roul', np.float64),
+    ('vent_active', np.bool_),
+    ('aero_active', np.bool_),
+    ('gravite_active', np.bool_),
+    ('enviolo_on', np.bool_),
+    ('moteur_elec', np.bool_),
+])
+
+# Mode discret du véhicule (modifié seulement aux pas acceptés et aux événements)
+MODE_DTYPE = np.dtype([
+    ('phase_actuelle', np.int64),
+    ('moteur_actif', np.bool_),
+    ('moteur_elec_actif', np.bool_),
+    ('recup_frein_effectuee', np.bool_),
+    ('redemarrage_effectue', np.bool_),
+    ('freinage_force', np.bool_),
+    ('embrayage_verrouille', np.bool_),
+    ('t_redemarrage', np.float64),
+    ('v_redemarrage', np.float64),
+])
+
+# Indices des grandeurs écrites dans le vecteur de sortie du second membre
+S_F_MOTEUR = 0
+S_F_AERO = 1
+S_F_ROULEMENT = 2
+S_F_GRAVITE = 3
+S_F_VENT = 4
+S_F_ELEC = 5
+S_RPM_MOTEUR = 6
+S_RATIO_ENVIOLO = 7
+S_RPM_ELEC = 8
+S_JOULES_ELEC = 9
+S_ENERGIE_SUPERCAP = 10
+S_MOTEUR_THERMIQUE = 11
+S_MOTEUR_ELEC = 12
+N_SORTIES = 13
+
+# Vecteur d'état de l'automate hybride (moteur événementiel)
+E_POSITION = 0
+E_VITESSE = 1
+E_OMEGA_M = 2
+E_CONSO = 3
+E_SUPERCAP = 4
+E_JOULES_ELEC = 5
+N_ETATS_HYBRIDE = 6
+
+# Fonctions de garde : un changement de signe déclenche un événement
+G_ARRIVEE = 0            # ligne d'arrivée (terminal)
+G_ARRET = 1              # véhicule arrêté en fin de freinage (terminal)
+G_BORNE_MIN = 2          # allumage moteur thermique de la phase courante
+G_BORNE_MAX = 3          # extinction moteur thermique de la phase courante
+G_REDEMARRAGE = 4        # seuil v = 0.5 du démarrage électrique
+G_SUPERCAP = 5           # supercaps vides
+G_FREINAGE = 6           # début du freinage récupératif forcé
+G_EMBRAYAGE = 7          # engagement de l'embrayage centrifuge
+G_GLISSEMENT = 8         # collage de l'embrayage (glissement nul)
+G_VERROU_COUPLE = 9      # décollage : couple d'embrayage insuffisant
+G_VERROU_DECEL = 10      # décollage : la cloche ralentit
+G_VERROU_MOTEUR = 11     # décollage : le moteur ne suit plus la cloche
+G_SEUIL_ELEC = 12        # v = 0.1, consommation des supercaps
+G_ROUE_LIBRE = 13        # v = 1.0, passage en roue libre
+G_FREIN_ACTIF = 14       # v = 0.002, fin de la force de freinage
+G_SEUIL_RECUP = 15       # v = 0.01, fin de la récupération
+N_GARDES = 16
+
+# Profil de piste échantillonné sur une grille uniforme en distance
+TrackProfile = namedtuple("TrackProfile", [
+    "x0", "dx", "inv_dx", "distance",
+    "pente", "sin_pente", "cap", "rayon_courbure", "denivele",
+])
+
+RESOLUTION_PISTE = 0.25  # m
+
+def construire_profil_piste(distance_data, altitude_data, pos_x, pos_y,
+                            rayon_courbure=None, resolution=RESOLUTION_PISTE):
+    """
+    Rééchantillonne la piste sur une grille uniforme de pas `resolution` (m)
+    
+    La pente est celle du segment entre deux points de mesure (interpolée
+    entre les débuts de segment, comme l'ancien calcul), le cap vient du
+    gradient des coordonnées UTM et le dénivelé est l'altitude relative à la
+    ligne de départ. Sans rayon de courbure, la piste est supposée droite.
+    """
+    distance_data = np.asarray(distance_data, dtype=np.float64)
+    altitude_data = np.asarray(altitude_data, dtype=np.float64)
+    pos_x = np.asarray(pos_x, dtype=np.float64)
+    pos_y = np.asarray(pos_y, dtype=np.float64)
+    
+    x0 = distance_data[0]
+    n = int(np.ceil((distance_data[-1] - x0) / resolution)) + 1
+    grille = x0 + resolution * np.arange(n)
+    
+    angles_pente = np.arctan(np.diff(altitude_data) / np.diff(distance_data))
+    pente = np.interp(grille, distance_data[:-1], angles_pente)
+    cap = np.interp(grille, distance_data, np.arctan2(np.gradient(pos_y), np.gradient(pos_x)))
+    denivele = np.interp(grille, distance_data, altitude_data - altitude_data[0])
+    
+    if rayon_courbure is None:
+        rayon = np.full(n, np.inf)
+    else:
+        rayon_courbure = np.asarray(rayon_courbure, dtype=np.float64)
+        valide = np.isfinite(rayon_courbure)
+        rayon = np.interp(grille, distance_data[valide], rayon_courbure[valide])
+    
+    return TrackProfile(
+        float(x0), float(resolution), 1.0 / resolution, grille,
+        pente, np.sin(pente), cap, rayon, denivele,
+    )
+
+def charger_profil_piste(chemin, resolution=RESOLUTION_PISTE):
+    """Construit le profil d'un circuit depuis un CSV au format sem_2025_eu_with_rayon.csv"""
+    return TrackData(chemin).construire_profil(resolution)
+
+# Cartographies du groupe motopropulseur sur grilles uniformes en régime,
+# avec les grandeurs dérivées précalculées pour un jeu de paramètres
+TablesGroupe = namedtuple("TablesGroupe", [
+    "rpm0", "inv_drpm",
+    "couple", "ratio_enviolo", "debit_carburant", "force_roue", "force_par_couple",
+    "inv_drpm_roue", "force_elec",
+])
+
+RESOLUTION_RPM = 1.0  # tr/min
+
+def construire_tables_groupe(interp_data, params, resolution=RESOLUTION_RPM):
+    """
+    Rééchantillonne les cartographies moteur, Enviolo et moteur électrique
+    sur des grilles uniformes de pas `resolution` (tr/min) et précalcule :
+    débit de carburant (g/s) et force à la roue moteur plein couple selon le
+    régime moteur, force à la roue par N.m transmis, et force électrique à
+    la roue selon le régime roue. Les cartographies ne sont pas uniformes
+    au-delà de ~1500 tr/min : l'interpolation linéaire d'origine est
+    conservée aux points de grille.
+    """
+    p = params[0]
+    
+    # Régime moteur thermique (grille commune moteur / Enviolo)
+    rpm_max = max(interp_data.moteur_rpm[-1], interp_data.env_rpm[-1])
+    rpm0 = min(interp_data.moteur_rpm[0], interp_data.env_rpm[0])
+    n = int(np.ceil((rpm_max - rpm0) / resolution)) + 1
+    rpm = rpm0 + resolution * np.arange(n)
+    
+    couple = np.interp(rpm, interp_data.moteur_rpm, interp_data.moteur_couple)
+    csp = np.interp(rpm, interp_data.moteur_rpm, interp_data.moteur_csp)
+    if p['enviolo_on']:
+        ratio = np.interp(rpm, interp_data.env_rpm, interp_data.env_ratio)
+    else:
+        ratio = np.ones(n)
+    
+    debit = (rpm * couple * 2.0 * np.pi / 60.0 / 1000.0) * (csp / 3600.0)
+    force_par_couple = (p['rapport_chaine1'] * p['rapport_chaine2'] / ratio *
+                        p['rendement_chaine1'] * p['rendement_chaine2'] *
+                        p['rendement_transmission']) / p['rayon_roue']
+    
+    # Moteur électrique : régime moteur = 1.5 x régime roue
+    resolution_roue = resolution / 1.5
+    n_roue = int(np.ceil(interp_data.elec_rpm[-1] / 1.5 / resolution_roue)) + 1
+    rpm_roue = resolution_roue * np.arange(n_roue)
+    force_elec = np.interp(rpm_roue * 1.5, interp_data.elec_rpm, interp_data.elec_couple) * 1.5 / p['rayon_roue']
+    
+    return TablesGroupe(
+        float(rpm0), 1.0 / resolution,
+        couple, ratio, debit, couple * force_par_couple, force_par_couple,
+        1.0 / resolution_roue, force_elec,
+    )
+
+TablesInterpolation = namedtuple("TablesInterpolation", [
+    "moteur_rpm", "moteur_couple", "moteur_csp",
+    "elec_rpm", "elec_couple",
+    "env_rpm", "env_ratio",
+    "groupe", "piste",
+    "angle_data", "cx_data",
+])
+
+def lecture_seule(valeur):
+    """
+    Vue en lecture seule (sans copie) d'un tableau, appliquée récursivement
+    aux tuples nommés de tables ; les scalaires sont retournés tels quels
+    """
+    if isinstance(valeur, np.ndarray):
+        vue = np.asarray(valeur).view()
+        vue.flags.writeable = False
+        return vue
+    if isinstance(valeur, tuple) and hasattr(valeur, '_fields'):
+        return type(valeur)(*[lecture_seule(champ) for champ in valeur])
+    return valeur
+
 class InterpolationData:
     """Stockage des données d'interpolation pour njit"""
     def __init__(self):
@@ -211,396 +623,1175 @@ class InterpolationData:
         self.env_rpm = None
         self.env_ratio = None
         
-        # Données piste
-        self.distance_data = None
-        self.altitude_data = None
-        self.heading_data = None
+        # Profil de piste
+        self.piste = None
         
         # Données Cx
         self.angle_data = None
         self.cx_data = None
         
-    def load_from_existing_data(self):
-        """Charge les données depuis les variables globales déjà chargées"""
+    def load_from_existing_data(self, vehicule=None, piste=None):
+        """Charge les données du véhicule et du circuit (lues au premier accès)"""
+        vehicule = vehicule or donnees_vehicule()
+        piste = piste or donnees_piste()
         
         # Moteur thermique
-        self.moteur_rpm = moteur_consomini["n moteur"].values.astype(np.float64)
-        self.moteur_couple = (moteur_consomini["m corr"] * 0.55 * 1.06).values.astype(np.float64)
-        self.moteur_csp = (moteur_consomini["csp"] * 1.7).values.astype(np.float64)
+        self.moteur_rpm, self.moteur_couple, self.moteur_csp = vehicule.moteur_thermique
         
         # Moteur électrique
-        self.elec_rpm = moteur_elec2["rpm"].values.astype(np.float64)
-        self.elec_couple = moteur_elec2["Couple"].values.astype(np.float64)
-        self.elec_power = moteur_elec["pelec calc"].values.astype(np.float64)
+        self.elec_rpm, self.elec_couple = vehicule.moteur_electrique
+        self.elec_power = vehicule.puissance_electrique
         
         # Enviolo
-        self.env_rpm = data_enviolo["vitesse moteur"].values.astype(np.float64)
-        self.env_ratio = data_enviolo["rapport enviolo"].values.astype(np.float64)
+        self.env_rpm, self.env_ratio = vehicule.enviolo
         
         # Piste
-        self.distance_data = distance.values.astype(np.float64)
-        self.altitude_data = altitude.values.astype(np.float64)
-        self.heading_data = heading.astype(np.float64)
+        self.piste = piste.profil
         
         # Cx variable
-        self.angle_data = angle.values.astype(np.float64)
-        self.cx_data = Cx.values.astype(np.float64)
+        self.angle_data, self.cx_data = vehicule.cx_vent
+
+    def to_tables(self, params):
+        """
+        Regroupe les tableaux dans un tuple nommé passé aux noyaux njit, sans
+        copie : tous en lecture seule (vues), comme les tableaux projetés du
+        paquet binaire, pour un seul type compilé par noyau
+        """
+        return lecture_seule(TablesInterpolation(
+            self.moteur_rpm, self.moteur_couple, self.moteur_csp,
+            self.elec_rpm, self.elec_couple,
+            self.env_rpm, self.env_ratio,
+            construire_tables_groupe(self, params), self.piste,
+            self.angle_data, self.cx_data,
+        ))
+
+def construire_parametres(distance_totale, vent_active=False, vitesse_vent=0,
+                          wind_angle_global=0, aero_active=True, gravite_active=True,
+                          enviolo_on=True, moteur_elec=False, coef_aero=1.63, coef_roul=1):
+    """Construit l'enregistrement des paramètres véhicule et de course"""
+    params = np.zeros(1, dtype=PARAMETRES_DTYPE)
+    p = params[0]
+    
+    # Véhicule
+    p['resistance_roulement'] = 0.0013
+    p['coefficient_trainee'] = 0.23
+    p['surface_frontale'] = 0.789
+    p['masse'] = 224.0
+    p['rayon_roue'] = 0.279
+    p['rendement_chaine1'] = 0.97
+    p['rendement_chaine2'] = 0.97
+    p['rendement_transmission'] = 0.83
+    p['rapport_chaine1'] = 95.0/11.0
+    p['rapport_chaine2'] = 2.4
+    p['g'] = 9.81
+    p['densite_air'] = 1.225
+    
+    # Embrayage
+    p['m_mass'] = 0.0774
+    p['r_mass'] = 0.0316
+    p['N_mass'] = 4.0
+    p['F_ressort'] = 28.23
+    p['mu_clutch'] = 0.3
+    p['R_cloche'] = 0.045
+    
+    # Supercondensateurs
+    p['rendement_recup'] = rendement_recup
+    p['a_max_freinage'] = a_max_freinage
+    p['energie_supercap_initiale'] = 3000.0
+    
+    # Conditions
+    p['distance_totale'] = distance_totale
+    p['vitesse_vent'] = vitesse_vent
+    p['wind_angle_global'] = wind_angle_global
+    p['coef_aero'] = coef_aero
+    p['coef_roul'] = coef_roul
+    p['vent_active'] = vent_active
+    p['aero_active'] = aero_active
+    p['gravite_active'] = gravite_active
+    p['enviolo_on'] = enviolo_on
+    p['moteur_elec'] = moteur_elec
+    return params
+
+def creer_mode_initial(params):
+    """Mode discret au départ arrêté (moteurs coupés, phase 0)"""
+    mode = np.zeros(1, dtype=MODE_DTYPE)
+    mode[0]['t_redemarrage'] = -1.0
+    return mode
+
+def creer_etat_initial(params):
+    """Vecteur d'état continu au départ arrêté (supercaps pleins)"""
+    etat0 = np.zeros(N_ETATS_HYBRIDE)
+    etat0[E_SUPERCAP] = params[0]['energie_supercap_initiale']
+    return etat0
 
 # =============================================================================
-# 4) Simulation optimisée
+# 4) Second membre compilé
 # =============================================================================
 
-def simuler_vehicule_optimise(distance_totale, bornes_vitesse, temps_max=500,
-                             vent_active=False, vitesse_vent=0, wind_angle_global=0,
-                             aero_active=True, gravite_active=True, enviolo_on=True,
-                             moteur_elec=False, coef_aero=1.63, coef_roul=1,
-                             plot=True, debug_mode=False):
+@njit(cache=True)
+def pente_grille_njit(x, x0, inv_dx, valeurs):
+    """Pente de la cellule de grille uniforme contenant x (0 hors de la grille)"""
+    u = (x - x0) * inv_dx
+    if u <= 0.0 or u >= valeurs.shape[0] - 1:
+        return 0.0
+    i = int(u)
+    return (valeurs[i + 1] - valeurs[i]) * inv_dx
+
+@njit(cache=True)
+def forces_et_derivees_njit(pos, v, omega_m, moteur_actif, moteur_elec_actif, freinage_force,
+                            embrayage_verrouille, params, tables, sortie):
     """
-    Version optimisée de la simulation avec njit
+    Forces et dérivées continues pour un mode discret figé
+    
+    Retourne (dpos_dt, dv_dt, domega_m_dt, dconso_dt, F_elec, glissement,
+    C_embre_max, couple_moteur, domega_debraye) et écrit forces, régimes et
+    rapport dans `sortie`. domega_debraye est l'accélération du moteur seul,
+    embrayage ouvert.
     """
+    p = params[0]
+    groupe = tables.groupe
+    masse = p.masse
     
-    # Chargement des données
-    interp_data = InterpolationData()
-    interp_data.load_from_existing_data()
+    # Calcul du régime moteur
+    if moteur_actif:
+        rpm_moteur = omega_m * 60.0 / (2.0 * np.pi)
+        couple_moteur = interp_grille_njit(rpm_moteur, groupe.rpm0, groupe.inv_drpm, groupe.couple)
+    else:
+        rpm_moteur = 0.0
+        couple_moteur = 0.0
     
-    # Paramètres véhicule (convertis en arrays njit)
-    params_array = np.array([
-        0.0013,  # resistance_roulement
-        0.23,    # coefficient_trainee
-        0.789,   # surface_frontale
-        224.0,   # masse
-        0.279,   # rayon_roue
-        0.97,    # rendement_chaine1
-        0.97,    # rendement_chaine2
-        0.83,    # rendement_transmission
-        95.0/11.0,  # rapport_chaine1
-        2.4,     # rapport_chaine2
-        9.81,    # g
-        1.225    # densite_air
-    ], dtype=np.float64)
-    
-    # Paramètres embrayage
-    embrayage_params = np.array([
-        0.0774,  # m_mass
-        0.0316,  # r_mass
-        4.0,     # N_mass
-        28.23,   # F_ressort
-        0.3,     # mu_clutch
-        0.045    # R_cloche
-    ], dtype=np.float64)
+    # Moteur électrique
+    if p.moteur_elec and moteur_elec_actif:
+        omega_roue = v / p.rayon_roue if v > 0 else 0.0
+        rpm_roue = max(omega_roue * 60.0 / (2.0 * np.pi), 0.0)
+        rpm_mot_elec = rpm_roue * 1.5
+        F_elec = interp_grille_njit(rpm_roue, 0.0, groupe.inv_drpm_roue, groupe.force_elec)
+    else:
+        rpm_mot_elec = 0.0
+        F_elec = 0.0
     
-    # Préparation des phases
-    bornes_flat = np.array([item for sublist in bornes_vitesse for item in sublist], dtype=np.float64)
-    phases_terminees = np.zeros(len(bornes_vitesse), dtype=np.bool_)
-    phases_activees = np.zeros(len(bornes_vitesse), dtype=np.bool_)
+    # Calcul embrayage
+    C_embre_max, embrayage_actif = calcul_embrayage_njit(
+        omega_m, p.m_mass, p.r_mass, p.N_mass, p.F_ressort, p.mu_clutch, p.R_cloche
+    )
     
-    # Variables globales
-    phase_actuelle = 0
-    moteur_actif = False
-    moteur_elec_actif = False
-    moteur_actif_last = False
-    joules_elec = 0.0
-    t_last = 0.0
-    v_last = 0.0
-    recup_frein_effectuee = False
-    redemarrage_effectue = False
-    freinage_force = False
-    energie_supercap = 3000
-
-    energie_cinetique_initiale_freinage = 0.0
-    # Listes pour tracking
-    forces_temp = {"motor": [], "aero": [], "rolling": [], "gravity": [], "wind": [], "elec": []}
-    regimes_moteur_temp = []
-    regime_mot_elec_temp = []
-    ratios_utilises_temp = []
-    forces_calculees_temps = []
-    joules_elec_temp = []
-    energie_supercap_temp = []
-    moteur_elec_etat_temp = []
-    moteur_thermique_etat_temp = []
-    energie_depart_supercap = energie_supercap 
-    
-    def equations_dynamiques_optimisees(t, etat):
-        nonlocal phase_actuelle, moteur_actif, moteur_elec_actif, moteur_actif_last
-        nonlocal joules_elec, t_last, v_last, phases_terminees, phases_activees
-        nonlocal recup_frein_effectuee,redemarrage_effectue,freinage_force, energie_supercap
-        nonlocal energie_cinetique_initiale_freinage,energie_depart_supercap
-
-        pos, v, omega_m, conso = etat
-        
-        # Condition terminale
-        if pos >= distance_totale:
-            # Mise à jour des listes pour éviter les erreurs d'interpolation
-            forces_calculees_temps.append(t)
-            for key in forces_temp:
-                forces_temp[key].append(0.0)
-            regimes_moteur_temp.append(0.0)
-            ratios_utilises_temp.append(0.0)
-            if moteur_elec:
-                regime_mot_elec_temp.append(0.0)
-            joules_elec_temp.append(joules_elec)
-            energie_supercap_temp.append(energie_supercap)
-            moteur_elec_etat_temp.append(1.0 if moteur_elec_actif else 0.0)
-            moteur_thermique_etat_temp.append(1.0 if moteur_actif else 0.0)
-            
-            return [0, 0, 0, 0]
+    # Ratio enviolo (table constante à 1 sans Enviolo)
+    ratio_enviolo = interp_grille_njit(rpm_moteur, groupe.rpm0, groupe.inv_drpm, groupe.ratio_enviolo)
+    
+    # Calcul du slip et couple transmis
+    effective_ratio = (p.rapport_chaine1 * p.rendement_chaine1 * (1.0/ratio_enviolo) *
+                       p.rendement_transmission * p.rapport_chaine2 * p.rendement_chaine2)
+    omega_cloche = (v * effective_ratio) / p.rayon_roue if v > 0 else 0.0
+    slip = omega_m - omega_cloche
+    amplitude_transmis = min(couple_moteur, C_embre_max)
+    
+    if embrayage_verrouille:
+        # Embrayage collé : la force motrice est celle du couple moteur
+        C_transmis_brut = 0.0
+    else:
+        C_transmis_brut = amplitude_transmis if slip > 0 else 0.0
+    
+    # Pente et cap lus sur la grille uniforme du profil de piste
+    piste = tables.piste
+    sin_pente = interp_grille_njit(pos, piste.x0, piste.inv_dx, piste.sin_pente)
+    heading = interp_grille_njit(pos, piste.x0, piste.inv_dx, piste.cap)
+    
+    # Cx selon l'angle relatif du vent
+    if p.vent_active:
+        vx = p.vitesse_vent * np.cos(p.wind_angle_global)
+        vy = p.vitesse_vent * np.sin(p.wind_angle_global)
+        phi = np.arctan2(vy, vx) - heading
+        phi = (phi + np.pi) % (2*np.pi) - np.pi
+        angle_rel_deg = abs(np.degrees(phi))
+        Cx_wind = interp_linear_njit(angle_rel_deg, tables.angle_data, tables.cx_data)
+    else:
+        Cx_wind = p.coefficient_trainee
+    
+    # Force moteur : plein couple tabulé, ou couple limité par l'embrayage
+    if 0.0 < C_transmis_brut < couple_moteur:
+        F_moteur = C_transmis_brut * interp_grille_njit(rpm_moteur, groupe.rpm0, groupe.inv_drpm,
+                                                        groupe.force_par_couple)
+    elif couple_moteur > 0:
+        F_moteur = interp_grille_njit(rpm_moteur, groupe.rpm0, groupe.inv_drpm, groupe.force_roue)
+    else:
+        F_moteur = 0.0
+    
+    # Calcul des forces résistantes
+    F_aero, F_roulement, F_gravite, F_wind = calcul_forces_njit(
+        v, p.resistance_roulement, p.coefficient_trainee, p.surface_frontale, masse,
+        p.g, p.densite_air, sin_pente, p.aero_active, p.gravite_active, p.vent_active,
+        p.vitesse_vent, p.wind_angle_global, heading, Cx_wind
+    )
+    F_freinage = 0.0
+    if freinage_force and v > 0.002:
+        F_freinage = -masse * p.a_max_freinage  # F = m * a_max
+    
+    # Calcul des dérivées
+    dpos_dt, dv_dt, domega_m_dt, roue_libre_active = calcul_dynamique_njit(
+        pos, v, omega_m, couple_moteur, C_transmis_brut, ratio_enviolo,
+        masse, p.rayon_roue, p.rapport_chaine1, p.rapport_chaine2,
+        F_moteur, F_aero, F_roulement, F_gravite, F_wind, F_elec, F_freinage,
+        moteur_actif, moteur_elec_actif, p.coef_aero, p.coef_roul
+    )
+    
+    if moteur_actif:
+        inertie = 0.00201 + masse * (p.rayon_roue * p.rayon_roue) / ((p.rapport_chaine1 * p.rapport_chaine2) / ratio_enviolo) ** 2
+        domega_debraye = couple_moteur / inertie
+    else:
+        domega_debraye = 0.0
+    
+    if embrayage_verrouille and moteur_actif:
+        # Régime moteur asservi à la cloche : dérivée de omega_m * ratio(omega_m) = v * k / r
+        k_cinematique = effective_ratio * ratio_enviolo
+        pente_ratio = pente_grille_njit(rpm_moteur, groupe.rpm0, groupe.inv_drpm,
+                                        groupe.ratio_enviolo) * 60.0 / (2.0 * np.pi)
+        domega_m_dt = ((k_cinematique * dv_dt / (p.rayon_roue * ratio_enviolo)) /
+                       (1.0 + v * k_cinematique * pente_ratio / (p.rayon_roue * ratio_enviolo**2)))
+    
+    # Calcul de la consommation
+    if rpm_moteur > 0 and moteur_actif:
+        dconso_dt = interp_grille_njit(rpm_moteur, groupe.rpm0, groupe.inv_drpm, groupe.debit_carburant)
+    else:
+        dconso_dt = 0.0
+    
+    # Grandeurs pour les graphiques
+    sortie[S_F_MOTEUR] = F_moteur
+    sortie[S_F_AERO] = F_aero
+    sortie[S_F_ROULEMENT] = F_roulement
+    sortie[S_F_GRAVITE] = F_gravite
+    sortie[S_F_VENT] = F_wind
+    sortie[S_F_ELEC] = F_elec
+    sortie[S_RPM_MOTEUR] = rpm_moteur
+    sortie[S_RATIO_ENVIOLO] = ratio_enviolo
+    sortie[S_RPM_ELEC] = rpm_mot_elec
+    sortie[S_MOTEUR_THERMIQUE] = 1.0 if moteur_actif else 0.0
+    sortie[S_MOTEUR_ELEC] = 1.0 if moteur_elec_actif else 0.0
+    
+    return dpos_dt, dv_dt, domega_m_dt, dconso_dt, F_elec, slip, C_embre_max, couple_moteur, domega_debraye
+
+@njit(cache=True)
+def derivees_hybride_njit(t, y, mode, params, tables, sortie):
+    """Second membre pur de l'automate hybride : le mode discret est seulement lu"""
+    p = params[0]
+    m = mode[0]
+    dy = np.zeros(N_ETATS_HYBRIDE)
+    v = y[E_VITESSE]
+    
+    dpos_dt, dv_dt, domega_m_dt, dconso_dt, F_elec, _, _, _, _ = forces_et_derivees_njit(
+        y[E_POSITION], v, y[E_OMEGA_M], m.moteur_actif, m.moteur_elec_actif,
+        m.freinage_force, m.embrayage_verrouille, params, tables, sortie
+    )
+    
+    # Supercaps : décharge par le moteur électrique, recharge au freinage
+    dE_dt = 0.0
+    if m.moteur_elec_actif and v > 0.1:
+        eta_elec = 0.6
+        dE_dt -= F_elec * v / eta_elec
+    if m.freinage_force and not m.recup_frein_effectuee and v > 0.01:
+        dE_dt += p.rendement_recup * max(-p.masse * v * dv_dt, 0.0)
+    
+    sortie[S_JOULES_ELEC] = y[E_JOULES_ELEC]
+    sortie[S_ENERGIE_SUPERCAP] = y[E_SUPERCAP]
+    
+    dy[E_POSITION] = dpos_dt
+    dy[E_VITESSE] = dv_dt
+    dy[E_OMEGA_M] = domega_m_dt
+    dy[E_CONSO] = dconso_dt
+    dy[E_SUPERCAP] = dE_dt
+    dy[E_JOULES_ELEC] = 21.5  # Passive
+    return dy
+
+@njit(cache=True)
+def gardes_njit(t, y, mode, phases_terminees, bornes_flat, params, tables, sortie, g):
+    """Évalue les fonctions de garde de l'automate hybride dans `g` (1.0 si inactive)"""
+    p = params[0]
+    m = mode[0]
+    pos = y[E_POSITION]
+    v = y[E_VITESSE]
+    omega_m = y[E_OMEGA_M]
+    for k in range(N_GARDES):
+        g[k] = 1.0
+    
+    g[G_ARRIVEE] = pos - p.distance_totale
+    if m.freinage_force:
+        # Arrêt au seuil de coupure du frein (sinon glissement v = 0.002 en descente)
+        g[G_ARRET] = v - 0.002
+    
+    n_phases = len(bornes_flat) // 2
+    if m.phase_actuelle < n_phases and not phases_terminees[m.phase_actuelle]:
+        g[G_BORNE_MIN] = v - bornes_flat[m.phase_actuelle * 2]
+        g[G_BORNE_MAX] = v - bornes_flat[m.phase_actuelle * 2 + 1]
+    g[G_REDEMARRAGE] = v - 0.5
+    if m.moteur_elec_actif:
+        g[G_SUPERCAP] = y[E_SUPERCAP]
+    if not m.freinage_force:
+        energie_manquante = max(p.energie_supercap_initiale - y[E_SUPERCAP], 0.0) / p.rendement_recup
+        d_freinage_theorique = energie_manquante / (p.masse * p.a_max_freinage)
+        g[G_FREINAGE] = (p.distance_totale - pos) - d_freinage_theorique * 1.05
+    g[G_EMBRAYAGE] = omega_m - np.sqrt(p.F_ressort / (p.m_mass * p.r_mass))
+    
+    if m.moteur_actif:
+        _, _, domega_m_dt, _, _, slip, C_embre_max, couple_moteur, domega_debraye = forces_et_derivees_njit(
+            pos, v, omega_m, m.moteur_actif, m.moteur_elec_actif,
+            m.freinage_force, m.embrayage_verrouille, params, tables, sortie
+        )
+        if m.embrayage_verrouille:
+            g[G_VERROU_COUPLE] = C_embre_max - couple_moteur
+            g[G_VERROU_DECEL] = domega_m_dt
+            g[G_VERROU_MOTEUR] = domega_debraye - domega_m_dt
+        else:
+            g[G_GLISSEMENT] = slip
+    
+    g[G_SEUIL_ELEC] = v - 0.1
+    g[G_ROUE_LIBRE] = v - 1.0
+    g[G_FREIN_ACTIF] = v - 0.002
+    g[G_SEUIL_RECUP] = v - 0.01
+
+@njit(cache=True)
+def mettre_a_jour_mode_njit(t, y, mode, phases_terminees, phases_activees, bornes_flat,
+                            params, tables, sortie, garde):
+    """
+    Transitions discrètes de l'automate hybride à l'état y, appliquées jusqu'à
+    stabilité. `garde` est l'indice de la garde déclenchée (-1 au départ).
+    Modifie `mode` et les sauts d'état (supercaps, énergie de redémarrage).
+    """
+    p = params[0]
+    m = mode[0]
+    pos = y[E_POSITION]
+    v = y[E_VITESSE]
+    if y[E_SUPERCAP] < 0.0:
+        y[E_SUPERCAP] = 0.0
+    
+    for _ in range(len(bornes_flat) // 2 + 3):
+        moteur_avant = m.moteur_actif
+        elec_avant = m.moteur_elec_actif
+        phase_avant = m.phase_actuelle
+        freinage_avant = m.freinage_force
         
-        forces_calculees_temps.append(t)
-        dt = t - t_last
-
-        masse = params_array[3]
+        energie_manquante = max(p.energie_supercap_initiale - y[E_SUPERCAP], 0.0) / p.rendement_recup
+        d_freinage_theorique = energie_manquante / (p.masse * p.a_max_freinage)
+        if not m.freinage_force and p.distance_totale - pos <= d_freinage_theorique * 1.05:
+            m.freinage_force = True
         
-
-        energie_a_recuperer = max(energie_depart_supercap - energie_supercap, 0.0)
-        energie_manquante = energie_a_recuperer / rendement_recup
-
-        # Distance nécessaire au freinage avec cette décélération max
-        d_freinage_theorique = energie_manquante / (masse * a_max_freinage)
-        distance_restante = distance_totale - pos
-
-        if not freinage_force and distance_restante <= d_freinage_theorique * 1.05:
-            freinage_force = True
-
-        # Récupération d'énergie de freinage pendant le freinage
-        if freinage_force and not recup_frein_effectuee and v > 0.01:
-            delta_ec = 0.5 * masse * (v_last**2 - v**2)
-            energie_recuperee = rendement_recup * max(delta_ec, 0.0)
-            energie_supercap += energie_recuperee
-
-            if v < 0.01:
-                recup_frein_effectuee = True
         # Redémarrage par moteur électrique
-        if v < 0.5 and energie_supercap > 0 and not redemarrage_effectue:
-            moteur_elec_actif = True
-            moteur_actif = False
-
-        # Si vitesse franchit le seuil d’embrayage : moteur thermique reprend
-        if moteur_elec_actif and energie_supercap <= 0.0:
-            print(f"[t={t:.2f}s] Vitesse atteinte avec 3000J: {v:.2f} m/s")
-            moteur_elec_actif = False
-            moteur_actif = True
-            redemarrage_effectue = True
-
-        # Gestion des phases avec njit
-        moteur_actif, phase_actuelle, _, _ = gestion_phases_njit(
-            v, v_last, phase_actuelle, bornes_flat,
-            phases_terminees, phases_activees, moteur_actif
+        if v < 0.5 and y[E_SUPERCAP] > 0 and not m.redemarrage_effectue:
+            m.moteur_elec_actif = True
+            m.moteur_actif = False
+        
+        # Supercaps vides : le moteur thermique reprend
+        if m.moteur_elec_actif and y[E_SUPERCAP] <= 0.0:
+            m.t_redemarrage = t
+            m.v_redemarrage = v
+            m.moteur_elec_actif = False
+            m.moteur_actif = True
+            m.redemarrage_effectue = True
+        
+        # Gestion des phases (le démarrage électrique reste prioritaire)
+        if not m.moteur_elec_actif:
+            moteur_actif, phase_actuelle, _, _ = gestion_phases_njit(
+                v, v, m.phase_actuelle, bornes_flat,
+                phases_terminees, phases_activees, m.moteur_actif
+            )
+            m.moteur_actif = moteur_actif
+            m.phase_actuelle = phase_actuelle
+        
+        if m.moteur_actif and not moteur_avant:
+            y[E_JOULES_ELEC] += 400.0  # Redémarrage
+        
+        if (m.moteur_actif == moteur_avant and m.moteur_elec_actif == elec_avant and
+                m.phase_actuelle == phase_avant and m.freinage_force == freinage_avant):
+            break
+    
+    # Embrayage : collage au glissement nul, décollage sur les gardes de verrouillage
+    if not m.moteur_actif:
+        m.embrayage_verrouille = False
+    elif garde == G_VERROU_COUPLE or garde == G_VERROU_DECEL or garde == G_VERROU_MOTEUR:
+        m.embrayage_verrouille = False
+    elif garde == G_GLISSEMENT and not m.embrayage_verrouille:
+        _, _, domega_verrouille, _, _, _, C_embre_max, couple_moteur, domega_debraye = forces_et_derivees_njit(
+            pos, v, y[E_OMEGA_M], True, m.moteur_elec_actif,
+            m.freinage_force, True, params, tables, sortie
         )
+        if C_embre_max >= couple_moteur and 0.0 <= domega_verrouille <= domega_debraye:
+            m.embrayage_verrouille = True
 
-        # Calcul du régime moteur
-        if moteur_actif:
-            rpm_moteur = omega_m * 60.0 / (2.0 * np.pi)
-            couple_moteur = interp_linear_njit(rpm_moteur, interp_data.moteur_rpm, interp_data.moteur_couple)
-        else:
-            rpm_moteur = 0.0
-            couple_moteur = 0
-            
-        # Moteur électrique
-        if moteur_elec and moteur_elec_actif:
-            omega_roue = v / params_array[4] if v > 0 else 0
-            rpm_roue = max(omega_roue * 60.0 / (2.0 * np.pi), 0)
-            rpm_mot_elec = rpm_roue *1.5
-            couple_electrique = interp_linear_njit(rpm_mot_elec, interp_data.elec_rpm, interp_data.elec_couple)
-            F_elec = couple_electrique * 1.5/ params_array[4]
+# =============================================================================
+# 5) Intégrateurs compilés
+# =============================================================================
+
+# Schémas disponibles pour la boucle temporelle njit
+INTEGRATEUR_DOPRI5 = 0
+INTEGRATEUR_RK4 = 1
+INTEGRATEUR_EULER_SEMI_IMPLICITE = 2
+
+INTEGRATEURS = {
+    'dopri5': INTEGRATEUR_DOPRI5,
+    'rk4': INTEGRATEUR_RK4,
+    'euler_semi_implicite': INTEGRATEUR_EULER_SEMI_IMPLICITE,
+}
+
+# Tableau de Butcher Dormand-Prince 5(4), identique à scipy RK45
+DOPRI5_C = np.array([0.0, 1/5, 3/10, 4/5, 8/9, 1.0])
+DOPRI5_A = np.array([
+    [0.0, 0.0, 0.0, 0.0, 0.0],
+    [1/5, 0.0, 0.0, 0.0, 0.0],
+    [3/40, 9/40, 0.0, 0.0, 0.0],
+    [44/45, -56/15, 32/9, 0.0, 0.0],
+    [19372/6561, -25360/2187, 64448/6561, -212/729, 0.0],
+    [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+])
+DOPRI5_B = np.array([35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84])
+DOPRI5_E = np.array([-71/57600, 0.0, 71/16695, -71/1920, 17253/339200, -22/525, 1/40])
+# Coefficients de la sortie dense (polynôme d'ordre 4)
+DOPRI5_P = np.array([
+    [1.0, -8048581381/2820520608, 8663915743/2820520608, -12715105075/11282082432],
+    [0.0, 0.0, 0.0, 0.0],
+    [0.0, 131558114200/32700410799, -68118460800/10900136933, 87487479700/32700410799],
+    [0.0, -1754552775/470086768, 14199869525/1410260304, -10690763975/1880347072],
+    [0.0, 127303824393/49829197408, -318862633887/49829197408, 701980252875/199316789632],
+    [0.0, -282668133/205662961, 2019193451/616988883, -1453857185/822651844],
+    [0.0, 40617522/29380423, -110615467/29380423, 69997945/29380423],
+])
+DOPRI5_SAFETY = 0.9
+DOPRI5_MIN_FACTOR = 0.2
+DOPRI5_MAX_FACTOR = 10.0
+
+@njit(cache=True)
+def _norme_rms(x):
+    """Norme RMS (comme scipy.integrate)"""
+    somme = 0.0
+    for i in range(x.size):
+        somme += x[i] * x[i]
+    return np.sqrt(somme / x.size)
+
+@njit(cache=True)
+def _agrandir_tampons(t_buf, y_buf, s_buf):
+    """Double la capacité des tampons de sortie"""
+    n = t_buf.shape[0]
+    t_new = np.empty(2 * n)
+    y_new = np.empty((2 * n, y_buf.shape[1]))
+    s_new = np.empty((2 * n, s_buf.shape[1]))
+    t_new[:n] = t_buf
+    y_new[:n] = y_buf
+    s_new[:n] = s_buf
+    return t_new, y_new, s_new
+
+@njit(cache=True)
+def _enregistrer(t_buf, y_buf, s_buf, n, t, y, sortie):
+    """Ajoute un échantillon aux tampons de télémétrie (agrandis si pleins)"""
+    if n == t_buf.shape[0]:
+        t_buf, y_buf, s_buf = _agrandir_tampons(t_buf, y_buf, s_buf)
+    t_buf[n] = t
+    y_buf[n] = y
+    s_buf[n] = sortie
+    return t_buf, y_buf, s_buf, n + 1
+
+@njit(cache=True)
+def sortie_dense_dopri5(K, y_old, h, x):
+    """Évalue la sortie dense Dormand-Prince en t_old + x*h (0 <= x <= 1)"""
+    y = y_old.copy()
+    for i in range(y.size):
+        q = 0.0
+        puissance = x
+        for j in range(4):
+            coef = 0.0
+            for s in range(7):
+                coef += K[s, i] * DOPRI5_P[s, j]
+            q += coef * puissance
+            puissance *= x
+        y[i] += h * q
+    return y
+
+@njit(cache=True)
+def _localiser_seuil_dopri5(K, y_old, h, indice, seuil):
+    """Fraction du pas où y[indice] franchit `seuil` (bissection sur la sortie dense)"""
+    au_dessus = y_old[indice] >= seuil
+    x_bas = 0.0
+    x_haut = 1.0
+    for _ in range(60):
+        x_milieu = 0.5 * (x_bas + x_haut)
+        if (sortie_dense_dopri5(K, y_old, h, x_milieu)[indice] >= seuil) != au_dessus:
+            x_haut = x_milieu
         else:
-            couple_electrique = 0.0
-            rpm_mot_elec = 0.0
-            F_elec = 0.0
-        
-        # Consommation supercap pendant usage électrique
-        if moteur_elec_actif and v > 0.1:
-            eta_elec = 0.6
-            puissance_moteur_elec = F_elec * v  # en watts
-            energie_utilisee = puissance_moteur_elec * dt / eta_elec
-            energie_supercap = max(0.0, energie_supercap - energie_utilisee)
-
-
-        # Calcul embrayage avec njit
-        C_embre_max, embrayage_actif = calcul_embrayage_njit(
-            omega_m, embrayage_params[0], embrayage_params[1], 
-            embrayage_params[2], embrayage_params[3], 
-            embrayage_params[4], embrayage_params[5]
-        )
+            x_bas = x_milieu
+    return x_haut
+
+@njit(cache=True)
+def _pas_initial_dopri5(t, y, f, temps_max, pas_max, rtol, atol, mode, params, tables, sortie):
+    """Pas initial (Hairer, Norsett & Wanner, sec. II.4), plafonné à pas_max"""
+    scale = atol + np.abs(y) * rtol
+    d0 = _norme_rms(y / scale)
+    d1 = _norme_rms(f / scale)
+    if d0 < 1e-5 or d1 < 1e-5:
+        h0 = 1e-6
+    else:
+        h0 = 0.01 * d0 / d1
+    h0 = min(h0, temps_max)
+    f1 = derivees_hybride_njit(t + h0, y + h0 * f, mode, params, tables, sortie)
+    d2 = _norme_rms((f1 - f) / scale) / h0
+    if d1 <= 1e-15 and d2 <= 1e-15:
+        h1 = max(1e-6, h0 * 1e-3)
+    else:
+        h1 = (0.01 / max(d1, d2)) ** (1.0 / 5.0)
+    return min(100 * h0, h1, temps_max, pas_max)
+
+@njit(cache=True)
+def _etages_dopri5(t, y, f, h, K, mode, params, tables, sortie):
+    """Étages Dormand-Prince du pas h (rangés dans K) ; retourne l'état en t + h et sa dérivée"""
+    K[0] = f
+    for s in range(1, 6):
+        y_etage = y.copy()
+        for j in range(s):
+            y_etage += h * DOPRI5_A[s, j] * K[j]
+        K[s] = derivees_hybride_njit(t + DOPRI5_C[s] * h, y_etage, mode, params, tables, sortie)
+    y_new = y.copy()
+    for j in range(6):
+        y_new += h * DOPRI5_B[j] * K[j]
+    f_new = derivees_hybride_njit(t + h, y_new, mode, params, tables, sortie)
+    K[6] = f_new
+    return y_new, f_new
+
+@njit(cache=True)
+def _norme_erreur_dopri5(K, y, y_new, h, rtol, atol):
+    """Norme de l'erreur locale estimée (comme scipy RK45)"""
+    scale = atol + np.maximum(np.abs(y), np.abs(y_new)) * rtol
+    erreur = np.zeros(y.size)
+    for j in range(7):
+        erreur += K[j] * DOPRI5_E[j]
+    return _norme_rms(erreur * h / scale)
+
+@njit(cache=True)
+def _pas_dopri5(t, y, f, h_abs, temps_max, pas_max, rtol, atol, K, mode, params, tables, sortie):
+    """
+    Un pas Dormand-Prince accepté depuis (t, y), en partant du pas proposé
+    h_abs (plafonné à pas_max, contrôle d'erreur de scipy RK45). Retourne
+    t_new, h, y_new, f_new, le pas proposé pour la suite et un statut (0, ou
+    -1 si le pas est devenu trop petit). K contient les étages du pas.
+    """
+    min_step = 10 * np.abs(np.nextafter(t, np.inf) - t)
+    if h_abs > pas_max:
+        h_abs = pas_max
+    elif h_abs < min_step:
+        h_abs = min_step
+    
+    pas_rejete = False
+    while True:
+        if h_abs < min_step:
+            return t, 0.0, y, f, h_abs, -1
+        t_new = t + h_abs
+        if t_new > temps_max:
+            t_new = temps_max
+        h = t_new - t
+        h_abs = np.abs(h)
+        
+        y_new, f_new = _etages_dopri5(t, y, f, h, K, mode, params, tables, sortie)
+        error_norm = _norme_erreur_dopri5(K, y, y_new, h, rtol, atol)
         
-        # Ratio enviolo
-        if enviolo_on:
-            ratio_enviolo = interp_linear_njit(rpm_moteur, interp_data.env_rpm, interp_data.env_ratio)
+        if error_norm < 1:
+            if error_norm == 0:
+                facteur = DOPRI5_MAX_FACTOR
+            else:
+                facteur = min(DOPRI5_MAX_FACTOR, DOPRI5_SAFETY * error_norm ** -0.2)
+            if pas_rejete:
+                facteur = min(1.0, facteur)
+            return t_new, h, y_new, f_new, h_abs * facteur, 0
+        h_abs *= max(DOPRI5_MIN_FACTOR, DOPRI5_SAFETY * error_norm ** -0.2)
+        pas_rejete = True
+
+@njit(cache=True)
+def _valeur_grille(t, y, etat_grille):
+    """Grandeur indexant la grille de sortie : l'instant, ou l'état `etat_grille` (croissant)"""
+    if etat_grille < 0:
+        return t
+    return y[etat_grille]
+
+@njit(cache=True)
+def _fin_de_tour(y_old, y_new, mode, params):
+    """
+    Indice et seuil de la condition d'arrêt franchie sur le pas (ligne
+    d'arrivée ou arrêt en fin de freinage), indice -1 sinon
+    """
+    p = params[0]
+    if y_old[E_POSITION] < p.distance_totale <= y_new[E_POSITION]:
+        return E_POSITION, p.distance_totale
+    if mode[0].freinage_force and y_old[E_VITESSE] > 0.002 >= y_new[E_VITESSE]:
+        return E_VITESSE, 0.002
+    return -1, 0.0
+
+@njit(cache=True)
+def integrer_njit(methode, temps_max, pas, rtol, atol, etat0, mode,
+                  phases_terminees, phases_activees, bornes_flat, params, tables,
+                  t_sortie=np.empty(0), etat_grille=-1):
+    """
+    Boucle temporelle complète en njit sur le second membre pur
+    
+    methode : INTEGRATEUR_DOPRI5 (pas adaptatif plafonné à `pas`, même contrôle
+    d'erreur que scipy RK45), INTEGRATEUR_RK4 ou INTEGRATEUR_EULER_SEMI_IMPLICITE
+    (pas fixe `pas`). Le mode discret est mis à jour après chaque pas accepté
+    (sans localisation des commutations, contrairement à integrer_hybride_njit).
+    L'intégration s'arrête à la ligne d'arrivée, à l'arrêt du véhicule en fin
+    de freinage, ou à temps_max.
+    
+    La télémétrie est enregistrée aux pas acceptés, ou aux valeurs croissantes
+    de `t_sortie` s'il est non vide (sortie dense pour dopri5, interpolation
+    linéaire pour les schémas à pas fixe) suivies de l'instant final. Ces
+    valeurs sont des instants, ou si `etat_grille` >= 0 des valeurs de cet
+    état croissant (E_POSITION : une grille en distance).
+    
+    Retourne les instants, les états (n, N_ETATS_HYBRIDE), les sorties du
+    second membre à ces instants (n, N_SORTIES), l'instant de franchissement
+    de la ligne d'arrivée (-1 si non atteinte) et un statut (0 = succès,
+    -1 = pas devenu trop petit).
+    """
+    n_etats = etat0.size
+    sur_grille = t_sortie.size > 0
+    capacite = t_sortie.size + 1 if sur_grille else 4096
+    t_buf = np.empty(capacite)
+    y_buf = np.empty((capacite, n_etats))
+    s_buf = np.empty((capacite, N_SORTIES))
+    sortie = np.zeros(N_SORTIES)
+    sortie_grille = np.zeros(N_SORTIES)
+    K = np.empty((7, n_etats))
+    
+    t = 0.0
+    y = etat0.copy()
+    mettre_a_jour_mode_njit(t, y, mode, phases_terminees, phases_activees, bornes_flat,
+                            params, tables, sortie, -1)
+    f = derivees_hybride_njit(t, y, mode, params, tables, sortie)
+    n = 0
+    i_grille = 0
+    if not sur_grille:
+        t_buf, y_buf, s_buf, n = _enregistrer(t_buf, y_buf, s_buf, n, t, y, sortie)
+    else:
+        while i_grille < t_sortie.size and t_sortie[i_grille] <= _valeur_grille(t, y, etat_grille):
+            t_g = t_sortie[i_grille] if etat_grille < 0 else t
+            t_buf, y_buf, s_buf, n = _enregistrer(t_buf, y_buf, s_buf, n, t_g, y, sortie)
+            i_grille += 1
+    t_arrivee = -1.0
+    statut = 0
+    
+    if methode == INTEGRATEUR_DOPRI5:
+        h_abs = _pas_initial_dopri5(t, y, f, temps_max, pas, rtol, atol, mode, params, tables,
+                                    sortie_grille)
+    else:
+        h_abs = pas
+    i_pas = 0
+    
+    while t < temps_max:
+        if methode == INTEGRATEUR_DOPRI5:
+            t_new, h, y_new, _, h_abs, statut = _pas_dopri5(t, y, f, h_abs, temps_max, pas, rtol,
+                                                            atol, K, mode, params, tables, sortie)
+            if statut != 0:
+                break
         else:
-            ratio_enviolo = 1.0
-            
-        # Calcul du slip et couple transmis
-        effective_ratio = (params_array[8] * params_array[5] * (1.0/ratio_enviolo) * 
-                          params_array[7] * params_array[9] * params_array[6])
-        omega_cloche = (v * effective_ratio) / params_array[4] if v > 0 else 0
-        slip = omega_m - omega_cloche
-        amplitude_transmis = min(couple_moteur, C_embre_max)
+            i_pas += 1
+            t_new = min(i_pas * pas, temps_max)
+            h = t_new - t
+            if methode == INTEGRATEUR_RK4:
+                k1 = f
+                k2 = derivees_hybride_njit(t + 0.5 * h, y + 0.5 * h * k1, mode, params, tables, sortie)
+                k3 = derivees_hybride_njit(t + 0.5 * h, y + 0.5 * h * k2, mode, params, tables, sortie)
+                k4 = derivees_hybride_njit(t + h, y + h * k3, mode, params, tables, sortie)
+                y_new = y + h / 6.0 * (k1 + 2.0 * k2 + 2.0 * k3 + k4)
+            else:
+                # Euler semi-implicite : vitesse mise à jour d'abord, position avec la nouvelle vitesse
+                y_new = y + h * f
+                y_new[E_POSITION] = y[E_POSITION] + h * y_new[E_VITESSE]
         
-        C_transmis_brut = amplitude_transmis if slip > 0 else 0.0
+        # Ligne d'arrivée ou arrêt : le pas est tronqué à l'instant du franchissement
+        indice, seuil = _fin_de_tour(y, y_new, mode, params)
+        x_fin = 1.0
+        if indice >= 0:
+            if methode == INTEGRATEUR_DOPRI5:
+                x_fin = _localiser_seuil_dopri5(K, y, h, indice, seuil)
+                y_new = sortie_dense_dopri5(K, y, h, x_fin)
+            else:
+                x_fin = (seuil - y[indice]) / (y_new[indice] - y[indice])
+                y_new = (1.0 - x_fin) * y + x_fin * y_new
+            t_new = t + x_fin * h
+            if indice == E_POSITION:
+                t_arrivee = t_new
         
-        # Interpolations pour la piste et le vent
-        # Calcul de la pente
-        delta_distance = np.diff(interp_data.distance_data)
-        delta_altitude = np.diff(interp_data.altitude_data)
-        angles_pente = np.arctan(delta_altitude / delta_distance)
-        distance_pente = interp_data.distance_data[:-1]
-        
-        if pos < distance_pente[0]:
-            angle_pente = angles_pente[0]
-        elif pos > distance_pente[-1]:
-            angle_pente = angles_pente[-1]
-        else:
-            angle_pente = interp_linear_njit(pos, distance_pente, angles_pente)
-        
-        heading = interp_linear_njit(pos, interp_data.distance_data, interp_data.heading_data)
-        
-        # Pour le Cx, on prend une valeur par défaut ou on interpole selon l'angle
-        if vent_active:
-            # Calcul de l'angle relatif du vent
-            vx = vitesse_vent * np.cos(wind_angle_global)
-            vy = vitesse_vent * np.sin(wind_angle_global)
-            phi = np.arctan2(vy, vx) - heading
-            phi = (phi + np.pi) % (2*np.pi) - np.pi
-            angle_rel_deg = abs(np.degrees(phi))
-            Cx_wind = interp_linear_njit(angle_rel_deg, interp_data.angle_data, interp_data.cx_data)
-        else:
-            Cx_wind = params_array[1]  # coefficient_trainee par défaut
-        
-        # Calcul des forces avec njit
-        F_moteur, F_aero, F_roulement, F_gravite, F_wind = calcul_forces_njit(
-            pos, v, couple_moteur, ratio_enviolo, C_transmis_brut,
-            params_array[0], params_array[1], params_array[2], params_array[3],
-            params_array[4], params_array[5], params_array[6], params_array[7],
-            params_array[8], params_array[9], params_array[10], params_array[11],
-            angle_pente, aero_active, gravite_active, vent_active,
-            vitesse_vent, wind_angle_global, heading, Cx_wind
-        )
-        F_freinage = 0.0
-        if freinage_force and v > 0.002:
-            F_freinage = -params_array[3] * a_max_freinage  # F = m * a_max
-        # Calcul des dérivées avec njit
-        dpos_dt, dv_dt, domega_m_dt, roue_libre_active = calcul_dynamique_njit(
-            pos, v, omega_m, couple_moteur, C_transmis_brut, ratio_enviolo,
-            params_array[3], params_array[4], params_array[8], params_array[9],
-            F_moteur, F_aero, F_roulement, F_gravite, F_wind, F_elec,F_freinage,
-            moteur_actif, moteur_elec_actif, coef_aero, coef_roul
-        )
+        v_new = _valeur_grille(t_new, y_new, etat_grille)
+        while sur_grille and i_grille < t_sortie.size and t_sortie[i_grille] <= v_new:
+            if etat_grille < 0:
+                x = (t_sortie[i_grille] - t) / h
+            elif methode == INTEGRATEUR_DOPRI5:
+                x = _localiser_seuil_dopri5(K, y, h, etat_grille, t_sortie[i_grille])
+            else:
+                x = x_fin * (t_sortie[i_grille] - y[etat_grille]) / (y_new[etat_grille] - y[etat_grille])
+            if methode == INTEGRATEUR_DOPRI5:
+                y_grille = sortie_dense_dopri5(K, y, h, x)
+            else:
+                y_grille = (1.0 - x / x_fin) * y + (x / x_fin) * y_new
+            t_g = t + x * h
+            derivees_hybride_njit(t_g, y_grille, mode, params, tables, sortie_grille)
+            t_buf, y_buf, s_buf, n = _enregistrer(t_buf, y_buf, s_buf, n, t_g, y_grille, sortie_grille)
+            i_grille += 1
+        
+        t = t_new
+        y = y_new
+        if indice < 0:
+            # Transitions discrètes au pas accepté
+            mettre_a_jour_mode_njit(t, y, mode, phases_terminees, phases_activees, bornes_flat,
+                                    params, tables, sortie_grille, -1)
+        f = derivees_hybride_njit(t, y, mode, params, tables, sortie)
         
-        # Calcul de la consommation
-        if rpm_moteur > 0 and moteur_actif:
-            puissance_meca = rpm_moteur * couple_moteur * 2.0 * np.pi / 60.0
-            puissance_tot = puissance_meca
-            csp = interp_linear_njit(min(rpm_moteur, np.max(interp_data.moteur_rpm)), 
-                                   interp_data.moteur_rpm, interp_data.moteur_csp)
-            dconso_dt = (puissance_tot / 1000.0) * (csp / 3600.0)
+        if not sur_grille:
+            t_buf, y_buf, s_buf, n = _enregistrer(t_buf, y_buf, s_buf, n, t, y, sortie)
+        if indice >= 0:
+            break
+    
+    if sur_grille and (n == 0 or t_buf[n - 1] < t):
+        t_buf, y_buf, s_buf, n = _enregistrer(t_buf, y_buf, s_buf, n, t, y, sortie)
+    return t_buf[:n].copy(), y_buf[:n].copy(), s_buf[:n].copy(), t_arrivee, statut
+
+@njit(cache=True)
+def _localiser_garde_dopri5(K, y_old, h, t, g_old, k, mode, phases_terminees,
+                            bornes_flat, params, tables, sortie, g):
+    """Fraction du pas où la garde k change de signe (bissection sur la sortie dense)"""
+    x_bas = 0.0
+    x_haut = 1.0
+    for _ in range(50):
+        x_milieu = 0.5 * (x_bas + x_haut)
+        y_milieu = sortie_dense_dopri5(K, y_old, h, x_milieu)
+        gardes_njit(t + x_milieu * h, y_milieu, mode, phases_terminees, bornes_flat,
+                    params, tables, sortie, g)
+        if (g_old > 0 and g[k] <= 0) or (g_old < 0 and g[k] >= 0):
+            x_haut = x_milieu
         else:
-            dconso_dt = 0.0
-        
-        # Consommation électrique
-        joules_elec += 21.5 * dt  # Passive
-        if moteur_actif and not moteur_actif_last:
-            joules_elec += 400.0  # Redémarrage
-        
-        # Mise à jour des variables
-        moteur_actif_last = moteur_actif
-        t_last = t
-        v_last = v
-        
-        # Stockage pour les graphiques
-        forces_temp["motor"].append(F_moteur)
-        forces_temp["aero"].append(F_aero)
-        forces_temp["rolling"].append(F_roulement)
-        forces_temp["gravity"].append(F_gravite)
-        forces_temp["wind"].append(F_wind)
-        forces_temp["elec"].append(F_elec)
-        regimes_moteur_temp.append(rpm_moteur)
-        ratios_utilises_temp.append(ratio_enviolo)
-        if moteur_elec:
-            regime_mot_elec_temp.append(rpm_mot_elec)
-        moteur_elec_etat_temp.append(1.0 if moteur_elec_actif else 0.0)
-        moteur_thermique_etat_temp.append(1.0 if moteur_actif else 0.0)
-        energie_supercap_temp.append(energie_supercap)
-        joules_elec_temp.append(joules_elec)
-        
-        return [dpos_dt, dv_dt, domega_m_dt, dconso_dt]
-    
-    # Résolution
-    solution = solve_ivp(
-        equations_dynamiques_optimisees,
-        [0, temps_max],
-        [0, 0, 0, 0],
-        method='RK45',
-        events=[lambda t, y: y[0] - distance_totale, lambda t, y: t - temps_max],
-        max_step=0.005
+            x_bas = x_milieu
+    return x_haut
+
+# Colonnes des instantanés pris aux changements de phase (suivies de l'état)
+I_TEMPS = 0              # instant de l'événement
+I_PAS = 1                # pas courant de l'intégrateur
+I_N_ENREGISTRES = 2      # points de télémétrie enregistrés avant l'événement
+I_GRILLE = 3             # prochain indice de la grille de sortie
+I_GARDE = 4              # garde déclenchée
+I_PHASE = 5              # phase avant la transition
+N_INSTANTANE = 6
+
+@njit(cache=True)
+def _copier_mode(source, destination, i):
+    """Copie l'enregistrement source[0] dans destination[i]"""
+    d = destination[i]
+    s = source[0]
+    d.phase_actuelle = s.phase_actuelle
+    d.moteur_actif = s.moteur_actif
+    d.moteur_elec_actif = s.moteur_elec_actif
+    d.recup_frein_effectuee = s.recup_frein_effectuee
+    d.redemarrage_effectue = s.redemarrage_effectue
+    d.freinage_force = s.freinage_force
+    d.embrayage_verrouille = s.embrayage_verrouille
+    d.t_redemarrage = s.t_redemarrage
+    d.v_redemarrage = s.v_redemarrage
+
+@njit(cache=True)
+def integrer_hybride_njit(temps_max, pas_max, rtol, atol, etat0, mode,
+                          phases_terminees, phases_activees, bornes_flat, params, tables,
+                          t_sortie=np.empty(0), etat_grille=-1):
+    """
+    Intégration événementielle de l'automate hybride (Dormand-Prince 5(4))
+
+    Le second membre est pur : le mode discret (phase, moteurs, freinage,
+    embrayage collé) ne change qu'aux racines des fonctions de garde, où
+    l'intégration s'arrête, applique la transition et repart. Entre deux
+    événements le pas n'est limité que par la tolérance et `pas_max`.
+    L'intégration s'arrête à la ligne d'arrivée, à l'arrêt du véhicule en fin
+    de freinage, ou à temps_max. La télémétrie est enregistrée aux pas
+    acceptés et aux événements, ou aux valeurs croissantes de `t_sortie`
+    (sortie dense) suivies de l'instant final : des instants, ou des valeurs
+    de l'état croissant `etat_grille` s'il est >= 0 (E_POSITION : une grille
+    en distance).
+
+    Retourne les instants, les états (n, N_ETATS_HYBRIDE), les sorties,
+    l'instant d'arrivée (-1 si non atteinte) et un statut (0 = succès,
+    -1 = pas devenu trop petit).
+    """
+    n_phases = phases_terminees.size
+    t, y, s, t_arrivee, statut, _ = integrer_hybride_reprise_njit(
+        temps_max, pas_max, rtol, atol, etat0, mode, phases_terminees, phases_activees,
+        bornes_flat, params, tables, t_sortie, etat_grille, np.empty(0),
+        np.empty((n_phases, N_INSTANTANE + etat0.size)), np.empty(n_phases, dtype=MODE_DTYPE),
+        np.empty((n_phases, 2, n_phases), dtype=np.bool_)
     )
+    return t, y, s, t_arrivee, statut
+
+@njit(cache=True)
+def integrer_hybride_reprise_njit(temps_max, pas_max, rtol, atol, etat0, mode,
+                                  phases_terminees, phases_activees, bornes_flat, params, tables,
+                                  t_sortie, etat_grille, reprise, instantanes, modes_instantanes,
+                                  phases_instantanes):
+    """
+    integrer_hybride_njit avec instantanés et reprise
+
+    À chaque changement de phase, l'intégrateur enregistre son état juste
+    avant la transition : une ligne de `instantanes` (colonnes I_* suivies de
+    l'état), `modes_instantanes` et `phases_instantanes` (phases terminées et
+    activées), de capacité n_phases. La suite de l'intégration ne dépend
+    alors que des phases suivantes du programme de vitesse. Si `reprise`
+    (colonnes I_* d'un instantané) n'est pas vide, l'intégration repart de
+    cet instantané (etat0, mode et phases pris dans l'instantané) au lieu de
+    t = 0, et la télémétrie ne contient que la suite.
+
+    Retourne en plus le nombre d'instantanés enregistrés.
+    """
+    n_etats = etat0.size
+    sur_grille = t_sortie.size > 0
+    capacite = t_sortie.size + 1 if sur_grille else 1024
+    t_buf = np.empty(capacite)
+    y_buf = np.empty((capacite, n_etats))
+    s_buf = np.empty((capacite, N_SORTIES))
+    sortie = np.zeros(N_SORTIES)
+    sortie_gardes = np.zeros(N_SORTIES)
+    sortie_grille = np.zeros(N_SORTIES)
+    g_old = np.empty(N_GARDES)
+    g_new = np.empty(N_GARDES)
+    g_tmp = np.empty(N_GARDES)
+    K = np.empty((7, n_etats))
     
-    # Post-traitement
-    if len(forces_calculees_temps) == 0:
-        print("Erreur: aucune donnée de force calculée")
-        return None
+    n_inst = 0
+    reprendre = reprise.size > 0
+    if reprendre:
+        # Reprise : l'événement de l'instantané est rejoué sur le nouveau programme
+        t = reprise[I_TEMPS]
+        h_abs = reprise[I_PAS]
+        i_grille = int(reprise[I_GRILLE])
+        garde_reprise = int(reprise[I_GARDE])
+    else:
+        t = 0.0
+        h_abs = 0.0
+        i_grille = 0
+        garde_reprise = -1
+    y = etat0.copy()
+    mettre_a_jour_mode_njit(t, y, mode, phases_terminees, phases_activees, bornes_flat,
+                            params, tables, sortie, garde_reprise)
+    f = derivees_hybride_njit(t, y, mode, params, tables, sortie)
+    gardes_njit(t, y, mode, phases_terminees, bornes_flat, params, tables, sortie_gardes, g_old)
+    n = 0
+    if not sur_grille:
+        t_buf, y_buf, s_buf, n = _enregistrer(t_buf, y_buf, s_buf, n, t, y, sortie)
+    else:
+        while i_grille < t_sortie.size and t_sortie[i_grille] <= _valeur_grille(t, y, etat_grille):
+            t_g = t_sortie[i_grille] if etat_grille < 0 else t
+            t_buf, y_buf, s_buf, n = _enregistrer(t_buf, y_buf, s_buf, n, t_g, y, sortie)
+            i_grille += 1
+    t_arrivee = -1.0
+    statut = 0
     
-    # Interpolation des résultats
-    forces = {}
-    for key in forces_temp:
-        if len(forces_temp[key]) > 0:
-            f_interp = interp1d(forces_calculees_temps, forces_temp[key],
-                               bounds_error=False, fill_value='extrapolate')
-            forces[key] = f_interp(solution.t)
-        else:
-            forces[key] = np.zeros_like(solution.t)
+    if not reprendre:
+        h_abs = _pas_initial_dopri5(t, y, f, temps_max, pas_max, rtol, atol, mode, params, tables,
+                                    sortie_gardes)
     
-    if len(regimes_moteur_temp) > 0:
-        f_interp_regime = interp1d(forces_calculees_temps, regimes_moteur_temp,
-                                  bounds_error=False, fill_value='extrapolate')
-        regimes_interp = f_interp_regime(solution.t)
-    else:
-        regimes_interp = np.zeros_like(solution.t)
+    while t < temps_max:
+        t_new, h, y_new, f_new, h_abs, statut = _pas_dopri5(t, y, f, h_abs, temps_max, pas_max, rtol,
+                                                            atol, K, mode, params, tables, sortie)
+        if statut != 0:
+            break
+        
+        # Recherche du premier changement de signe des gardes sur le pas
+        gardes_njit(t_new, y_new, mode, phases_terminees, bornes_flat, params, tables, sortie_gardes, g_new)
+        x_evenement = 2.0
+        garde = -1
+        for k in range(N_GARDES):
+            if (g_old[k] > 0 and g_new[k] <= 0) or (g_old[k] < 0 and g_new[k] >= 0):
+                x = _localiser_garde_dopri5(K, y, h, t, g_old[k], k, mode, phases_terminees,
+                                            bornes_flat, params, tables, sortie_gardes, g_tmp)
+                if x < x_evenement:
+                    x_evenement = x
+                    garde = k
+        
+        terminal = False
+        if garde >= 0:
+            t_new = t + x_evenement * h
+            y_new = sortie_dense_dopri5(K, y, h, x_evenement)
+        
+        # Échantillons de la grille de sortie couverts par le pas (mode avant l'événement)
+        v_new = _valeur_grille(t_new, y_new, etat_grille)
+        while sur_grille and i_grille < t_sortie.size and t_sortie[i_grille] <= v_new:
+            if etat_grille < 0:
+                x = (t_sortie[i_grille] - t) / h
+            else:
+                x = _localiser_seuil_dopri5(K, y, h, etat_grille, t_sortie[i_grille])
+            y_grille = sortie_dense_dopri5(K, y, h, x)
+            t_g = t + x * h
+            derivees_hybride_njit(t_g, y_grille, mode, params, tables, sortie_grille)
+            t_buf, y_buf, s_buf, n = _enregistrer(t_buf, y_buf, s_buf, n, t_g, y_grille, sortie_grille)
+            i_grille += 1
+        
+        if garde >= 0:
+            if garde == G_ARRIVEE or garde == G_ARRET:
+                terminal = True
+                if garde == G_ARRIVEE:
+                    t_arrivee = t_new
+            else:
+                # Instantané avant la transition, conservé si la phase change
+                phase_avant = mode[0].phase_actuelle
+                if n_inst < instantanes.shape[0]:
+                    ligne = instantanes[n_inst]
+                    ligne[I_TEMPS] = t_new
+                    ligne[I_PAS] = h_abs
+                    ligne[I_N_ENREGISTRES] = n
+                    ligne[I_GRILLE] = i_grille
+                    ligne[I_GARDE] = garde
+                    ligne[I_PHASE] = phase_avant
+                    ligne[N_INSTANTANE:] = y_new
+                    _copier_mode(mode, modes_instantanes, n_inst)
+                    phases_instantanes[n_inst, 0] = phases_terminees
+                    phases_instantanes[n_inst, 1] = phases_activees
+                mettre_a_jour_mode_njit(t_new, y_new, mode, phases_terminees, phases_activees,
+                                        bornes_flat, params, tables, sortie_gardes, garde)
+                if mode[0].phase_actuelle != phase_avant and n_inst < instantanes.shape[0]:
+                    n_inst += 1
+            f_new = derivees_hybride_njit(t_new, y_new, mode, params, tables, sortie)
+            gardes_njit(t_new, y_new, mode, phases_terminees, bornes_flat, params, tables, sortie_gardes, g_new)
+        
+        t = t_new
+        y = y_new
+        f = f_new
+        g_old[:] = g_new
+        
+        if not sur_grille:
+            t_buf, y_buf, s_buf, n = _enregistrer(t_buf, y_buf, s_buf, n, t, y, sortie)
+        if terminal:
+            break
     
-    if len(ratios_utilises_temp) > 0:
-        f_interp_ratio = interp1d(forces_calculees_temps, ratios_utilises_temp,
-                                 bounds_error=False, fill_value='extrapolate')
-        ratios_interp = f_interp_ratio(solution.t)
-    else:
-        ratios_interp = np.ones_like(solution.t)
+    if sur_grille and (n == 0 or t_buf[n - 1] < t):
+        t_buf, y_buf, s_buf, n = _enregistrer(t_buf, y_buf, s_buf, n, t, y, sortie)
+    return t_buf[:n].copy(), y_buf[:n].copy(), s_buf[:n].copy(), t_arrivee, statut, n_inst
+
+class EnregistreurTelemetrie:
+    """Tampons de télémétrie préalloués et agrandis par doublement (moteur scipy)"""
+    def __init__(self, n_etats, capacite=4096):
+        self.t = np.empty(capacite)
+        self.y = np.empty((capacite, n_etats))
+        self.sorties = np.empty((capacite, N_SORTIES))
+        self.n = 0
     
-    if len(joules_elec_temp) > 0:
-        f_interp_elec = interp1d(forces_calculees_temps, joules_elec_temp,
-                                bounds_error=False, fill_value='extrapolate')
-        joules_elec_interp = f_interp_elec(solution.t)
-    else:
-        joules_elec_interp = np.zeros_like(solution.t)
-    if len(energie_supercap_temp) > 0:
-        f_interp_supercap = interp1d(forces_calculees_temps, energie_supercap_temp,
-                                bounds_error=False, fill_value='extrapolate')
-        energie_supercap_interp = f_interp_supercap(solution.t)
-    else:
-        energie_supercap_interp = np.zeros_like(solution.t)
+    def ajouter(self, t, y, sortie):
+        """Enregistre un échantillon (instant, état, sorties du second membre)"""
+        if self.n == self.t.shape[0]:
+            self.t, self.y, self.sorties = _agrandir_tampons(self.t, self.y, self.sorties)
+        self.t[self.n] = t
+        self.y[self.n] = y
+        self.sorties[self.n] = sortie
+        self.n += 1
+    
+    def tableaux(self):
+        """Instants, états (n, n_etats) et sorties (n, N_SORTIES) enregistrés"""
+        return self.t[:self.n].copy(), self.y[:self.n].copy(), self.sorties[:self.n].copy()
 
-    if len(moteur_thermique_etat_temp) > 0:
-        f_interp_mot_th_etat = interp1d(forces_calculees_temps, moteur_thermique_etat_temp,
-                                bounds_error=False, fill_value='extrapolate')
-        moteur_thermique_etat_interp = f_interp_mot_th_etat(solution.t)
-    else:
-        moteur_thermique_etat_interp = np.zeros_like(solution.t)
+# =============================================================================
+# 6) Simulation optimisée
+# =============================================================================
 
-    if len(moteur_elec_etat_temp) > 0:
-        f_interp_mot_elec_etat = interp1d(forces_calculees_temps, moteur_elec_etat_temp,
-                                bounds_error=False, fill_value='extrapolate')
-        moteur_elec_etat_interp = f_interp_mot_elec_etat(solution.t)
-    else:
-        moteur_elec_etat_interp = np.zeros_like(solution.t)
+# Grille de sortie réduite à t = 0 : seuls les états initial et final sont
+# enregistrés (tours dont on ne garde que le résumé)
+T_SORTIE_RESUME = np.zeros(1)
+
+@njit(cache=True)
+def calcul_consommation(conso_totale, joules_elec):
+    """
+    Consommation en ml équivalent essence à partir du carburant (g) et de
+    l'énergie électrique (J) ; accepte des scalaires ou des tableaux.
+    Retourne (conso_totale_ml, ml_electrique, ml_total).
+    """
     densite_ethanol=0.79
     densite_essence=0.75
-    # Calculs finaux
     NCV_ethanol=26900
     NCV_gasoline = 42900
-    conso_totale = solution.y[3][-1]
     conso_totale_ethanol = conso_totale / densite_ethanol
     conso_totale_ml=conso_totale_ethanol*(NCV_ethanol*densite_ethanol)/(NCV_gasoline*densite_essence)
     
     eff_moteur = 0.25
     eff_alternateur = 0.75
     ml_electrique = (joules_elec / eff_moteur / eff_alternateur) / (NCV_gasoline * densite_essence)
-    ml_total = conso_totale_ml + ml_electrique
+    return conso_totale_ml, ml_electrique, conso_totale_ml + ml_electrique
+
+def simuler_vehicule_optimise(distance_totale, bornes_vitesse, temps_max=500,
+                             vent_active=False, vitesse_vent=0, wind_angle_global=0,
+                             aero_active=True, gravite_active=True, enviolo_on=True,
+                             moteur_elec=False, coef_aero=1.63, coef_roul=1,
+                             plot=True, debug_mode=False, integrateur='dopri5', pas=None,
+                             t_sortie=None, d_sortie=None, tables=None, interactif=False):
+    """
+    Version optimisée de la simulation avec njit
+    
+    integrateur : 'dopri5' (défaut, boucle njit reproduisant le contrôle de
+    pas de scipy RK45 : même réponse que le solve_ivp RK45 d'origine),
+    'hybride' (automate hybride événementiel : les commutations de mode sont
+    des racines de fonctions de garde, plus rapide), 'rk4' ou
+    'euler_semi_implicite' (pas fixe), ou 'scipy_rk45' (RK45 de scipy). Le
+    tour s'arrête à la ligne d'arrivée, à l'arrêt du véhicule en fin de
+    freinage ou à temps_max. `pas` est le pas maximal (hybride, dopri5, scipy_rk45) ou le
+    pas fixe (rk4, euler_semi_implicite) ; par défaut 0.5 s pour hybride et
+    0.005 s pour les autres.
+    
+    La télémétrie est enregistrée en une passe aux seuls pas acceptés, ou par
+    sortie dense aux instants croissants de `t_sortie`, ou aux positions
+    croissantes `d_sortie` (m, par ex. tous les mètres ou aux limites de
+    secteur : les tours se comparent alors point à point), suivis de
+    l'instant final.
+    
+    `plot` : figures du tour enregistrées par plot_results (affichées en une
+    fenêtre bloquante avec interactif=True).
+    
+    `tables` : TablesInterpolation déjà construites pour ces paramètres (par
+    ex. publiées en mémoire partagée par pool_simulation) ; par défaut elles
+    sont construites depuis les données chargées en section 1.
+    
+    Tous les moteurs intègrent le même second membre pur (supercaps et
+    énergie électrique sont des états) ; hors hybride, les commutations ne
+    sont pas localisées mais appliquées au pas accepté suivant. Écarts
+    mesurés sur le tour nominal : dopri5 et scipy_rk45 identiques ; rk4 et
+    euler_semi_implicite (pas=0.005) < 0.1 % de dopri5 sur ml_total ;
+    hybride < 1 % sur ml_total et < 0.6 s sur les commutations moteur, les
+    commutations en roue libre étant très sensibles à la vitesse.
+    """
+    if pas is None:
+        pas = 0.5 if integrateur == 'hybride' else 0.005
+    if t_sortie is not None and d_sortie is not None:
+        raise ValueError("t_sortie et d_sortie sont exclusifs")
+    if d_sortie is not None:
+        grille, etat_grille = np.asarray(d_sortie, dtype=np.float64), E_POSITION
+    else:
+        grille = np.empty(0) if t_sortie is None else np.asarray(t_sortie, dtype=np.float64)
+        etat_grille = -1
+    
+    # Paramètres véhicule et conditions (enregistrement typé njit)
+    params = construire_parametres(
+        distance_totale, vent_active=vent_active, vitesse_vent=vitesse_vent,
+        wind_angle_global=wind_angle_global, aero_active=aero_active,
+        gravite_active=gravite_active, enviolo_on=enviolo_on,
+        moteur_elec=moteur_elec, coef_aero=coef_aero, coef_roul=coef_roul
+    )
+    if tables is None:
+        interp_data = InterpolationData()
+        interp_data.load_from_existing_data()
+        tables = interp_data.to_tables(params)
+    
+    # Préparation des phases
+    bornes_flat = np.array([item for sublist in bornes_vitesse for item in sublist], dtype=np.float64)
+    phases_terminees = np.zeros(len(bornes_vitesse), dtype=np.bool_)
+    phases_activees = np.zeros(len(bornes_vitesse), dtype=np.bool_)
+    
+    # Mode discret (phase, moteurs, supercaps, énergie électrique)
+    mode = creer_mode_initial(params)
+    etat0 = creer_etat_initial(params)
+    
+    if integrateur == 'scipy_rk45':
+        # Même boucle que integrer_njit, pilotée par le RK45 de scipy : le
+        # second membre est pur et le mode n'est mis à jour qu'aux pas acceptés
+        from scipy.integrate import RK45
+        from scipy.optimize import brentq
+        
+        sortie = np.zeros(N_SORTIES)
+        sortie_grille = np.zeros(N_SORTIES)
+        enregistreur = EnregistreurTelemetrie(etat0.size, grille.size + 1 if grille.size else 4096)
+        
+        def equations_dynamiques_optimisees(t, etat):
+            return derivees_hybride_njit(t, etat, mode, params, tables, sortie)
+        
+        mettre_a_jour_mode_njit(0.0, etat0, mode, phases_terminees, phases_activees,
+                                bornes_flat, params, tables, sortie_grille, -1)
+        equations_dynamiques_optimisees(0.0, etat0)
+        i_grille = np.searchsorted(grille, _valeur_grille(0.0, etat0, etat_grille), side='right')
+        if grille.size == 0:
+            enregistreur.ajouter(0.0, etat0, sortie)
+        for v_g in grille[:i_grille]:
+            enregistreur.ajouter(v_g if etat_grille < 0 else 0.0, etat0, sortie)
+        solveur = RK45(equations_dynamiques_optimisees, 0.0, etat0, temps_max, max_step=pas)
+        t_new, y_new = 0.0, etat0
+        t_arrivee = -1.0
+        
+        # Résolution
+        while solveur.status == 'running':
+            t_old, y_old = solveur.t, solveur.y.copy()
+            solveur.step()
+            if solveur.status == 'failed':
+                print(f"Attention: pas d'intégration devenu trop petit à t={solveur.t:.3f}s")
+                break
+            
+            # Ligne d'arrivée ou arrêt : fin à l'instant du franchissement
+            indice, seuil = _fin_de_tour(y_old, solveur.y, mode, params)
+            if grille.size or indice >= 0:
+                dense = solveur.dense_output()
+            t_new, y_new = solveur.t, solveur.y
+            if indice >= 0:
+                t_new = brentq(lambda t: dense(t)[indice] - seuil, t_old, solveur.t)
+                y_new = dense(t_new)
+                if indice == E_POSITION:
+                    t_arrivee = t_new
+            
+            i_fin = np.searchsorted(grille, _valeur_grille(t_new, y_new, etat_grille), side='right')
+            for v_g in grille[i_grille:i_fin]:
+                if etat_grille < 0:
+                    t_g = v_g
+                else:
+                    t_g = brentq(lambda t: dense(t)[etat_grille] - v_g, t_old, t_new)
+                y_g = dense(t_g)
+                derivees_hybride_njit(t_g, y_g, mode, params, tables, sortie_grille)
+                enregistreur.ajouter(t_g, y_g, sortie_grille)
+            i_grille = i_fin
+            
+            if indice < 0:
+                # Transitions discrètes au pas accepté (saut d'état appliqué au solveur)
+                mettre_a_jour_mode_njit(t_new, y_new, mode, phases_terminees, phases_activees,
+                                        bornes_flat, params, tables, sortie_grille, -1)
+            solveur.f = equations_dynamiques_optimisees(t_new, y_new)
+            if grille.size == 0:
+                enregistreur.ajouter(t_new, y_new, sortie)
+            if indice >= 0:
+                break
+        
+        if grille.size and (enregistreur.n == 0 or enregistreur.t[enregistreur.n - 1] < t_new):
+            enregistreur.ajouter(t_new, y_new, sortie)
+        t_sol, y_sol, sorties = enregistreur.tableaux()
+        y_sol = y_sol.T
+    elif integrateur == 'hybride':
+        t_sol, y_sol, sorties, t_arrivee, statut = integrer_hybride_njit(
+            float(temps_max), float(pas), 1e-6, 1e-8, etat0, mode,
+            phases_terminees, phases_activees, bornes_flat, params, tables, grille, etat_grille
+        )
+        if statut != 0:
+            print(f"Attention: pas d'intégration devenu trop petit à t={t_sol[-1]:.3f}s")
+        y_sol = y_sol.T
+    else:
+        if integrateur not in INTEGRATEURS:
+            raise ValueError(f"Intégrateur inconnu: {integrateur} "
+                             f"(choix: {', '.join(INTEGRATEURS)}, hybride, scipy_rk45)")
+        t_sol, y_sol, sorties, t_arrivee, statut = integrer_njit(
+            INTEGRATEURS[integrateur], float(temps_max), float(pas), 1e-3, 1e-6, etat0, mode,
+            phases_terminees, phases_activees, bornes_flat, params, tables, grille, etat_grille
+        )
+        if statut != 0:
+            print(f"Attention: pas d'intégration devenu trop petit à t={t_sol[-1]:.3f}s")
+        y_sol = y_sol.T
+    
+    if mode[0]['t_redemarrage'] >= 0:
+        print(f"[t={mode[0]['t_redemarrage']:.2f}s] Vitesse atteinte avec 3000J: {mode[0]['v_redemarrage']:.2f} m/s")
+    if debug_mode and t_arrivee >= 0:
+        print(f"Ligne d'arrivée franchie à t={t_arrivee:.2f}s")
+    
+    forces = {
+        "motor": sorties[:, S_F_MOTEUR],
+        "aero": sorties[:, S_F_AERO],
+        "rolling": sorties[:, S_F_ROULEMENT],
+        "gravity": sorties[:, S_F_GRAVITE],
+        "wind": sorties[:, S_F_VENT],
+        "elec": sorties[:, S_F_ELEC],
+    }
+    regimes_interp = sorties[:, S_RPM_MOTEUR]
+    ratios_interp = sorties[:, S_RATIO_ENVIOLO]
+    joules_elec_interp = sorties[:, S_JOULES_ELEC]
+    energie_supercap_interp = sorties[:, S_ENERGIE_SUPERCAP]
+    moteur_thermique_etat_interp = sorties[:, S_MOTEUR_THERMIQUE]
+    moteur_elec_etat_interp = sorties[:, S_MOTEUR_ELEC]
+    joules_elec = y_sol[E_JOULES_ELEC][-1]
+    # Calculs finaux
+    conso_totale = y_sol[3][-1]
+    conso_totale_ml, ml_electrique, ml_total = calcul_consommation(conso_totale, joules_elec)
     
     if debug_mode:
         print(f"Consommation totale de carburant : {conso_totale_ml:.2f} ml")
@@ -609,21 +1800,694 @@ def simuler_vehicule_optimise(distance_totale, bornes_vitesse, temps_max=500,
         print(f"Consommation totale : {ml_total:.2f} ml")
     
     if plot:
-        plot_results(solution.t, solution.y[0], solution.y[1], forces,
-                    regimes_interp, ratios_interp, solution.y[3],
+        chemins = plot_results(t_sol, y_sol[0], y_sol[1], forces,
+                    regimes_interp, ratios_interp, y_sol[3],
                     joules_elec_evolution=joules_elec_interp,
                     energie_supercap_evolution=energie_supercap_interp,
                     moteur_thermique_etat=moteur_thermique_etat_interp,
                     moteur_elec_etat=moteur_elec_etat_interp,
-                    ml_total=ml_total)
+                    ml_total=ml_total, bornes=bornes_vitesse, interactif=interactif)
+        if chemins:
+            print(f"Figures enregistrées dans {os.path.dirname(chemins['telemetrie'][0])}")
     
-    return (solution.t, solution.y[0], solution.y[1], forces, regimes_interp,
-            conso_totale, conso_totale_ml, ratios_interp, solution.y[3],
+    return (t_sol, y_sol[0], y_sol[1], forces, regimes_interp,
+            conso_totale, conso_totale_ml, ratios_interp, y_sol[3],
             joules_elec_interp,energie_supercap_interp,moteur_thermique_etat_interp,
             moteur_elec_etat_interp,ml_total)
 
+def simuler_resume(distance_totale, bornes_vitesse, temps_max=500, integrateur='dopri5',
+                   pas=None, tables=None, **conditions):
+    """
+    Même tour que simuler_vehicule_optimise sans télémétrie : seuls les
+    états initial et final sont enregistrés. Retourne un dictionnaire de
+    grandeurs scalaires (mêmes clés que simuler_lot, plus ml_electrique et
+    temps_redemarrage) et les instants de fin de chaque phase terminée
+    (temps_phases, moteur hybride seulement, None sinon).
+    """
+    methode, pas, rtol, atol = _resoudre_integrateur(integrateur, pas)
+    params = construire_parametres(distance_totale, **conditions)
+    if tables is None:
+        interp_data = InterpolationData()
+        interp_data.load_from_existing_data()
+        tables = interp_data.to_tables(params)
+    
+    bornes_flat = np.array(bornes_vitesse, dtype=np.float64).ravel()
+    n_phases = bornes_flat.size // 2
+    phases_terminees = np.zeros(n_phases, dtype=np.bool_)
+    phases_activees = np.zeros(n_phases, dtype=np.bool_)
+    mode = creer_mode_initial(params)
+    etat0 = creer_etat_initial(params)
+    
+    temps_phases = None
+    if methode == INTEGRATEUR_HYBRIDE:
+        instantanes = np.empty((n_phases, N_INSTANTANE + etat0.size))
+        t, y, _, t_arrivee, statut, n_inst = integrer_hybride_reprise_njit(
+            float(temps_max), pas, rtol, atol, etat0, mode, phases_terminees, phases_activees,
+            bornes_flat, params, tables, T_SORTIE_RESUME, -1, np.empty(0), instantanes,
+            np.empty(n_phases, dtype=MODE_DTYPE), np.empty((n_phases, 2, n_phases), dtype=np.bool_)
+        )
+        temps_phases = instantanes[:n_inst, I_TEMPS].copy()
+    else:
+        t, y, _, t_arrivee, statut = integrer_njit(
+            methode, float(temps_max), pas, rtol, atol, etat0, mode, phases_terminees, phases_activees,
+            bornes_flat, params, tables, T_SORTIE_RESUME, -1
+        )
+    
+    fin = y[-1]
+    conso_totale_ml, ml_electrique, ml_total = calcul_consommation(fin[E_CONSO], fin[E_JOULES_ELEC])
+    return {
+        'temps_total': t[-1],
+        'temps_arrivee': t_arrivee,
+        'distance_finale': fin[E_POSITION],
+        'conso_totale': fin[E_CONSO],
+        'conso_totale_ml': conso_totale_ml,
+        'joules_elec': fin[E_JOULES_ELEC],
+        'energie_supercap': fin[E_SUPERCAP],
+        'ml_electrique': ml_electrique,
+        'ml_total': ml_total,
+        'statut': statut,
+        'temps_phases': temps_phases,
+        'temps_redemarrage': mode[0]['t_redemarrage'],
+    }
+
+class SimulateurIncremental:
+    """
+    Simulations successives d'un tour (moteur hybride) pour des programmes de
+    vitesse proches, avec reprise sur les instantanés des simulations
+    précédentes
+    
+    Tant que deux programmes ont les mêmes premières phases, leurs
+    trajectoires sont identiques jusqu'à la fin de la dernière phase commune :
+    simuler() repart du dernier instantané encore valide parmi les `memoire`
+    simulations précédentes au lieu de t = 0. Le résultat est identique à
+    une intégration complète.
+    """
+    def __init__(self, distance_totale=None, temps_max=189, pas=0.5, t_sortie=None,
+                 memoire=8, **conditions):
+        if distance_totale is None:
+            distance_totale = donnees_piste().longueur
+        self.temps_max = float(temps_max)
+        self.pas = float(pas)
+        self.t_sortie = np.empty(0) if t_sortie is None else np.asarray(t_sortie, dtype=np.float64)
+        self.memoire = memoire
+        self.params = construire_parametres(distance_totale, **conditions)
+        interp_data = InterpolationData()
+        interp_data.load_from_existing_data()
+        self.tables = interp_data.to_tables(self.params)
+        self.references = []
+        self.n_integrations = 0
+        self.t_repris = 0.0
+    
+    def _instantane_valide(self, bornes_flat):
+        """Dernier instantané valide pour ce programme : (référence, indice) ou None"""
+        meilleur, t_meilleur = None, -1.0
+        for ref in self.references:
+            n_commun = min(ref['bornes'].size, bornes_flat.size)
+            differences = np.flatnonzero(ref['bornes'][:n_commun] != bornes_flat[:n_commun])
+            phases_communes = (differences[0] if differences.size else n_commun) // 2
+            for i in range(ref['n_instantanes']):
+                ligne = ref['instantanes'][i]
+                if ligne[I_PHASE] < phases_communes and ligne[I_TEMPS] > t_meilleur:
+                    meilleur, t_meilleur = (ref, i), ligne[I_TEMPS]
+        return meilleur
+    
+    def simuler(self, bornes_vitesse):
+        """
+        Simule le tour pour `bornes_vitesse` ; retourne comme
+        integrer_hybride_njit (instants, états (n, N_ETATS_HYBRIDE), sorties,
+        instant d'arrivée, statut)
+        """
+        bornes_flat = np.array(bornes_vitesse, dtype=np.float64).ravel()
+        n_phases = bornes_flat.size // 2
+        phases_terminees = np.zeros(n_phases, dtype=np.bool_)
+        phases_activees = np.zeros(n_phases, dtype=np.bool_)
+        instantanes = np.empty((n_phases, N_INSTANTANE + N_ETATS_HYBRIDE))
+        modes_instantanes = np.empty(n_phases, dtype=MODE_DTYPE)
+        phases_instantanes = np.zeros((n_phases, 2, n_phases), dtype=np.bool_)
+        
+        depart = self._instantane_valide(bornes_flat)
+        if depart is None:
+            etat0 = creer_etat_initial(self.params)
+            mode = creer_mode_initial(self.params)
+            reprise = np.empty(0)
+        else:
+            ref, i = depart
+            ligne = ref['instantanes'][i]
+            phase = int(ligne[I_PHASE])
+            etat0 = ligne[N_INSTANTANE:].copy()
+            mode = ref['modes'][i:i + 1].copy()
+            phases_terminees[:phase + 1] = ref['phases'][i, 0, :phase + 1]
+            phases_activees[:phase + 1] = ref['phases'][i, 1, :phase + 1]
+            reprise = ligne[:N_INSTANTANE].copy()
+        
+        t, y, s, t_arrivee, statut, n_inst = integrer_hybride_reprise_njit(
+            self.temps_max, self.pas, 1e-6, 1e-8, etat0, mode, phases_terminees, phases_activees,
+            bornes_flat, self.params, self.tables, self.t_sortie, -1, reprise,
+            instantanes, modes_instantanes, phases_instantanes
+        )
+        self.n_integrations += 1
+        
+        if depart is not None:
+            # Télémétrie et instantanés de la référence avant la reprise
+            n0 = int(ligne[I_N_ENREGISTRES])
+            self.t_repris += ligne[I_TEMPS]
+            n_repris = i + 1 if phase < n_phases - 1 else i
+            instantanes[:n_inst, I_N_ENREGISTRES] += n0
+            instantanes = np.concatenate([ref['instantanes'][:n_repris], instantanes[:n_inst]])
+            modes_instantanes = np.concatenate([ref['modes'][:n_repris], modes_instantanes[:n_inst]])
+            phases_ref = np.zeros((n_repris, 2, n_phases), dtype=np.bool_)
+            n_ref = min(ref['phases'].shape[2], n_phases)
+            phases_ref[:, :, :n_ref] = ref['phases'][:n_repris, :, :n_ref]
+            phases_instantanes = np.concatenate([phases_ref, phases_instantanes[:n_inst]])
+            n_inst += n_repris
+            t = np.concatenate([ref['t'][:n0], t])
+            y = np.concatenate([ref['y'][:n0], y])
+            s = np.concatenate([ref['s'][:n0], s])
+        
+        self.references.insert(0, {
+            'bornes': bornes_flat, 't': t, 'y': y, 's': s,
+            'instantanes': instantanes[:n_inst], 'modes': modes_instantanes[:n_inst],
+            'phases': phases_instantanes[:n_inst], 'n_instantanes': n_inst,
+        })
+        del self.references[self.memoire:]
+        return t, y, s, t_arrivee, statut
+
+# =============================================================================
+# 7) Simulation par lots
+# =============================================================================
+
+def _preparer_lot(bornes_batch, configs, distance_totale):
+    """
+    Tableaux d'entrée communs aux simulations par lot : paramètres, modes et
+    états initiaux (N,), phases complétées à la taille du plus long programme
+    et tables avec et sans Enviolo
+    """
+    if distance_totale is None:
+        distance_totale = donnees_piste().longueur
+    n_vehicules = len(bornes_batch)
+    if configs is None or isinstance(configs, dict):
+        configs = [configs or {}] * n_vehicules
+    if len(configs) != n_vehicules:
+        raise ValueError(f"{len(configs)} configurations pour {n_vehicules} stratégies")
+    
+    params = np.concatenate([construire_parametres(distance_totale, **config) for config in configs])
+    interp_data = InterpolationData()
+    interp_data.load_from_existing_data()
+    
+    n_phases = np.array([len(b) for b in bornes_batch], dtype=np.int64)
+    n_max = int(n_phases.max())
+    bornes = np.zeros((n_vehicules, 2 * n_max))
+    for i, b in enumerate(bornes_batch):
+        bornes[i, :2 * len(b)] = np.asarray(b, dtype=np.float64).ravel()
+    
+    y = np.zeros((N_ETATS_HYBRIDE, n_vehicules))
+    y[E_SUPERCAP] = params['energie_supercap_initiale']
+    return {
+        'params': params,
+        'modes': np.concatenate([creer_mode_initial(params[i:i + 1]) for i in range(n_vehicules)]),
+        'y': y,
+        'bornes': bornes,
+        'n_phases': n_phases,
+        'phases_terminees': np.zeros((n_vehicules, n_max), dtype=np.bool_),
+        'phases_activees': np.zeros((n_vehicules, n_max), dtype=np.bool_),
+        'tables_enviolo': interp_data.to_tables(construire_parametres(distance_totale, enviolo_on=True)),
+        'tables_sans_enviolo': interp_data.to_tables(construire_parametres(distance_totale, enviolo_on=False)),
+    }
+
+# Colonnes du tableau de résultats de l'ensemble
+R_TEMPS_TOTAL = 0
+R_TEMPS_ARRIVEE = 1
+R_DISTANCE_FINALE = 2
+R_CONSO_TOTALE = 3
+R_CONSO_TOTALE_ML = 4
+R_JOULES_ELEC = 5
+R_ENERGIE_SUPERCAP = 6
+R_ML_TOTAL = 7
+R_STATUT = 8
+N_RESULTATS = 9
+
+INTEGRATEUR_HYBRIDE = -1
+
+def _resoudre_integrateur(integrateur, pas):
+    """(methode, pas, rtol, atol) des noyaux pour un nom d'intégrateur (hors scipy_rk45)"""
+    if pas is None:
+        pas = 0.5 if integrateur == 'hybride' else 0.005
+    if integrateur == 'hybride':
+        return INTEGRATEUR_HYBRIDE, float(pas), 1e-6, 1e-8
+    if integrateur in INTEGRATEURS:
+        return INTEGRATEURS[integrateur], float(pas), 1e-3, 1e-6
+    raise ValueError(f"Intégrateur inconnu: {integrateur} "
+                     f"(choix: {', '.join(INTEGRATEURS)}, hybride)")
+
+@njit(cache=True, nogil=True)
+def simuler_tour_njit(i, methode, temps_max, pas, rtol, atol, y0, modes, phases_terminees,
+                      phases_activees, bornes, n_phases, params, tables_enviolo,
+                      tables_sans_enviolo, resultats):
+    """
+    Tour i d'un ensemble, sans le GIL : écrit son résumé dans la ligne i du
+    tableau partagé resultats (N, N_RESULTATS)
+    
+    methode : INTEGRATEUR_HYBRIDE ou un schéma de integrer_njit.
+    """
+    tables = tables_enviolo if params[i].enviolo_on else tables_sans_enviolo
+    if methode == INTEGRATEUR_HYBRIDE:
+        t, y, _, t_arrivee, statut = integrer_hybride_njit(
+            temps_max, pas, rtol, atol, y0[:, i].copy(), modes[i:i + 1],
+            phases_terminees[i, :n_phases[i]], phases_activees[i, :n_phases[i]],
+            bornes[i, :2 * n_phases[i]], params[i:i + 1], tables, T_SORTIE_RESUME
+        )
+    else:
+        t, y, _, t_arrivee, statut = integrer_njit(
+            methode, temps_max, pas, rtol, atol, y0[:, i].copy(), modes[i:i + 1],
+            phases_terminees[i, :n_phases[i]], phases_activees[i, :n_phases[i]],
+            bornes[i, :2 * n_phases[i]], params[i:i + 1], tables, T_SORTIE_RESUME
+        )
+    fin = y[y.shape[0] - 1]
+    conso_totale_ml, _, ml_total = calcul_consommation(fin[E_CONSO], fin[E_JOULES_ELEC])
+    resultats[i, R_TEMPS_TOTAL] = t[t.size - 1]
+    resultats[i, R_TEMPS_ARRIVEE] = t_arrivee
+    resultats[i, R_DISTANCE_FINALE] = fin[E_POSITION]
+    resultats[i, R_CONSO_TOTALE] = fin[E_CONSO]
+    resultats[i, R_CONSO_TOTALE_ML] = conso_totale_ml
+    resultats[i, R_JOULES_ELEC] = fin[E_JOULES_ELEC]
+    resultats[i, R_ENERGIE_SUPERCAP] = fin[E_SUPERCAP]
+    resultats[i, R_ML_TOTAL] = ml_total
+    resultats[i, R_STATUT] = statut
+
+
+def simuler_ensemble(bornes_batch, configs=None, distance_totale=None, temps_max=189,
+                     integrateur='dopri5', pas=None, n_threads=None):
+    """
+    Simule N tours indépendants en parallèle sur `n_threads` cœurs (tous par
+    défaut) : le noyau d'un tour relâche le GIL et les tours sont distribués
+    par un pool de threads. Mêmes intégrateurs et tolérances que
+    simuler_vehicule_optimise, donc mêmes résultats que simuler_resume.
+    
+    Ce n'est pas un moteur vectorisé : chaque tour garde ses propres pas et
+    événements, le coût croît linéairement avec N et se répartit sur les
+    cœurs.
+    
+    bornes_batch : liste de N listes de bornes [(min, max), ...] (nombres de
+    phases quelconques). configs : None, un dictionnaire commun ou une liste
+    de N dictionnaires des conditions acceptées par construire_parametres
+    (vent_active, vitesse_vent, coef_aero, ...). Retourne un dictionnaire de
+    tableaux (N,) : temps_total, temps_arrivee (-1 si non atteinte),
+    distance_finale, conso_totale (g), conso_totale_ml, joules_elec,
+    energie_supercap, ml_total et statut d'intégration.
+    """
+    methode, pas, rtol, atol = _resoudre_integrateur(integrateur, pas)
+    lot = _preparer_lot(bornes_batch, configs, distance_totale)
+    
+    n_tours = len(bornes_batch)
+    resultats = np.empty((n_tours, N_RESULTATS))
+    
+    def simuler_tour(i):
+        simuler_tour_njit(
+            i, methode, float(temps_max), float(pas), rtol, atol, lot['y'], lot['modes'],
+            lot['phases_terminees'], lot['phases_activees'], lot['bornes'], lot['n_phases'],
+            lot['params'], lot['tables_enviolo'], lot['tables_sans_enviolo'], resultats
+        )
+    
+    # Premier tour hors du pool : la compilation n'a lieu qu'une fois
+    simuler_tour(0)
+    with ThreadPoolExecutor(max_workers=n_threads or os.cpu_count()) as pool:
+        list(pool.map(simuler_tour, range(1, n_tours)))
+    
+    return {
+        'temps_total': resultats[:, R_TEMPS_TOTAL],
+        'temps_arrivee': resultats[:, R_TEMPS_ARRIVEE],
+        'distance_finale': resultats[:, R_DISTANCE_FINALE],
+        'conso_totale': resultats[:, R_CONSO_TOTALE],
+        'conso_totale_ml': resultats[:, R_CONSO_TOTALE_ML],
+        'joules_elec': resultats[:, R_JOULES_ELEC],
+        'energie_supercap': resultats[:, R_ENERGIE_SUPERCAP],
+        'ml_total': resultats[:, R_ML_TOTAL],
+        'statut': resultats[:, R_STATUT].astype(np.int64),
+    }
+
+def simuler_lot(bornes_batch, configs=None, distance_totale=None, temps_max=189,
+                integrateur='dopri5', pas=None, n_threads=None):
+    """
+    Simule N stratégies (optimiseur du wrapper) : ensemble de tours
+    indépendants répartis sur `n_threads` cœurs, voir simuler_ensemble
+    """
+    return simuler_ensemble(bornes_batch, configs, distance_totale, temps_max,
+                            integrateur, pas, n_threads)
+
+# Pas des différences de sensibilites_tour
+PAS_SENSIBILITE_BORNES = 0.1  # m/s
+PAS_SENSIBILITE_COEF = 0.05
+
+def sensibilites_tour(bornes_vitesse, distance_totale=None, temps_max=189, integrateur='dopri5',
+                      pas=None, pas_bornes=PAS_SENSIBILITE_BORNES, pas_coef=PAS_SENSIBILITE_COEF,
+                      n_points=2, n_threads=None, **conditions):
+    """
+    Temps du tour, consommation et leurs dérivées par rapport à chaque borne
+    (v_min, v_max) du programme et à coef_aero / coef_roul
+    
+    Le nombre de cycles accélération / roue libre et les collages
+    d'embrayage changent avec les paramètres : temps et consommation sont
+    continus par morceaux, avec des sauts de l'ordre de 0.3 s et 0.005 ml.
+    Chaque dérivée est donc la pente des moindres carrés sur les décalages
+    ±1..n_points pas de part et d'autre du point nominal (différences
+    centrées pour n_points = 1). Le tour nominal et ses
+    2 * n_points * (2 * n_phases + 2) variantes sont simulés en un seul lot
+    par simuler_ensemble.
+    
+    Retourne un dictionnaire avec temps_total, ml_total, d_temps_d_bornes et
+    d_ml_d_bornes (n_phases, 2), d_temps_d_coef et d_ml_d_coef
+    (dictionnaires coef_aero, coef_roul) et valide (faux si une variante
+    n'achève pas le tour avant temps_max).
+    """
+    bornes = np.array(bornes_vitesse, dtype=np.float64).reshape(-1, 2)
+    n_phases = bornes.shape[0]
+    coefs = {'coef_aero': conditions.pop('coef_aero', 1.63), 'coef_roul': conditions.pop('coef_roul', 1)}
+    decalages = np.concatenate([np.arange(1, n_points + 1), -np.arange(1, n_points + 1)])
+    
+    variantes, configs = [bornes], [dict(conditions, **coefs)]
+    for k in range(2 * n_phases):
+        for d in decalages:
+            b = bornes.copy()
+            b.flat[k] += d * pas_bornes
+            variantes.append(b)
+            configs.append(configs[0])
+    for nom in coefs:
+        for d in decalages:
+            variantes.append(bornes)
+            configs.append(dict(configs[0], **{nom: coefs[nom] + d * pas_coef}))
+    
+    lot = simuler_ensemble([[tuple(v) for v in b] for b in variantes], configs,
+                           distance_totale=distance_totale, temps_max=temps_max,
+                           integrateur=integrateur, pas=pas, n_threads=n_threads)
+    
+    # Pente des moindres carrés par paramètre (en unités de pas)
+    n_bornes = 2 * n_phases
+    pentes = {}
+    for cle, grandeur in (('temps', lot['temps_total']), ('ml', lot['ml_total'])):
+        ecarts = (grandeur[1:] - grandeur[0]).reshape(n_bornes + 2, decalages.size)
+        pentes[cle] = ecarts @ decalages / (decalages @ decalages)
+    
+    return {
+        'temps_total': lot['temps_total'][0],
+        'ml_total': lot['ml_total'][0],
+        'd_temps_d_bornes': (pentes['temps'][:n_bornes] / pas_bornes).reshape(n_phases, 2),
+        'd_ml_d_bornes': (pentes['ml'][:n_bornes] / pas_bornes).reshape(n_phases, 2),
+        'd_temps_d_coef': dict(zip(coefs, pentes['temps'][n_bornes:] / pas_coef)),
+        'd_ml_d_coef': dict(zip(coefs, pentes['ml'][n_bornes:] / pas_coef)),
+        'valide': bool(np.all(lot['statut'] == 0) and np.all(lot['temps_total'] < temps_max)),
+    }
+
+# =============================================================================
+# 8) Course sur plusieurs tours
+# =============================================================================
+
+# Écarts maximaux entre deux états d'entrée de tour considérés identiques
+# (vitesse m/s, régime moteur rad/s, énergie des supercaps J ; 5 J valent
+# moins de 0.001 ml équivalent essence)
+TOLERANCE_ENTREE_TOUR = np.array([1e-3, 1e-1, 5.0])
+GRANDEURS_ENTREE_TOUR = np.array([E_VITESSE, E_OMEGA_M, E_SUPERCAP])
+
+def entree_tour_suivant(y_fin, mode_fin, params):
+    """
+    État et mode d'entrée du tour suivant. Un tour se termine à l'arrêt, au
+    bout du freinage forcé quelques mètres avant la ligne : le tour suivant
+    est un départ arrêté. Vitesse résiduelle (quasi nulle), régime moteur,
+    énergie des supercaps et état du moteur thermique sont conservés ;
+    position, carburant et énergie électrique repartent de zéro et les phases
+    du programme de vitesse recommencent
+    """
+    etat0 = creer_etat_initial(params)
+    etat0[GRANDEURS_ENTREE_TOUR] = y_fin[GRANDEURS_ENTREE_TOUR]
+    mode = creer_mode_initial(params)
+    mode[0]['moteur_actif'] = mode_fin[0]['moteur_actif']
+    return etat0, mode
+
+def _integrer_tour(methode, temps_max, pas, rtol, atol, etat0, mode, bornes_flat, params, tables):
+    """
+    Un tour depuis (etat0, mode) ; retourne (t, y, t_arrivee, statut) avec
+    les seuls états initial et final, y de forme (2, N_ETATS)
+    """
+    phases_terminees = np.zeros(bornes_flat.size // 2, dtype=np.bool_)
+    phases_activees = np.zeros(bornes_flat.size // 2, dtype=np.bool_)
+    if methode == INTEGRATEUR_HYBRIDE:
+        t, y, _, t_arrivee, statut = integrer_hybride_njit(
+            temps_max, pas, rtol, atol, etat0, mode, phases_terminees, phases_activees,
+            bornes_flat, params, tables, T_SORTIE_RESUME
+        )
+    else:
+        t, y, _, t_arrivee, statut = integrer_njit(
+            methode, temps_max, pas, rtol, atol, etat0, mode, phases_terminees, phases_activees,
+            bornes_flat, params, tables, T_SORTIE_RESUME
+        )
+    return t, y, t_arrivee, statut
+
+def simuler_course(n_tours, bornes_vitesse, distance_totale=None, temps_max=189,
+                   integrateur='dopri5', pas=None, tolerance=TOLERANCE_ENTREE_TOUR, **conditions):
+    """
+    Course de `n_tours` tours consécutifs : l'état de fin d'un tour (vitesse,
+    régime moteur, supercaps, moteur thermique) est l'état d'entrée du
+    suivant. Un tour dont l'état d'entrée est à `tolerance` près celui d'un
+    tour déjà intégré reprend son résultat ; une fois le régime périodique
+    atteint, les tours restants ne sont donc plus intégrés.
+    
+    Comme un tour seul, chaque tour s'achève à l'arrêt en fin de freinage
+    forcé, avant la ligne (distance_totale - 1.05 x distance de freinage) :
+    temps_arrivee vaut -1 et distance_tours est un peu inférieure à
+    distance_totale. Les tours sont des départs arrêtés indépendants, reliés
+    seulement par les supercaps, le régime moteur et l'état du moteur
+    thermique ; un tour est achevé si statut vaut 0 et son temps est
+    inférieur à temps_max.
+    
+    `conditions` : arguments de construire_parametres (vent_active,
+    moteur_elec, enviolo_on...). `temps_max` est la limite de chaque tour.
+    Retourne un dictionnaire de tableaux par tour (temps, distance,
+    consommations, états d'entrée et de sortie) et des totaux de course.
+    """
+    if distance_totale is None:
+        distance_totale = donnees_piste().longueur
+    methode, pas, rtol, atol = _resoudre_integrateur(integrateur, pas)
+    params = construire_parametres(distance_totale, **conditions)
+    interp_data = InterpolationData()
+    interp_data.load_from_existing_data()
+    tables = interp_data.to_tables(params)
+    bornes_flat = np.array([item for sublist in bornes_vitesse for item in sublist], dtype=np.float64)
+    
+    etat0, mode = creer_etat_initial(params), creer_mode_initial(params)
+    entrees = np.zeros((n_tours, N_ETATS_HYBRIDE))
+    sorties = np.zeros((n_tours, N_ETATS_HYBRIDE))
+    temps = np.zeros(n_tours)
+    temps_arrivee = np.zeros(n_tours)
+    statut = np.zeros(n_tours, dtype=np.int64)
+    tour_source = np.zeros(n_tours, dtype=np.int64)
+    
+    # Tours intégrés : (état d'entrée, moteur actif à l'entrée, indice du tour)
+    integres = []
+    modes_sortie = {}
+    for k in range(n_tours):
+        entrees[k] = etat0
+        moteur_entree = mode[0]['moteur_actif']
+        source = next((i for e, m, i in integres if m == moteur_entree and np.all(
+            np.abs(e[GRANDEURS_ENTREE_TOUR] - etat0[GRANDEURS_ENTREE_TOUR]) <= tolerance)), -1)
+        if source < 0:
+            t, y, t_arrivee, statut[k] = _integrer_tour(
+                methode, float(temps_max), pas, rtol, atol, etat0.copy(), mode,
+                bornes_flat, params, tables
+            )
+            sorties[k], temps[k], temps_arrivee[k] = y[-1], t[-1], t_arrivee
+            integres.append((etat0, moteur_entree, k))
+            modes_sortie[k] = mode
+            source = k
+        tour_source[k] = source
+        sorties[k], temps[k] = sorties[source], temps[source]
+        temps_arrivee[k], statut[k] = temps_arrivee[source], statut[source]
+        etat0, mode = entree_tour_suivant(sorties[k], modes_sortie[source], params)
+    
+    conso_ml, _, ml_tours = calcul_consommation(sorties[:, E_CONSO], sorties[:, E_JOULES_ELEC])
+    return {
+        'temps_tours': temps,
+        'temps_arrivee': temps_arrivee,
+        'distance_tours': sorties[:, E_POSITION],
+        'conso_tours_ml': conso_ml,
+        'ml_tours': ml_tours,
+        'etat_entree': entrees,
+        'etat_sortie': sorties,
+        'statut': statut,
+        'tour_source': tour_source,
+        'n_integrations': len(integres),
+        'temps_total': temps.sum(),
+        'distance_totale': sorties[:, E_POSITION].sum(),
+        'ml_total': ml_tours.sum(),
+        'km_par_litre': sorties[:, E_POSITION].sum() / ml_tours.sum(),
+    }
+
+# Pas de quantification de l'état d'entrée des tours mémorisés par le
+# planificateur (vitesse m/s, régime moteur rad/s, énergie des supercaps J)
+QUANTIFICATION_ENTREE_TOUR = np.array([0.05, 2.0, 25.0])
+
+class PlanificateurCourse:
+    """
+    Planification d'une course tour par tour parmi un catalogue de programmes
+    de vitesse (un programme bornes_vitesse par tour)
+    
+    Chaque tour est simulé depuis l'état d'entrée quantifié (vitesse, régime
+    moteur, supercaps, état du moteur thermique) et mémorisé pour ce couple
+    (programme, entrée) : les plans qui mènent aux mêmes états partagent
+    leurs tours. Comme dans simuler_course, un tour finit à l'arrêt avant la
+    ligne et le suivant part arrêté (voir entree_tour_suivant). planifier() cherche par faisceau le plan de consommation
+    minimale sous la contrainte de temps total.
+    """
+    def __init__(self, strategies, distance_totale=None, temps_max_tour=189,
+                 integrateur='dopri5', pas=None, quantification=QUANTIFICATION_ENTREE_TOUR,
+                 **conditions):
+        if distance_totale is None:
+            distance_totale = donnees_piste().longueur
+        self.strategies = [list(b) for b in strategies]
+        self.temps_max_tour = float(temps_max_tour)
+        self.quantification = np.asarray(quantification, dtype=np.float64)
+        self.methode, self.pas, self.rtol, self.atol = _resoudre_integrateur(integrateur, pas)
+        self.params = construire_parametres(distance_totale, **conditions)
+        interp_data = InterpolationData()
+        interp_data.load_from_existing_data()
+        self.tables = interp_data.to_tables(self.params)
+        self._bornes = [np.array(b, dtype=np.float64).ravel() for b in self.strategies]
+        self.cache = {}
+    
+    def _quantifier(self, etat0, mode):
+        """Clé et état d'entrée ramené sur la grille de quantification"""
+        grille = np.round(etat0[GRANDEURS_ENTREE_TOUR] / self.quantification).astype(np.int64)
+        etat_q = etat0.copy()
+        etat_q[GRANDEURS_ENTREE_TOUR] = grille * self.quantification
+        return (tuple(grille), bool(mode[0]['moteur_actif'])), etat_q
+    
+    def tour(self, strategie, etat0, mode):
+        """
+        Résultat mémorisé du tour `strategie` (indice du catalogue) depuis
+        (etat0, mode) : dictionnaire avec temps, ml, valide (tour achevé
+        avant temps_max_tour), etat_sortie et l'entrée du tour suivant
+        """
+        cle_entree, etat_q = self._quantifier(etat0, mode)
+        cle = (strategie, cle_entree)
+        if cle not in self.cache:
+            mode_q = creer_mode_initial(self.params)
+            mode_q[0]['moteur_actif'] = cle_entree[1]
+            t, y, t_arrivee, statut = _integrer_tour(
+                self.methode, self.temps_max_tour, self.pas, self.rtol, self.atol,
+                etat_q, mode_q, self._bornes[strategie], self.params, self.tables
+            )
+            _, _, ml = calcul_consommation(y[-1, E_CONSO], y[-1, E_JOULES_ELEC])
+            etat_suivant, mode_suivant = entree_tour_suivant(y[-1], mode_q, self.params)
+            self.cache[cle] = {
+                'temps': t[-1],
+                'ml': ml,
+                'valide': statut == 0 and t[-1] < self.temps_max_tour,
+                'etat_sortie': y[-1],
+                'entree_suivante': (etat_suivant, mode_suivant),
+            }
+        return self.cache[cle]
+    
+    def planifier(self, n_tours, temps_total_max, largeur=200, strategies_par_tour=None):
+        """
+        Plan de `n_tours` tours de consommation minimale dont le temps total
+        ne dépasse pas `temps_total_max` (s), par recherche en faisceau :
+        après chaque tour, seuls les plans non dominés (temps, ml) par état
+        d'entrée du tour suivant sont gardés, puis les `largeur` plus sobres.
+        `strategies_par_tour[k]` restreint les programmes autorisés au tour k.
+        Retourne None si aucun plan ne respecte la contrainte.
+        """
+        params = self.params
+        etat0, mode = creer_etat_initial(params), creer_mode_initial(params)
+        # Noeud : (temps, ml, plan, etat d'entrée, mode d'entrée)
+        faisceau = [(0.0, 0.0, (), etat0, mode)]
+        n_plans = 0
+        
+        for k in range(n_tours):
+            autorisees = range(len(self.strategies)) if strategies_par_tour is None else strategies_par_tour[k]
+            candidats = {}
+            for temps, ml, plan, etat0, mode in faisceau:
+                for s in autorisees:
+                    resultat = self.tour(s, etat0, mode)
+                    n_plans += 1
+                    if not resultat['valide']:
+                        continue
+                    noeud = (temps + resultat['temps'], ml + resultat['ml'], plan + (s,),
+                             *resultat['entree_suivante'])
+                    cle, _ = self._quantifier(noeud[3], noeud[4])
+                    candidats.setdefault(cle, []).append(noeud)
+            
+            # Plans non dominés par état d'entrée, puis élagage en temps
+            temps_min_tour = min((r['temps'] for r in self.cache.values() if r['valide']), default=0.0)
+            marge = temps_total_max - (n_tours - k - 1) * temps_min_tour
+            faisceau = []
+            for noeuds in candidats.values():
+                noeuds.sort(key=lambda n: (n[0], n[1]))
+                ml_min = np.inf
+                for noeud in noeuds:
+                    if noeud[0] <= marge and noeud[1] < ml_min:
+                        faisceau.append(noeud)
+                        ml_min = noeud[1]
+            faisceau.sort(key=lambda n: (n[1], n[0]))
+            faisceau = faisceau[:largeur]
+            if not faisceau:
+                return None
+        
+        temps, ml, plan, _, _ = faisceau[0]
+        return {
+            'plan': list(plan),
+            'bornes_par_tour': [self.strategies[s] for s in plan],
+            'temps_total': temps,
+            'ml_total': ml,
+            'n_plans_evalues': n_plans,
+            'n_tours_simules': len(self.cache),
+        }
+
+# =============================================================================
+# 9) Compilation anticipée
+# =============================================================================
+
+def signatures_noyaux():
+    """
+    Signatures déclarées des noyaux appelés depuis Python, déduites des types
+    d'un tour (paramètres, mode, tables) : liste de (noyau, signature)
+    """
+    params = construire_parametres(1.0, moteur_elec=True)
+    interp_data = InterpolationData()
+    interp_data.load_from_existing_data()
+    
+    tables = typeof(interp_data.to_tables(params))
+    params, mode = typeof(params), typeof(creer_mode_initial(params))
+    f1, f2 = typeof(np.zeros(1)), typeof(np.zeros((1, 1)))
+    b1, b2 = typeof(np.zeros(1, dtype=np.bool_)), typeof(np.zeros((1, 1), dtype=np.bool_))
+    b3 = typeof(np.zeros((1, 1, 1), dtype=np.bool_))
+    i1 = typeof(np.zeros(1, dtype=np.int64))
+    
+    return [
+        (integrer_hybride_njit, (float64, float64, float64, float64, f1, mode, b1, b1, f1,
+                                 params, tables, f1, int64)),
+        (integrer_hybride_reprise_njit, (float64, float64, float64, float64, f1, mode, b1, b1,
+                                         f1, params, tables, f1, int64, f1, f2, mode, b3)),
+        (integrer_njit, (int64, float64, float64, float64, float64, f1, mode, b1, b1, f1,
+                         params, tables, f1, int64)),
+        (derivees_hybride_njit, (float64, f1, mode, params, tables, f1)),
+        (mettre_a_jour_mode_njit, (float64, f1, mode, b1, b1, f1, params, tables, f1, int64)),
+        (_fin_de_tour, (f1, f1, mode, params)),
+        (calcul_consommation, (float64, float64)),
+        (calcul_consommation, (f1, f1)),
+        (simuler_tour_njit, (int64, int64, float64, float64, float64, float64, f2, mode,
+                             b2, b2, f2, i1, params, tables, tables, f2)),
+    ]
+
+def warmup():
+    """
+    Compile les noyaux pour leurs signatures déclarées, ou les recharge du
+    cache disque s'ils y sont déjà. Retourne la durée en secondes.
+    """
+    debut = time.perf_counter()
+    for noyau, signature in signatures_noyaux():
+        noyau.compile(signature)
+    return time.perf_counter() - debut
+
 # =============================================================================
-# 5) Fonctions de tracé
+# 10) Fonctions de tracé
 # =============================================================================
 
 def plot_results(t_eval, position, vitesse, forces,
@@ -631,195 +2495,34 @@ def plot_results(t_eval, position, vitesse, forces,
                  joules_elec_evolution=None,
                  energie_supercap_evolution=None,
                  moteur_elec_etat=None,
-                 moteur_thermique_etat=None,ml_total=None):
-    fig, axs = plt.subplots(4, 2, figsize=(20, 20))
-
-    # Position
-    axs[0, 0].plot(t_eval, position, label="Position (m)")
-    axs[0, 0].set_title("Position en fonction du temps")
-    axs[0, 0].set_xlabel("Temps (s)")
-    axs[0, 0].set_ylabel("Position (m)")
-    axs[0, 0].legend()
-
-    # Vitesse
-    axs[0, 1].plot(t_eval, vitesse, label="Vitesse (m/s)", color="green")
-    axs[0, 1].set_title("Vitesse en fonction du temps")
-    axs[0, 1].set_xlabel("Temps (s)")
-    axs[0, 1].set_ylabel("Vitesse (m/s)")
-    axs[0, 1].legend()
-
-    # Forces
-    axs[1, 0].plot(t_eval, forces["aero"], label="Force aérodynamique (N)")
-    axs[1, 0].plot(t_eval, forces["rolling"], label="Force de roulement (N)")
-    axs[1, 0].plot(t_eval, forces["gravity"], label="Force gravitationnelle (N)")
-    axs[1, 0].plot(t_eval, forces["wind"], label="Force du vent (N)")
-    axs[1, 0].set_title("Forces appliquées au véhicule")
-    axs[1, 0].set_xlabel("Temps (s)")
-    axs[1, 0].set_ylabel("Force (N)")
-    axs[1, 0].legend()
-
-    # Régime moteur
-    axs[1, 1].plot(t_eval, regimes_moteur, label="Régime moteur (RPM)", color="orange")
-    axs[1, 1].set_title("Régime moteur en fonction du temps")
-    axs[1, 1].set_xlabel("Temps (s)")
-    axs[1, 1].set_ylabel("RPM")
-    axs[1, 1].legend()
-
-    # Rapport Enviolo
-    axs[2, 0].plot(t_eval, ratios_utilises, label="Rapport Enviolo")
-    axs[2, 0].set_title("Rapport Enviolo en fonction du temps")
-    axs[2, 0].set_xlabel("Temps (s)")
-    axs[2, 0].set_ylabel("Rapport")
-    axs[2, 0].legend()
-
-    # Force motrice
-    axs[2, 1].plot(t_eval, forces["motor"], label="Force motrice (N)")
-    axs[2, 1].set_title("Force motrice appliquée au véhicule")
-    axs[2, 1].plot(t_eval, forces["elec"], label="Force moteur elec (N)")
-    axs[2, 1].set_xlabel("Temps (s)")
-    axs[2, 1].set_ylabel("Force (N)")
-    axs[2, 1].legend()
-
-    # Consommation thermique
-    axs[3, 0].plot(t_eval, consommation / 0.75, label="Conso thermique cumulative (ml)", color="purple")
-    axs[3, 0].set_title("Consommation carburant en fonction du temps")
-    axs[3, 0].set_xlabel("Temps (s)")
-    axs[3, 0].set_ylabel("Consommation (ml)")
-    axs[3, 0].legend()
-
-    # Consommation électrique
-    if joules_elec_evolution is not None:
-        axs[3, 1].plot(t_eval, joules_elec_evolution, label="Conso électrique (J)", color="red")
-        axs[3, 1].set_title("Consommation électrique cumulée")
-        axs[3, 1].set_xlabel("Temps (s)")
-        axs[3, 1].set_ylabel("Énergie (J)")
-        axs[3, 1].legend()
-
-    plt.tight_layout()
-    plt.show()
-
-    if energie_supercap_evolution is not None and moteur_elec_etat is not None and moteur_thermique_etat is not None:
-        fig, axs = plt.subplots(2, 1, figsize=(14, 10), sharex=True)
-
-    # Tracé énergie supercaps
-        axs[0].plot(t_eval, energie_supercap_evolution, label="Énergie supercaps (J)", color='green')
-
-    # Détection de récupération : quand l’énergie augmente
-        diff_energie = np.diff(energie_supercap_evolution)
-        recup_indices = np.where(diff_energie > 1e-3)[0]  # seuil pour ignorer bruit
-
-        if len(recup_indices) > 0:
-            t_recup_debut = t_eval[recup_indices[0]]
-            t_recup_fin = t_eval[recup_indices[-1]]
-
-            axs[0].axvspan(t_recup_debut, t_recup_fin, color='lime', alpha=0.3, label="Zone de récupération")
-
-    axs[0].set_ylabel("Énergie (Joules)")
-    axs[0].set_title("Évolution de l'énergie dans les supercondensateurs")
-    axs[0].legend()
-    axs[0].grid(True)
-
-    # Tracé état des moteurs
-    axs[1].plot(t_eval, moteur_elec_etat, label="Moteur électrique actif", color='blue', drawstyle='steps-post')
-    axs[1].plot(t_eval, moteur_thermique_etat, label="Moteur thermique actif", color='red', drawstyle='steps-post')
-    axs[1].set_xlabel("Temps (s)")
-    axs[1].set_ylabel("État (0=off, 1=on)")
-    axs[1].set_title("État des moteurs au cours du temps")
-    axs[1].legend()
-    axs[1].grid(True)
-
-    plt.tight_layout()
-    plt.show()
-        
-    plt.figure(figsize=(12, 6))
-    plt.plot(position, vitesse, label='Vitesse (m/s)', color='blue', linewidth=2)
-    plt.xlabel("Position (m)")
-    plt.ylabel("Vitesse (m/s)")
-    plt.title("Profil de vitesse sur le circuit")
-    plt.grid(True, alpha=0.3)
-    plt.legend()
-    plt.tight_layout()
-    plt.show()
-
-    plt.figure(figsize=(12, 10))
-# Interpolation des coordonnées X et Y pour les points du véhicule
-    pos_x_interp = np.interp(position, np.linspace(0, distance.iloc[-1], len(pos_x)), pos_x)
-    pos_y_interp = np.interp(position, np.linspace(0, distance.iloc[-1], len(pos_y)), pos_y)
-# Tracé du circuit
-    circuit_x = np.interp(np.linspace(0, distance.iloc[-1], 1000), 
-                  np.linspace(0, distance.iloc[-1], len(pos_x)), pos_x)
-    circuit_y = np.interp(np.linspace(0, distance.iloc[-1], 1000), 
-                     np.linspace(0, distance.iloc[-1], len(pos_y)), pos_y)
-    plt.plot(circuit_x, circuit_y, 'lightgray', linewidth=3, zorder=1, label='Circuit')
-# Tracé des points avec code couleur selon les régimes moteur
-    scatter = plt.scatter(pos_x_interp, pos_y_interp, c=regimes_moteur, 
-                  cmap='viridis', s=15, zorder=2)
-# Ajout de la barre de couleur
-    cbar = plt.colorbar(scatter)
-    cbar.set_label('Engine RPM (RPM)',fontsize=12)
-# Marqueurs de départ et d'arrivée
-    plt.scatter(pos_x_interp[0], pos_y_interp[0], marker='o', color='green', s=100, label='Starting line', zorder=3)
-    plt.scatter(pos_x_interp[-1], pos_y_interp[-1], marker='x', color='red', s=100, label='Finish line', zorder=3)
-# Détection des phases moteur actives
-    regimes_moteur = np.array(regimes_moteur)
-    is_on = regimes_moteur > 0
-    changes = np.diff(is_on.astype(int))
-    starts = np.where(changes == 1)[0] + 1
-    ends = np.where(changes == -1)[0] + 1
-# Gestion du cas où ça commence ou finit moteur allumé
-    if is_on[0]: starts = np.insert(starts, 0, 0)
-    if is_on[-1]: ends = np.append(ends, len(regimes_moteur) - 1)
-# Définir les bornes de vitesse à annoter
-    bornes_v = bornes_vitesse
-    dx = 15  # décalage horizontal
-    dy = 10  # décalage vertical
-    point_size = 60  # taille des points de début/fin
-    for i, (start, end) in enumerate(zip(starts, ends)):
-        if i < len(bornes_v):
-            v_start, v_end = bornes_v[i]
-            x_start, y_start = pos_x_interp[start], pos_y_interp[start]
-            x_end, y_end = pos_x_interp[end], pos_y_interp[end]
-        # Points visibles
-            plt.scatter(x_start, y_start, s=point_size, color='blue', zorder=5)
-            plt.scatter(x_end, y_end, s=point_size, color='orange', zorder=5)
-    # Texte décalé pour éviter de superposer le circuit
-            plt.text(x_start + dx, y_start + dy, f"{v_start:.1f} m/s",
-             fontsize=10, color='black', ha='left', va='bottom', weight='bold')
-            plt.text(x_end + dx, y_end + dy, f"{v_end:.1f} m/s",
-                 fontsize=10, color='black', ha='left', va='bottom', weight='bold')
-    #flèche
-            plt.annotate('', 
-                 xy=(x_end + dx/2, y_end + dy/2), 
-                 xytext=(x_end, y_end), 
-                 arrowprops=dict(arrowstyle="-", color='gray', lw=1, linestyle='dotted'),
-                 zorder=3)
-            plt.annotate('', 
-                 xy=(x_start + dx, y_start + dy), 
-                 xytext=(x_start, y_start), 
-                 arrowprops=dict(arrowstyle="-", color='gray', lw=1, linestyle='dotted'),
-                 zorder=3)
-
-# Récupérer les limites du graphique pour positionner le texte
-    xlim = plt.xlim()
-    ylim = plt.ylim()
-# Positionner le texte en haut à droite (95% en x, 95% en y)
-    x_text = xlim[0] + 0.95 * (xlim[1] - xlim[0])
-    y_text = ylim[0] + 0.95 * (ylim[1] - ylim[0])
-# Ajouter le texte avec la consommation (il faut que ml_total soit accessible)
-    plt.text(x_text, y_text, f"Total consumption:\n{ml_total:.1f} ml", 
-         fontsize=12, ha='right', va='top', weight='bold',
-         bbox=dict(boxstyle="round,pad=0.3", facecolor='white', alpha=0.8, edgecolor='black'))
-
-# Configuration finale
-    plt.title("Strategy used around the track",fontsize=14)
-    plt.xlabel('X (m)')
-    plt.ylabel('Y (m)')
-    plt.legend(fontsize=12)
-    plt.grid(True, alpha=0.3)
-    plt.legend(loc='upper right')
-    plt.axis('equal')
-    plt.tight_layout()
-    plt.show()
+                 moteur_thermique_etat=None,ml_total=None,
+                 bornes=None, interactif=False, dossier=None, formats=('png',)):
+    """
+    Figures du tour (courbes décimées, construites par
+    rendu_graphiques.figures_tour), enregistrées sans fenêtre ni pyplot
+    dans un sous-dossier horodaté de `dossier` (ETA_ONE_RAPPORTS, ou
+    data/rapports) ; retourne {figure: [chemins]}. Avec interactif=True, elles
+    sont affichées en un seul plt.show() (bloquant) au lieu d'être
+    enregistrées. `bornes` : bornes de vitesse annotées sur le circuit
+    (bornes_vitesse par défaut).
+    """
+    from rendu_graphiques import figures_tour, enregistrer_figures
+    
+    piste = donnees_piste()
+    arguments = (t_eval, position, vitesse, forces, regimes_moteur, ratios_utilises, consommation,
+                 joules_elec_evolution, energie_supercap_evolution, moteur_elec_etat,
+                 moteur_thermique_etat, ml_total, bornes_vitesse if bornes is None else bornes,
+                 (piste.distance, piste.pos_x, piste.pos_y))
+    if interactif:
+        import matplotlib.pyplot as plt
+        figures_tour(*arguments, figure=plt.figure)
+        plt.show()
+        return None
+    
+    dossier = dossier or os.environ.get('ETA_ONE_RAPPORTS') or os.path.join(RACINE_DONNEES, 'rapports')
+    os.makedirs(dossier, exist_ok=True)
+    repertoire = tempfile.mkdtemp(prefix=time.strftime('tour_%Y%m%d-%H%M%S_'), dir=dossier)
+    return enregistrer_figures(figures_tour(*arguments), repertoire, formats)
 
 def save_simulation_data_to_csv(t_eval, position, vitesse, forces, regimes_moteur, 
                                ratios_utilises, consommation, joules_elec_evolution, 
@@ -827,30 +2530,34 @@ def save_simulation_data_to_csv(t_eval, position, vitesse, forces, regimes_moteu
                                moteur_thermique_etat,
                                moteur_elec_etat,
                                file_name="silesia_opti_6_accèl.csv"):
-    """Fonction de sauvegarde des résultats"""
-    data = {
-        "Time (s)": t_eval,
-        "Position (m)": position,
-        "Velocity (m/s)": vitesse,
-        "Force Motor (N)": forces["motor"],
-        "Force Aero (N)": forces["aero"],
-        "Force Rolling (N)": forces["rolling"],
-        "Force Gravity (N)": forces["gravity"],
-        "Force Wind (N)": forces["wind"],
-        "Engine RPM": regimes_moteur,
-        "Enviolo Ratio": ratios_utilises,
-        "Cumulative Fuel Consumption (g)": consommation,
-        "Electricity consumed (J)": joules_elec_evolution,
-        "Supercap Energy (J)": energie_supercap_evolution,
-        "Moteur Thermique Actif": moteur_thermique_etat,
-        "Moteur Électrique Actif": moteur_elec_etat
+    """Sauvegarde des résultats en CSV (export_resultats.exporter_csv, écriture par blocs)"""
+    from resultat_simulation import SimulationResult
+    from export_resultats import exporter_csv
+    
+    colonnes = {
+        "temps": ("Time (s)", t_eval),
+        "position": ("Position (m)", position),
+        "vitesse": ("Velocity (m/s)", vitesse),
+        "force_moteur": ("Force Motor (N)", forces["motor"]),
+        "force_aerodynamique": ("Force Aero (N)", forces["aero"]),
+        "force_roulement": ("Force Rolling (N)", forces["rolling"]),
+        "force_gravite": ("Force Gravity (N)", forces["gravity"]),
+        "force_vent": ("Force Wind (N)", forces["wind"]),
+        "regimes_moteur": ("Engine RPM", regimes_moteur),
+        "ratios_enviolo": ("Enviolo Ratio", ratios_utilises),
+        "consommation_cumul": ("Cumulative Fuel Consumption (g)", consommation),
+        "joules_elec": ("Electricity consumed (J)", joules_elec_evolution),
+        "energie_supercap": ("Supercap Energy (J)", energie_supercap_evolution),
+        "moteur_thermique_actif": ("Moteur Thermique Actif", moteur_thermique_etat),
+        "moteur_electrique_actif": ("Moteur Électrique Actif", moteur_elec_etat),
     }
-    df = pd.DataFrame(data)
-    df.to_csv(file_name, index=False, encoding="utf-8")
+    resultat = SimulationResult(np.vstack([valeurs for _, valeurs in colonnes.values()]), {}, {},
+                                list(colonnes))
+    exporter_csv(resultat, file_name, {nom: entete for nom, (entete, _) in colonnes.items()})
     print(f"Données de simulation sauvegardées dans {file_name}")
 
 # =============================================================================
-# 6) Exécution principale
+# 11) Exécution principale
 # =============================================================================
 
 if __name__ == "__main__":
@@ -861,7 +2568,7 @@ if __name__ == "__main__":
     
     # Paramètres de la simulation
 
-    distance_totale = distance.iloc[-1]
+    distance_totale = donnees_piste().longueur
 
     
     print(f"- Distance totale: {distance_totale:.0f} m")
@@ -888,7 +2595,9 @@ if __name__ == "__main__":
             coef_aero=1.63,
             coef_roul=1.0,
             plot=True,
-            debug_mode=True
+            debug_mode=True,
+            # Fenêtre matplotlib bloquante seulement sur demande
+            interactif='--interactif' in sys.argv[1:]
         )
         
         execution_time = time.time() - start_time
@@ -919,7 +2628,12 @@ if __name__ == "__main__":
             # Affichage des résultats finaux
             energie_utilisee = energie_supercap[0] - np.min(energie_supercap)
             energie_recuperee = energie_supercap[-1] - np.min(energie_supercap)
-            resultat_11=(distance_totale*11)/(ml_total*11)
+            # Course de 11 tours enchaînés (supercaps, régime et vitesse conservés)
+            course = simuler_course(
+                11, bornes_vitesse, distance_totale=distance_totale, temps_max=temps_max,
+                vent_active=False, vitesse_vent=6*0.514, wind_angle_global=np.deg2rad(270),
+                enviolo_on=True, moteur_elec=True, coef_aero=1.63, coef_roul=1.0
+            )
             
 
             print(f"\n Énergie supercaps utilisée: {energie_utilisee:.1f} J")
@@ -930,19 +2644,21 @@ if __name__ == "__main__":
             print(f"- Consommation totale pour un tour: {ml_total:.2f} ml")
             print(f"- Temps de parcours: {t_reel:.1f} s")
             print(f"- Vitesse moyenne: {(pos[-1]/t_reel*3.6):.1f} km/h")
-            print(f"- Résultat en km/l pour 11 tours: {resultat_11:.1f} km/l")
+            print(f"- Résultat en km/l pour 11 tours: {course['km_par_litre']:.1f} km/l "
+                  f"({course['ml_total']:.2f} ml, {course['temps_total']:.0f} s, "
+                  f"{course['n_integrations']} tours intégrés)")
             
         else:
             print("Erreur lors de la simulation")
             
     except FileNotFoundError as e:
         print(f"Fichier manquant: {e}")
-        print("Vérifiez que tous les fichiers de données sont présents:")
-        print("- moteur_consomini.csv")
-        print("- moteur_elec.csv")
-        print("- data_enviolo.csv") 
-        print("- sem_2025_eu.csv")
-        print("- Cx_voiture_vent.xlsx")
+        print(f"Vérifiez que tous les fichiers de données sont présents dans {RACINE_DONNEES}:")
+        print("- vehicle/moteur_consomini.csv")
+        print("- vehicle/moteur_elec_2.csv")
+        print("- vehicle/data_enviolo.csv")
+        print("- vehicle/Cx_voiture_vent.xlsx")
+        print("- circuit/sem_2025_eu_with_rayon.csv")
         
     except Exception as e:
         print(f"Erreur lors de l'exécution: {e}")
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+Modèle de substitution des simulations de tour
+
+Processus gaussien (noyau RBF) ajusté sur les résultats archivés
+(bornes_vitesse, config) -> (temps_total, consommation_ml) : prédictions
+avec écart-type en quelques microsecondes par stratégie, pour trier des
+candidats avant de ne simuler que les plus prometteurs ou les plus incertains.
+Chaque nouveau résultat étend la factorisation de Cholesky en O(n²) ; les
+hyperparamètres sont réajustés quand l'archive a doublé depuis le dernier
+ajustement. ModelesSubstitution tient un modèle par jeu de conditions de
+course (vent, moteurs, distance...) : seules les stratégies simulées dans
+les mêmes conditions sont comparées. Seuls les tours achevés avant temps_max
+sont appris, une seule fois chacun ; ModelesSubstitution.sauvegarder et
+charger conservent l'ensemble d'une session à l'autre.
+"""
+
+import os
+import tempfile
+
+import numpy as np
+from scipy.linalg import cho_solve, solve_triangular
+
+# Grandeurs prédites, dans l'ordre des colonnes de predire()
+SORTIES = ('temps_total', 'consommation_ml')
+
+# Échelles de longueur de référence du noyau
+ECHELLE_VITESSE = 1.0   # m/s, bornes de vitesse et nombre de phases
+ECHELLE_COEF = 0.2      # coef_aero, coef_roul
+
+# Paramètres des conditions de course : un modèle par jeu de valeurs
+# (temps_max n'en fait pas partie : il ne change pas un tour achevé)
+CLES_CONDITIONS = ('distance_totale', 'vent_active', 'vitesse_vent', 'wind_angle_global',
+                   'aero_active', 'gravite_active', 'enviolo_on', 'moteur_elec')
+
+
+def cle_conditions(config, cles=CLES_CONDITIONS):
+    """Clé du jeu de conditions d'une configuration (valeurs de `cles`, None si absentes)"""
+    return tuple(None if config.get(cle) is None else float(config[cle]) for cle in cles)
+
+def tour_acheve(resultat):
+    """
+    Résultat réussi d'un tour achevé avant temps_max. Un tour achevé s'arrête
+    en fin de freinage juste avant la ligne, ou sur la ligne ; un tour arrêté
+    par temps_max n'a pas de temps ni de consommation de tour.
+    """
+    if resultat is None or not resultat.get('success'):
+        return False
+    temps_max = resultat['config'].get('temps_max')
+    temps_total = resultat['temps_total']
+    return bool(np.isfinite(temps_total) and np.isfinite(resultat['consommation_ml'])
+                and (temps_max is None or temps_total < temps_max))
+
+class ModeleSubstitution:
+    """
+    Processus gaussien à moyenne constante sur les deux sorties
+
+    Les entrées sont les bornes de vitesse complétées par des zéros jusqu'à
+    `n_phases_max` phases, le nombre de phases et les valeurs de
+    `cles_config`. Les deux sorties partagent le noyau et sont normalisées
+    par leur moyenne et leur écart-type.
+    """
+
+    def __init__(self, n_phases_max=8, cles_config=('coef_aero', 'coef_roul'), echelles_config=None,
+                 facteur_echelle=1.0, bruit=1e-3):
+        """
+        Args:
+            n_phases_max: nombre maximal de phases d'une stratégie
+            cles_config: paramètres de configuration pris en entrée
+            echelles_config: échelles de longueur de ces paramètres (ECHELLE_COEF par défaut)
+            facteur_echelle: facteur appliqué à toutes les échelles de longueur
+            bruit: variance du bruit relative à la variance des sorties
+        """
+        self.n_phases_max = n_phases_max
+        self.cles_config = tuple(cles_config)
+        if echelles_config is None:
+            echelles_config = [ECHELLE_COEF] * len(self.cles_config)
+        self.echelles = np.concatenate([
+            np.full(2 * n_phases_max + 1, ECHELLE_VITESSE), np.asarray(echelles_config, dtype=np.float64)
+        ])
+        self.facteur_echelle = facteur_echelle
+        self.bruit = bruit
+
+        n_entrees = self.echelles.size
+        self.X = np.empty((0, n_entrees))
+        self.Y = np.empty((0, len(SORTIES)))
+        self.L = np.empty((0, 0))
+        self._alpha = None
+        self._n_ajustement = 0
+
+    def __len__(self):
+        return self.X.shape[0]
+
+    def entrees(self, bornes_vitesse, config=None):
+        """Vecteur d'entrée d'une stratégie"""
+        config = config or {}
+        bornes = np.asarray(bornes_vitesse, dtype=np.float64).ravel()
+        if bornes.size > 2 * self.n_phases_max:
+            raise ValueError(f"{bornes.size // 2} phases (maximum {self.n_phases_max})")
+        x = np.zeros(self.echelles.size)
+        x[:bornes.size] = bornes
+        x[2 * self.n_phases_max] = bornes.size // 2
+        for i, cle in enumerate(self.cles_config):
+            x[2 * self.n_phases_max + 1 + i] = float(config[cle])
+        return x
+
+    def _noyau(self, A, B):
+        """Noyau RBF entre les lignes de A et de B"""
+        echelles = self.echelles * self.facteur_echelle
+        A, B = A / echelles, B / echelles
+        d2 = (A * A).sum(1)[:, None] + (B * B).sum(1)[None, :] - 2 * A @ B.T
+        return np.exp(-0.5 * np.maximum(d2, 0.0))
+
+    def _factoriser(self):
+        """Factorisation de Cholesky complète de l'archive"""
+        K = self._noyau(self.X, self.X)
+        K[np.diag_indices_from(K)] += self.bruit
+        self.L = np.linalg.cholesky(K)
+        self._alpha = None
+
+    def _normalisation(self):
+        """Moyenne et écart-type des sorties archivées"""
+        moyenne = self.Y.mean(0)
+        ecart = self.Y.std(0)
+        return moyenne, np.where(ecart > 0, ecart, 1.0)
+
+    def ajouter(self, bornes_vitesse, config, temps_total, consommation_ml):
+        """
+        Ajoute un résultat de simulation (extension de la factorisation en
+        O(n²)) ; une entrée déjà archivée est ignorée (simulation
+        déterministe). Retourne True si le résultat a été ajouté.
+        """
+        x = self.entrees(bornes_vitesse, config)
+        n = len(self)
+        if n and (self.X == x).all(1).any():
+            return False
+        if n:
+            k = self._noyau(self.X, x[None, :])[:, 0]
+            l = solve_triangular(self.L, k, lower=True)
+            d = np.sqrt(max(1.0 + self.bruit - l @ l, 1e-12))
+            L = np.zeros((n + 1, n + 1))
+            L[:n, :n] = self.L
+            L[n, :n] = l
+            L[n, n] = d
+            self.L = L
+        else:
+            self.L = np.array([[np.sqrt(1.0 + self.bruit)]])
+        self.X = np.vstack([self.X, x])
+        self.Y = np.vstack([self.Y, [temps_total, consommation_ml]])
+        self._alpha = None
+        if len(self) >= 8 and len(self) >= 2 * self._n_ajustement:
+            self.ajuster()
+        return True
+
+    def accepte(self, bornes_vitesse):
+        """La stratégie tient-elle dans le vecteur d'entrée (n_phases_max phases au plus) ?"""
+        return len(bornes_vitesse) <= self.n_phases_max
+
+    def ajouter_resultat(self, resultat):
+        """
+        Ajoute un résultat de EtaOneSimulationWrapper.run_simulation (ignoré
+        en cas d'échec, de tour non achevé, de stratégie déjà archivée ou
+        au-delà de n_phases_max phases) ; les résumés sans télémétrie sont
+        pris comme les résultats complets
+        """
+        if not tour_acheve(resultat):
+            return False
+        config = resultat['config']
+        if not self.accepte(config['bornes_vitesse']):
+            return False
+        return self.ajouter(config['bornes_vitesse'], config, resultat['temps_total'],
+                            resultat['consommation_ml'])
+
+    def log_vraisemblance(self):
+        """Log-vraisemblance marginale des sorties normalisées (somme sur les sorties)"""
+        moyenne, ecart = self._normalisation()
+        Z = (self.Y - moyenne) / ecart
+        alpha = cho_solve((self.L, True), Z)
+        return float(-0.5 * (Z * alpha).sum() - Z.shape[1] * np.log(np.diag(self.L)).sum())
+
+    def ajuster(self, facteurs=(0.25, 0.5, 1.0, 2.0, 4.0), bruits=(1e-4, 1e-3, 1e-2, 1e-1)):
+        """Choisit facteur_echelle et bruit par maximum de vraisemblance sur une grille"""
+        meilleur = (-np.inf, self.facteur_echelle, self.bruit)
+        for facteur in facteurs:
+            for bruit in bruits:
+                self.facteur_echelle, self.bruit = facteur, bruit
+                try:
+                    self._factoriser()
+                except np.linalg.LinAlgError:
+                    continue
+                vraisemblance = self.log_vraisemblance()
+                if vraisemblance > meilleur[0]:
+                    meilleur = (vraisemblance, facteur, bruit)
+        _, self.facteur_echelle, self.bruit = meilleur
+        self._factoriser()
+        self._n_ajustement = len(self)
+
+    def predire(self, strategies, configs=None):
+        """
+        Prédiction pour une liste de bornes_vitesse (configs : un dictionnaire
+        commun ou une liste). Retourne (moyenne, ecart_type), tableaux
+        (n, 2) dans l'ordre de SORTIES.
+        """
+        if not len(self):
+            raise RuntimeError("Modèle de substitution vide")
+        if configs is None or isinstance(configs, dict):
+            configs = [configs] * len(strategies)
+        Xs = np.array([self.entrees(b, c) for b, c in zip(strategies, configs)])
+
+        moyenne, ecart = self._normalisation()
+        if self._alpha is None:
+            self._alpha = cho_solve((self.L, True), (self.Y - moyenne) / ecart)
+        Ks = self._noyau(Xs, self.X)
+        v = solve_triangular(self.L, Ks.T, lower=True)
+        variance = np.maximum(1.0 - (v * v).sum(0), 0.0)
+        return moyenne + ecart * (Ks @ self._alpha), ecart * np.sqrt(variance)[:, None]
+
+    def selectionner(self, strategies, configs=None, n=10, sortie='consommation_ml', kappa=2.0,
+                     temps_max=None):
+        """
+        Indices des `n` stratégies à simuler : plus petite borne de confiance
+        inférieure (moyenne - kappa * écart-type) de `sortie`, donc les plus
+        prometteuses ou les plus incertaines. Avec `temps_max`, les stratégies
+        dont le temps est certainement trop long (moyenne - kappa * écart-type
+        > temps_max) sont écartées.
+        """
+        moyenne, ecart = self.predire(strategies, configs)
+        borne = moyenne - kappa * ecart
+        score = borne[:, SORTIES.index(sortie)].copy()
+        if temps_max is not None:
+            score[borne[:, SORTIES.index('temps_total')] > temps_max] = np.inf
+        ordre = np.argsort(score, kind='stable')
+        return [int(i) for i in ordre[:n] if np.isfinite(score[i])]
+
+    def sauvegarder(self, chemin):
+        """Archive les résultats et les hyperparamètres (.npz)"""
+        np.savez(chemin, X=self.X, Y=self.Y, echelles=self.echelles,
+                 facteur_echelle=self.facteur_echelle, bruit=self.bruit,
+                 n_phases_max=self.n_phases_max, cles_config=np.array(self.cles_config))
+
+    @classmethod
+    def charger(cls, chemin):
+        """Modèle reconstruit depuis une archive de sauvegarder()"""
+        with np.load(chemin) as archive:
+            n_phases_max = int(archive['n_phases_max'])
+            modele = cls(n_phases_max, [str(c) for c in archive['cles_config']],
+                         archive['echelles'][2 * n_phases_max + 1:],
+                         float(archive['facteur_echelle']), float(archive['bruit']))
+            modele.X, modele.Y = archive['X'], archive['Y']
+        if len(modele):
+            modele._factoriser()
+            modele._n_ajustement = len(modele)
+        return modele
+
+class ModelesSubstitution:
+    """
+    Un ModeleSubstitution par jeu de conditions (cle_conditions) : les
+    résultats sont rangés selon la configuration jointe, les candidates
+    comparées au seul modèle de leurs conditions
+    """
+
+    def __init__(self, cles_conditions=CLES_CONDITIONS, **options):
+        """
+        Args:
+            cles_conditions: paramètres de configuration définissant les conditions
+            **options: arguments de ModeleSubstitution
+        """
+        self.cles_conditions = tuple(cles_conditions)
+        self.options = options
+        self.modeles = {}
+
+    def __len__(self):
+        return sum(len(modele) for modele in self.modeles.values())
+
+    def modele(self, config):
+        """Modèle des conditions de `config` (None si aucun résultat)"""
+        return self.modeles.get(cle_conditions(config, self.cles_conditions))
+
+    def ajouter_resultat(self, resultat):
+        """Ajoute un résultat au modèle de ses conditions (voir ModeleSubstitution.ajouter_resultat)"""
+        if not tour_acheve(resultat):
+            return False
+        cle = cle_conditions(resultat['config'], self.cles_conditions)
+        if cle not in self.modeles:
+            modele = ModeleSubstitution(**self.options)
+            if not modele.accepte(resultat['config']['bornes_vitesse']):
+                return False
+            self.modeles[cle] = modele
+        return self.modeles[cle].ajouter_resultat(resultat)
+
+    def selectionner(self, strategies, config, n=10, **options):
+        """
+        Indices des `n` stratégies à simuler dans les conditions de `config`
+        (voir ModeleSubstitution.selectionner) ; les premières tant que ces
+        conditions n'ont aucun résultat. Les stratégies que le modèle ne
+        peut pas coder sont placées après les autres.
+        """
+        modele = self.modele(config)
+        if modele is None or not len(modele):
+            return list(range(min(n, len(strategies))))
+        codees = [i for i, bornes in enumerate(strategies) if modele.accepte(bornes)]
+        choix = [codees[i] for i in modele.selectionner([strategies[i] for i in codees], config,
+                                                        n=n, **options)] if codees else []
+        autres = [i for i in range(len(strategies)) if not modele.accepte(strategies[i])]
+        return (choix + autres)[:n]
+
+    def sauvegarder(self, chemin):
+        """
+        Archive les résultats et les hyperparamètres de tous les modèles dans
+        un fichier .npz (écrit à côté puis renommé : un lecteur concurrent
+        voit l'ancienne ou la nouvelle archive)
+        """
+        tableaux = {'cles_conditions': np.array(self.cles_conditions)}
+        for i, (cle, modele) in enumerate(self.modeles.items()):
+            tableaux[f'conditions_{i}'] = np.array([np.nan if v is None else v for v in cle])
+            tableaux[f'X_{i}'], tableaux[f'Y_{i}'] = modele.X, modele.Y
+            tableaux[f'hyperparametres_{i}'] = np.array([modele.facteur_echelle, modele.bruit])
+        dossier = os.path.dirname(os.path.abspath(chemin))
+        os.makedirs(dossier, exist_ok=True)
+        descripteur, temporaire = tempfile.mkstemp(suffix='.npz', dir=dossier)
+        try:
+            with os.fdopen(descripteur, 'wb') as fichier:
+                np.savez(fichier, **tableaux)
+            os.replace(temporaire, chemin)
+        except BaseException:
+            os.remove(temporaire)
+            raise
+
+    def charger(self, chemin):
+        """
+        Reprend les modèles d'une archive de sauvegarder() dont les conditions
+        n'ont pas encore de modèle ; une archive d'autres conditions ou
+        d'autres entrées est ignorée. Retourne le nombre de résultats repris.
+        """
+        n_repris = 0
+        with np.load(chemin, allow_pickle=False) as archive:
+            if tuple(str(c) for c in archive['cles_conditions']) != self.cles_conditions:
+                return 0
+            i = 0
+            while f'X_{i}' in archive:
+                cle = tuple(None if np.isnan(v) else float(v) for v in archive[f'conditions_{i}'])
+                modele = ModeleSubstitution(**self.options)
+                X = archive[f'X_{i}']
+                if cle not in self.modeles and len(X) and X.shape[1] == modele.echelles.size:
+                    modele.facteur_echelle, modele.bruit = (float(v) for v in archive[f'hyperparametres_{i}'])
+                    modele.X, modele.Y = X, archive[f'Y_{i}']
+                    modele._factoriser()
+                    modele._n_ajustement = len(modele)
+                    self.modeles[cle] = modele
+                    n_repris += len(modele)
+                i += 1
+        return n_repris
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""
+Pool de processus persistant pour les simulations par lot
+
+Chaque worker charge le module de simulation une seule fois, compile les
+noyaux numba (ou les recharge du cache disque) puis simule les stratégies qu'on lui confie.
+Les tables d'interpolation (piste et groupe motopropulseur) sont construites
+une seule fois par le processus parent et publiées en mémoire partagée : les
+workers les lisent sans copie.
+"""
+
+import atexit
+import importlib.util
+import multiprocessing as mp
+import os
+import sys
+import time
+import traceback
+from collections import deque
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+
+import numpy as np
+
+
+def charger_module(chemin):
+    """
+    Charge le module de simulation depuis son chemin, sous le nom de son
+    fichier (celui d'un import ordinaire, que désignent les noyaux du cache
+    numba) ; un module déjà importé depuis ce fichier est réutilisé
+    """
+    nom = os.path.splitext(os.path.basename(chemin))[0]
+    module = sys.modules.get(nom)
+    if module is not None and os.path.abspath(getattr(module, '__file__', '')) == os.path.abspath(chemin):
+        return module
+    spec = importlib.util.spec_from_file_location(nom, chemin)
+    module = importlib.util.module_from_spec(spec)
+    # Enregistré avant exécution : numba réimporte le module par son nom
+    # pour recharger les noyaux du cache disque
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+# =============================================================================
+# Publication des tables en mémoire partagée
+# =============================================================================
+
+def _decrire(objet, tableaux):
+    """Description picklable d'un tuple nommé de tableaux (les tableaux sont ajoutés à `tableaux`)"""
+    if isinstance(objet, np.ndarray):
+        tableaux.append(np.ascontiguousarray(objet))
+        return ('tableau', len(tableaux) - 1)
+    if isinstance(objet, tuple) and hasattr(objet, '_fields'):
+        return ('tuple', type(objet).__name__, [_decrire(valeur, tableaux) for valeur in objet])
+    return ('scalaire', objet)
+
+def _reconstruire(description, tampon, disposition, module):
+    """Tuple nommé dont les tableaux sont des vues sur le bloc de mémoire partagée"""
+    genre = description[0]
+    if genre == 'tableau':
+        offset, forme, dtype = disposition[description[1]]
+        # Lecture seule, comme InterpolationData.to_tables : même type compilé
+        vue = np.ndarray(forme, dtype=dtype, buffer=tampon, offset=offset)
+        vue.flags.writeable = False
+        return vue
+    if genre == 'tuple':
+        classe = getattr(module, description[1])
+        return classe(*[_reconstruire(d, tampon, disposition, module) for d in description[2]])
+    return description[1]
+
+def publier_tables(tables):
+    """
+    Copie un dictionnaire de TablesInterpolation dans un seul bloc de mémoire
+    partagée. Retourne le bloc (à libérer par l'appelant) et sa description
+    picklable, passée aux workers.
+    """
+    tableaux = []
+    descriptions = {cle: _decrire(valeur, tableaux) for cle, valeur in tables.items()}
+
+    disposition = []
+    taille = 0
+    for a in tableaux:
+        taille = -(-taille // 64) * 64  # alignement sur 64 octets
+        disposition.append((taille, a.shape, a.dtype.str))
+        taille += a.nbytes
+
+    bloc = shared_memory.SharedMemory(create=True, size=max(taille, 1))
+    for a, (offset, forme, dtype) in zip(tableaux, disposition):
+        np.ndarray(forme, dtype=dtype, buffer=bloc.buf, offset=offset)[...] = a
+
+    return bloc, {'nom': bloc.name, 'disposition': disposition, 'tables': descriptions}
+
+def attacher_tables(publication, module):
+    """Rattache un bloc publié par publier_tables ; retourne (bloc, tables)"""
+    bloc = shared_memory.SharedMemory(name=publication['nom'])
+    tables = {
+        cle: _reconstruire(description, bloc.buf, publication['disposition'], module)
+        for cle, description in publication['tables'].items()
+    }
+    return bloc, tables
+
+# =============================================================================
+# Worker
+# =============================================================================
+
+def _boucle_worker(connexion, chemin_module, publication, graine):
+    """
+    Boucle d'un worker : chargement du module, rattachement des tables,
+    compilation des noyaux, puis une simulation par message (lot, indice, bornes,
+    config) jusqu'au message None
+    """
+    try:
+        module = charger_module(chemin_module)
+        bloc, tables = attacher_tables(publication, module)
+        np.random.seed(graine)
+        module.warmup()
+    except Exception:
+        connexion.send(('echec', None, None, traceback.format_exc()))
+        return
+    connexion.send(('pret', None, None, os.getpid()))
+
+    try:
+        while True:
+            message = connexion.recv()
+            if message is None:
+                break
+            lot, indice, bornes, config = message
+            try:
+                config = dict(config)
+                simuler = module.simuler_resume if config.pop('resume', False) else module.simuler_vehicule_optimise
+                resultat = simuler(
+                    bornes_vitesse=bornes, tables=tables[bool(config.get('enviolo_on', True))],
+                    **config
+                )
+                connexion.send(('ok', lot, indice, resultat))
+            except Exception as e:
+                connexion.send(('erreur', lot, indice, f"{type(e).__name__}: {e}"))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del tables
+        bloc.close()
+
+# =============================================================================
+# Pool
+# =============================================================================
+
+class _Worker:
+    """Processus worker et sa tâche en cours"""
+    def __init__(self, processus, connexion):
+        self.processus = processus
+        self.connexion = connexion
+        self.pret = False
+        self.tache = None  # (lot, indice)
+        self.debut = 0.0
+
+class PoolSimulation:
+    """
+    Pool de workers persistants partageant les tables d'interpolation
+
+    Les workers sont démarrés avec la méthode 'spawn' (identique sous Windows
+    et Linux) et réutilisés d'un lot à l'autre. Chaque worker reçoit sa
+    propre graine, dérivée de `graine`, pour le générateur global de numpy.
+    Un worker qui dépasse le timeout d'une tâche est arrêté et remplacé.
+    """
+
+    def __init__(self, chemin_module, n_workers=None, graine=None, module=None):
+        """
+        Args:
+            chemin_module: chemin du module de simulation
+            n_workers: nombre de processus (tous les cœurs par défaut)
+            graine: graine des générateurs des workers (aléatoire par défaut)
+            module: module de simulation déjà chargé par l'appelant
+        """
+        self.chemin_module = os.path.abspath(chemin_module)
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self._graines = np.random.SeedSequence(graine)
+        self._contexte = mp.get_context('spawn')
+        self._lot = 0
+
+        # Tables avec et sans Enviolo, construites une fois par le parent
+        module = module or charger_module(self.chemin_module)
+        interp_data = module.InterpolationData()
+        interp_data.load_from_existing_data()
+        distance_totale = float(interp_data.piste.distance[-1])
+        self._bloc, self._publication = publier_tables({
+            enviolo: interp_data.to_tables(module.construire_parametres(distance_totale, enviolo_on=enviolo))
+            for enviolo in (True, False)
+        })
+
+        self._workers = [self._demarrer_worker() for _ in range(self.n_workers)]
+        atexit.register(self.fermer)
+
+    def _demarrer_worker(self):
+        graine = int(self._graines.spawn(1)[0].generate_state(1)[0])
+        connexion, connexion_worker = self._contexte.Pipe()
+        processus = self._contexte.Process(
+            target=_boucle_worker,
+            args=(connexion_worker, self.chemin_module, self._publication, graine),
+            daemon=True,
+        )
+        processus.start()
+        connexion_worker.close()
+        return _Worker(processus, connexion)
+
+    def _remplacer(self, worker):
+        """Arrête un worker (bloqué ou mort) et en démarre un nouveau à sa place"""
+        if worker.processus.is_alive():
+            worker.processus.terminate()
+        worker.processus.join()
+        worker.connexion.close()
+        self._workers[self._workers.index(worker)] = self._demarrer_worker()
+
+    def executer(self, taches, timeout=None):
+        """
+        Simule une liste de tâches (bornes_vitesse, config) où config contient
+        les arguments de simuler_vehicule_optimise, ou ceux de simuler_resume
+        avec 'resume': True.
+
+        Générateur : (indice, statut, valeur) dans l'ordre d'achèvement, avec
+        statut 'ok' (valeur = tuple de simuler_vehicule_optimise ou
+        dictionnaire de simuler_resume), 'erreur'
+        ou 'timeout' (valeur = message). `timeout` limite la durée de chaque
+        tâche en secondes, comptée à partir de son envoi au worker.
+        """
+        if self._bloc is None:
+            raise RuntimeError("Pool de simulation fermé")
+        self._lot += 1
+        lot = self._lot
+        en_attente = deque(enumerate(taches))
+        restantes = len(en_attente)
+
+        while restantes:
+            for worker in self._workers:
+                if worker.pret and worker.tache is None and en_attente:
+                    indice, (bornes, config) = en_attente.popleft()
+                    worker.connexion.send((lot, indice, bornes, config))
+                    worker.tache = (lot, indice)
+                    worker.debut = time.monotonic()
+
+            occupes = [w for w in self._workers if w.tache is not None]
+            delai = None
+            if timeout is not None and occupes:
+                delai = max(0.0, min(w.debut for w in occupes) + timeout - time.monotonic())
+            connexions = wait([w.connexion for w in self._workers], timeout=delai)
+
+            for worker in [w for w in self._workers if w.connexion in connexions]:
+                try:
+                    statut, lot_tache, indice, valeur = worker.connexion.recv()
+                except (EOFError, OSError):
+                    tache = worker.tache
+                    self._remplacer(worker)
+                    if tache is not None and tache[0] == lot:
+                        restantes -= 1
+                        yield tache[1], 'erreur', "Worker arrêté pendant la simulation"
+                    continue
+                if statut == 'echec':
+                    self.fermer()
+                    raise RuntimeError(f"Échec du démarrage d'un worker:\n{valeur}")
+                if statut == 'pret':
+                    worker.pret = True
+                    continue
+                worker.tache = None
+                if lot_tache == lot:  # résultat d'un lot interrompu : ignoré
+                    restantes -= 1
+                    yield indice, statut, valeur
+
+            if timeout is not None:
+                maintenant = time.monotonic()
+                for worker in list(self._workers):
+                    if worker.tache is not None and maintenant - worker.debut > timeout:
+                        tache = worker.tache
+                        self._remplacer(worker)
+                        if tache[0] == lot:
+                            restantes -= 1
+                            yield tache[1], 'timeout', f"Simulation interrompue après {timeout}s"
+
+    def fermer(self):
+        """Arrête les workers et libère la mémoire partagée"""
+        if self._bloc is None:
+            return
+        for worker in self._workers:
+            try:
+                worker.connexion.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers:
+            worker.processus.join(timeout=5)
+            if worker.processus.is_alive():
+                worker.processus.terminate()
+                worker.processus.join()
+            worker.connexion.close()
+        self._workers = []
+        self._bloc.close()
+        self._bloc.unlink()
+        self._bloc = None
+        atexit.unregister(self.fermer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
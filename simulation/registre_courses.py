@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Registre des simulations et des courses réelles
+
+Index sqlite (une ligne par simulation ou par course : date, source,
+stratégie, conditions et grandeurs scalaires) devant des fichiers Parquet
+de télémétrie (export_resultats.ecrire_run). Les filtres de la page
+Analyses (conditions, stratégie, période) sont des requêtes sur les index
+de la table, avec agrégation et pagination côté sqlite : seule la page
+affichée est chargée.
+"""
+
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from resultat_simulation import SimulationResult
+from export_resultats import ecrire_run, lire_run
+
+# Registre par défaut : data/courses du dépôt (ETA_ONE_COURSES pour un autre dossier)
+DOSSIER_REGISTRE = os.environ.get('ETA_ONE_COURSES') or os.path.join(
+    os.environ.get('ETA_ONE_DATA') or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'),
+    'courses')
+
+# Sources des lignes du registre
+SOURCE_SIMULATION = 'simulation'
+SOURCE_COURSE = 'course'
+
+# Colonnes de regroupement autorisées par agreger()
+REGROUPEMENTS = {
+    'conditions': 'conditions',
+    'strategie': 'strategie',
+    'source': 'source',
+    'jour': 'substr(date, 1, 10)',
+}
+
+# Colonnes de tri autorisées par rechercher()
+TRIS = ('date', 'temps_total', 'consommation_ml', 'efficacite_km_l')
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS courses ("
+    "id INTEGER PRIMARY KEY, date TEXT NOT NULL, source TEXT NOT NULL, "
+    "strategie TEXT NOT NULL, conditions TEXT NOT NULL, "
+    "bornes_vitesse TEXT, config TEXT, empreinte_donnees TEXT, "
+    "temps_total REAL, consommation_ml REAL, efficacite_km_l REAL, distance REAL, "
+    "telemetrie TEXT)",
+    "CREATE INDEX IF NOT EXISTS courses_date ON courses (date)",
+    # Index couvrants des filtres de la page Analyses : les agrégats ne
+    # lisent que l'index
+    "CREATE INDEX IF NOT EXISTS courses_conditions ON courses "
+    "(conditions, date, strategie, source, temps_total, consommation_ml, efficacite_km_l)",
+    "CREATE INDEX IF NOT EXISTS courses_strategie ON courses "
+    "(strategie, date, conditions, source, temps_total, consommation_ml, efficacite_km_l)",
+    "CREATE INDEX IF NOT EXISTS courses_source ON courses (source, date)",
+)
+
+
+def _date_iso(valeur):
+    """Date ISO 8601 (texte triable) d'une date, d'un datetime ou d'une chaîne"""
+    if valeur is None:
+        return datetime.now().isoformat(timespec='seconds')
+    if isinstance(valeur, str):
+        return valeur
+    if isinstance(valeur, datetime):
+        return valeur.isoformat(timespec='seconds')
+    return valeur.isoformat()
+
+class RegistreCourses:
+    """
+    Registre des simulations et des courses réelles (index sqlite et
+    télémétrie Parquet dans `dossier`)
+    """
+
+    def __init__(self, dossier=DOSSIER_REGISTRE):
+        self.dossier = dossier
+        os.makedirs(os.path.join(dossier, 'telemetrie'), exist_ok=True)
+        with self._connexion() as connexion:
+            for instruction in SCHEMA:
+                connexion.execute(instruction)
+
+    @contextmanager
+    def _connexion(self):
+        """Connexion au registre, validée puis fermée en sortie de bloc"""
+        connexion = sqlite3.connect(os.path.join(self.dossier, 'registre.sqlite'), timeout=30)
+        try:
+            connexion.execute("PRAGMA journal_mode=WAL")
+            with connexion:
+                yield connexion
+        finally:
+            connexion.close()
+
+    def _inserer(self, ligne, resultat=None):
+        """Insère une ligne ; la télémétrie de `resultat` est écrite sous l'identifiant obtenu"""
+        colonnes = list(ligne)
+        with self._connexion() as connexion:
+            curseur = connexion.execute(
+                f"INSERT INTO courses ({', '.join(colonnes)}) VALUES ({', '.join('?' * len(colonnes))})",
+                [ligne[c] for c in colonnes])
+            identifiant = curseur.lastrowid
+        if resultat is not None and len(resultat):
+            try:
+                chemin = ecrire_run(resultat, os.path.join(self.dossier, 'telemetrie', f'{identifiant}.parquet'),
+                                    ligne.get('empreinte_donnees'), identifiant)
+            except ImportError:
+                # Sans pyarrow, seules les grandeurs scalaires sont enregistrées
+                return identifiant
+            with self._connexion() as connexion:
+                connexion.execute("UPDATE courses SET telemetrie = ? WHERE id = ?",
+                                  (os.path.relpath(chemin, self.dossier), identifiant))
+        return identifiant
+
+    def enregistrer_simulation(self, resultat, strategie, conditions, date=None,
+                               empreinte_donnees=None, telemetrie=True):
+        """
+        Enregistre un SimulationResult (télémétrie comprise si `telemetrie`) ;
+        retourne son identifiant
+        """
+        metriques = resultat.metriques
+        ligne = {
+            'date': _date_iso(date),
+            'source': SOURCE_SIMULATION,
+            'strategie': strategie,
+            'conditions': conditions,
+            'bornes_vitesse': json.dumps(resultat.config.get('bornes_vitesse'), default=float),
+            'config': json.dumps(resultat.config, default=lambda v: v.tolist() if hasattr(v, 'tolist') else str(v)),
+            'empreinte_donnees': empreinte_donnees,
+            'temps_total': metriques.get('temps_total'),
+            'consommation_ml': metriques.get('consommation_ml'),
+            'efficacite_km_l': metriques.get('efficacite_km_l'),
+            'distance': metriques.get('distance_finale'),
+        }
+        return self._inserer(ligne, resultat if telemetrie else None)
+
+    def enregistrer_course(self, date, strategie, conditions, temps_total, consommation_ml, distance,
+                           bornes_vitesse=None, telemetrie=None):
+        """
+        Enregistre une course réelle ; `telemetrie` est un DataFrame des
+        canaux mesurés (une colonne par canal). Retourne son identifiant.
+        """
+        ligne = {
+            'date': _date_iso(date),
+            'source': SOURCE_COURSE,
+            'strategie': strategie,
+            'conditions': conditions,
+            'bornes_vitesse': None if bornes_vitesse is None else json.dumps(bornes_vitesse, default=float),
+            'config': None,
+            'empreinte_donnees': None,
+            'temps_total': float(temps_total),
+            'consommation_ml': float(consommation_ml),
+            'efficacite_km_l': (distance / 1000) / (consommation_ml / 1000),
+            'distance': float(distance),
+        }
+        resultat = None
+        if telemetrie is not None:
+            metriques = {cle: ligne[cle] for cle in ('temps_total', 'consommation_ml', 'efficacite_km_l')}
+            resultat = SimulationResult(telemetrie.to_numpy(dtype=np.float64).T, metriques,
+                                        {'bornes_vitesse': bornes_vitesse}, telemetrie.columns)
+        return self._inserer(ligne, resultat)
+
+    @staticmethod
+    def _filtre(conditions=None, strategies=None, debut=None, fin=None, source=None):
+        """Clause WHERE et paramètres des filtres (fin incluse)"""
+        clauses, parametres = [], []
+        for colonne, valeurs in (('conditions', conditions), ('strategie', strategies)):
+            if valeurs is not None:
+                valeurs = list(valeurs)
+                clauses.append(f"{colonne} IN ({', '.join('?' * len(valeurs))})")
+                parametres += valeurs
+        if debut is not None:
+            clauses.append("date >= ?")
+            parametres.append(_date_iso(debut))
+        if fin is not None:
+            # Fin incluse : jusqu'au jour suivant pour une date sans heure
+            if isinstance(fin, date) and not isinstance(fin, datetime):
+                fin = fin + timedelta(days=1)
+                clauses.append("date < ?")
+            else:
+                clauses.append("date <= ?")
+            parametres.append(_date_iso(fin))
+        if source is not None:
+            clauses.append("source = ?")
+            parametres.append(source)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", parametres
+
+    def _requete(self, sql, parametres=()):
+        with self._connexion() as connexion:
+            return pd.read_sql_query(sql, connexion, params=parametres)
+
+    def compter(self, **filtres):
+        """Nombre de lignes correspondant aux filtres"""
+        where, parametres = self._filtre(**filtres)
+        with self._connexion() as connexion:
+            return connexion.execute(f"SELECT COUNT(*) FROM courses{where}", parametres).fetchone()[0]
+
+    def rechercher(self, limite=50, decalage=0, tri='date', descendant=True, **filtres):
+        """
+        Page de lignes (DataFrame, sans la configuration) correspondant aux
+        filtres conditions, strategies, debut, fin et source
+        """
+        if tri not in TRIS:
+            raise ValueError(f"Tri inconnu: {tri} ({', '.join(TRIS)})")
+        where, parametres = self._filtre(**filtres)
+        ordre = 'DESC' if descendant else 'ASC'
+        return self._requete(
+            "SELECT id, date, source, strategie, conditions, temps_total, consommation_ml, "
+            f"efficacite_km_l, distance FROM courses{where} ORDER BY {tri} {ordre}, id {ordre} "
+            "LIMIT ? OFFSET ?", parametres + [int(limite), int(decalage)])
+
+    def agreger(self, par='conditions', **filtres):
+        """
+        Nombre de lignes, moyennes et extrêmes des grandeurs scalaires par
+        `par` (conditions, strategie, source ou jour)
+        """
+        if par not in REGROUPEMENTS:
+            raise ValueError(f"Regroupement inconnu: {par} ({', '.join(REGROUPEMENTS)})")
+        where, parametres = self._filtre(**filtres)
+        groupe = REGROUPEMENTS[par]
+        return self._requete(
+            f"SELECT {groupe} AS {par}, COUNT(*) AS n, "
+            "AVG(temps_total) AS temps_moyen, MIN(temps_total) AS temps_min, "
+            "MAX(temps_total) AS temps_max, "
+            "AVG(consommation_ml) AS consommation_moyenne, MIN(consommation_ml) AS consommation_min, "
+            "MAX(consommation_ml) AS consommation_max, "
+            "AVG(efficacite_km_l) AS efficacite_moyenne, MIN(efficacite_km_l) AS efficacite_min, "
+            "MAX(efficacite_km_l) AS efficacite_max "
+            f"FROM courses{where} GROUP BY {groupe} ORDER BY {groupe}", parametres)
+
+    def valeurs(self, colonne):
+        """Valeurs distinctes de conditions, strategie ou source (pour les filtres)"""
+        if colonne not in ('conditions', 'strategie', 'source'):
+            raise ValueError(f"Colonne inconnue: {colonne}")
+        with self._connexion() as connexion:
+            return [v for (v,) in connexion.execute(f"SELECT DISTINCT {colonne} FROM courses ORDER BY {colonne}")]
+
+    def periode(self):
+        """Dates extrêmes du registre (None, None s'il est vide)"""
+        with self._connexion() as connexion:
+            debut, fin = connexion.execute("SELECT MIN(date), MAX(date) FROM courses").fetchone()
+        if debut is None:
+            return None, None
+        return datetime.fromisoformat(debut).date(), datetime.fromisoformat(fin).date()
+
+    def telemetrie(self, identifiant):
+        """SimulationResult de la télémétrie d'une ligne, ou None"""
+        with self._connexion() as connexion:
+            ligne = connexion.execute("SELECT telemetrie FROM courses WHERE id = ?", (int(identifiant),)).fetchone()
+        if ligne is None:
+            raise KeyError(identifiant)
+        if ligne[0] is None:
+            return None
+        return lire_run(os.path.join(self.dossier, ligne[0]))
+
+    def resultats_simulation(self, empreinte_donnees=None):
+        """
+        Simulations enregistrées avec leur configuration (celles faites sur
+        les données `empreinte_donnees` si donnée), au format des résultats du
+        wrapper : dictionnaires success, config, temps_total et
+        consommation_ml, dans l'ordre d'enregistrement
+        """
+        clauses, parametres = ["source = ?", "config IS NOT NULL"], [SOURCE_SIMULATION]
+        if empreinte_donnees is not None:
+            clauses.append("empreinte_donnees = ?")
+            parametres.append(empreinte_donnees)
+        with self._connexion() as connexion:
+            lignes = connexion.execute(
+                "SELECT config, temps_total, consommation_ml FROM courses "
+                f"WHERE {' AND '.join(clauses)} ORDER BY id", parametres).fetchall()
+        return [{'success': True, 'config': json.loads(config), 'temps_total': temps_total,
+                 'consommation_ml': consommation_ml}
+                for config, temps_total, consommation_ml in lignes]
+
+    def resume(self, **filtres):
+        """Nombre de lignes et moyennes des grandeurs scalaires correspondant aux filtres"""
+        where, parametres = self._filtre(**filtres)
+        with self._connexion() as connexion:
+            n, temps, consommation, efficacite = connexion.execute(
+                "SELECT COUNT(*), AVG(temps_total), AVG(consommation_ml), AVG(efficacite_km_l) "
+                f"FROM courses{where}", parametres).fetchone()
+        return {'n': n, 'temps_moyen': temps, 'consommation_moyenne': consommation,
+                'efficacite_moyenne': efficacite}
@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+"""
+Rendu des graphiques d'un tour
+
+Les figures de plot_results sont construites sur des objets Figure de
+matplotlib (sans pyplot ni fenêtre, backend Agg), à partir de séries
+décimées : chaque courbe garde le premier, le dernier, le minimum et le
+maximum de chaque intervalle, donc ses extrêmes et ses commutations. Le
+rendu en PNG ou SVG se fait dans un pool de processus en arrière-plan, et
+les fichiers sont mis en cache par empreinte du résultat : un même tour
+n'est jamais tracé deux fois.
+"""
+
+import hashlib
+import json
+import multiprocessing as mp
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+
+# Nombre maximal de points par courbe après décimation
+N_POINTS_MAX = 2000
+
+# Formats de fichier et résolution des rendus
+FORMATS = ('png',)
+DPI = 100
+
+# Figures produites, dans l'ordre de plot_results
+FIGURES = ('telemetrie', 'moteurs', 'profil_vitesse', 'strategie_circuit')
+
+
+def decimer(x, y, n_max=N_POINTS_MAX):
+    """
+    Sous-échantillonne la courbe (x, y) à n_max points au plus : premier,
+    dernier, minimum et maximum de y sur chacun de n_max / 4 intervalles
+    """
+    y = np.asarray(y)
+    n = y.size
+    if n <= n_max:
+        return np.asarray(x), y
+    taille = -(-n // max(n_max // 4, 1))
+    n_complet = (n // taille) * taille
+    blocs = y[:n_complet].reshape(-1, taille)
+    debuts = np.arange(0, n_complet, taille)
+    indices = [debuts, debuts + blocs.argmin(1), debuts + blocs.argmax(1), debuts + taille - 1]
+    if n_complet < n:
+        reste = y[n_complet:]
+        indices.append(np.array([n_complet, n_complet + reste.argmin(), n_complet + reste.argmax(), n - 1]))
+    indices = np.unique(np.concatenate(indices))
+    return np.asarray(x)[indices], y[indices]
+
+def figures_tour(t_eval, position, vitesse, forces, regimes_moteur, ratios_utilises, consommation,
+                 joules_elec_evolution=None, energie_supercap_evolution=None,
+                 moteur_elec_etat=None, moteur_thermique_etat=None, ml_total=None,
+                 bornes_vitesse=(), piste=None, n_max=N_POINTS_MAX, figure=None):
+    """
+    Figures de plot_results, courbes décimées à n_max points
+
+    piste : (distance, pos_x, pos_y) du circuit, sans figure de stratégie
+    sur le circuit si None. figure : fabrique des figures
+    (matplotlib.figure.Figure par défaut, plt.figure pour un affichage).
+    Retourne {nom: Figure} dans l'ordre de FIGURES.
+    """
+    if figure is None:
+        from matplotlib.figure import Figure as figure
+    t_eval = np.asarray(t_eval)
+
+    def tracer(ax, y, *args, **kwargs):
+        ax.plot(*decimer(t_eval, y, n_max), *args, **kwargs)
+
+    figures = {}
+    fig = figure(figsize=(20, 20))
+    axs = fig.subplots(4, 2)
+
+    # Position
+    tracer(axs[0, 0], position, label="Position (m)")
+    axs[0, 0].set_title("Position en fonction du temps")
+    axs[0, 0].set_xlabel("Temps (s)")
+    axs[0, 0].set_ylabel("Position (m)")
+    axs[0, 0].legend()
+
+    # Vitesse
+    tracer(axs[0, 1], vitesse, label="Vitesse (m/s)", color="green")
+    axs[0, 1].set_title("Vitesse en fonction du temps")
+    axs[0, 1].set_xlabel("Temps (s)")
+    axs[0, 1].set_ylabel("Vitesse (m/s)")
+    axs[0, 1].legend()
+
+    # Forces
+    tracer(axs[1, 0], forces["aero"], label="Force aérodynamique (N)")
+    tracer(axs[1, 0], forces["rolling"], label="Force de roulement (N)")
+    tracer(axs[1, 0], forces["gravity"], label="Force gravitationnelle (N)")
+    tracer(axs[1, 0], forces["wind"], label="Force du vent (N)")
+    axs[1, 0].set_title("Forces appliquées au véhicule")
+    axs[1, 0].set_xlabel("Temps (s)")
+    axs[1, 0].set_ylabel("Force (N)")
+    axs[1, 0].legend()
+
+    # Régime moteur
+    tracer(axs[1, 1], regimes_moteur, label="Régime moteur (RPM)", color="orange")
+    axs[1, 1].set_title("Régime moteur en fonction du temps")
+    axs[1, 1].set_xlabel("Temps (s)")
+    axs[1, 1].set_ylabel("RPM")
+    axs[1, 1].legend()
+
+    # Rapport Enviolo
+    tracer(axs[2, 0], ratios_utilises, label="Rapport Enviolo")
+    axs[2, 0].set_title("Rapport Enviolo en fonction du temps")
+    axs[2, 0].set_xlabel("Temps (s)")
+    axs[2, 0].set_ylabel("Rapport")
+    axs[2, 0].legend()
+
+    # Force motrice
+    tracer(axs[2, 1], forces["motor"], label="Force motrice (N)")
+    axs[2, 1].set_title("Force motrice appliquée au véhicule")
+    tracer(axs[2, 1], forces["elec"], label="Force moteur elec (N)")
+    axs[2, 1].set_xlabel("Temps (s)")
+    axs[2, 1].set_ylabel("Force (N)")
+    axs[2, 1].legend()
+
+    # Consommation thermique
+    tracer(axs[3, 0], np.asarray(consommation) / 0.75, label="Conso thermique cumulative (ml)", color="purple")
+    axs[3, 0].set_title("Consommation carburant en fonction du temps")
+    axs[3, 0].set_xlabel("Temps (s)")
+    axs[3, 0].set_ylabel("Consommation (ml)")
+    axs[3, 0].legend()
+
+    # Consommation électrique
+    if joules_elec_evolution is not None:
+        tracer(axs[3, 1], joules_elec_evolution, label="Conso électrique (J)", color="red")
+        axs[3, 1].set_title("Consommation électrique cumulée")
+        axs[3, 1].set_xlabel("Temps (s)")
+        axs[3, 1].set_ylabel("Énergie (J)")
+        axs[3, 1].legend()
+
+    fig.tight_layout()
+    figures['telemetrie'] = fig
+
+    if energie_supercap_evolution is not None and moteur_elec_etat is not None and moteur_thermique_etat is not None:
+        fig = figure(figsize=(14, 10))
+        axs = fig.subplots(2, 1, sharex=True)
+
+        # Tracé énergie supercaps
+        energie_supercap_evolution = np.asarray(energie_supercap_evolution)
+        tracer(axs[0], energie_supercap_evolution, label="Énergie supercaps (J)", color='green')
+
+        # Détection de récupération : quand l’énergie augmente
+        diff_energie = np.diff(energie_supercap_evolution)
+        recup_indices = np.where(diff_energie > 1e-3)[0]  # seuil pour ignorer bruit
+
+        if len(recup_indices) > 0:
+            t_recup_debut = t_eval[recup_indices[0]]
+            t_recup_fin = t_eval[recup_indices[-1]]
+
+            axs[0].axvspan(t_recup_debut, t_recup_fin, color='lime', alpha=0.3, label="Zone de récupération")
+
+        axs[0].set_ylabel("Énergie (Joules)")
+        axs[0].set_title("Évolution de l'énergie dans les supercondensateurs")
+        axs[0].legend()
+        axs[0].grid(True)
+
+        # Tracé état des moteurs
+        tracer(axs[1], moteur_elec_etat, label="Moteur électrique actif", color='blue', drawstyle='steps-post')
+        tracer(axs[1], moteur_thermique_etat, label="Moteur thermique actif", color='red', drawstyle='steps-post')
+        axs[1].set_xlabel("Temps (s)")
+        axs[1].set_ylabel("État (0=off, 1=on)")
+        axs[1].set_title("État des moteurs au cours du temps")
+        axs[1].legend()
+        axs[1].grid(True)
+
+        fig.tight_layout()
+        figures['moteurs'] = fig
+
+    fig = figure(figsize=(12, 6))
+    ax = fig.subplots()
+    ax.plot(*decimer(position, vitesse, n_max), label='Vitesse (m/s)', color='blue', linewidth=2)
+    ax.set_xlabel("Position (m)")
+    ax.set_ylabel("Vitesse (m/s)")
+    ax.set_title("Profil de vitesse sur le circuit")
+    ax.grid(True, alpha=0.3)
+    ax.legend()
+    fig.tight_layout()
+    figures['profil_vitesse'] = fig
+
+    if piste is not None:
+        figures['strategie_circuit'] = _figure_circuit(position, regimes_moteur, ml_total, bornes_vitesse,
+                                                       piste, n_max, figure)
+    return figures
+
+def _figure_circuit(position, regimes_moteur, ml_total, bornes_vitesse, piste, n_max, figure):
+    """Stratégie sur le circuit : points colorés par régime moteur, bornes de vitesse annotées"""
+    distance, pos_x, pos_y = piste
+    position = np.asarray(position)
+    regimes_moteur = np.asarray(regimes_moteur)
+    fig = figure(figsize=(12, 10))
+    ax = fig.subplots()
+    # Interpolation des coordonnées X et Y pour les points du véhicule
+    pos_x_interp = np.interp(position, np.linspace(0, distance[-1], len(pos_x)), pos_x)
+    pos_y_interp = np.interp(position, np.linspace(0, distance[-1], len(pos_y)), pos_y)
+    # Tracé du circuit
+    circuit_x = np.interp(np.linspace(0, distance[-1], 1000),
+                          np.linspace(0, distance[-1], len(pos_x)), pos_x)
+    circuit_y = np.interp(np.linspace(0, distance[-1], 1000),
+                          np.linspace(0, distance[-1], len(pos_y)), pos_y)
+    ax.plot(circuit_x, circuit_y, 'lightgray', linewidth=3, zorder=1, label='Circuit')
+    # Points régulièrement espacés le long du tour, colorés selon le régime moteur
+    points = np.unique(np.searchsorted(position, np.linspace(position[0], position[-1], min(n_max, position.size))))
+    points = points[points < position.size]
+    scatter = ax.scatter(pos_x_interp[points], pos_y_interp[points], c=regimes_moteur[points],
+                         cmap='viridis', s=15, zorder=2)
+    # Ajout de la barre de couleur
+    cbar = fig.colorbar(scatter, ax=ax)
+    cbar.set_label('Engine RPM (RPM)', fontsize=12)
+    # Marqueurs de départ et d'arrivée
+    ax.scatter(pos_x_interp[0], pos_y_interp[0], marker='o', color='green', s=100, label='Starting line', zorder=3)
+    ax.scatter(pos_x_interp[-1], pos_y_interp[-1], marker='x', color='red', s=100, label='Finish line', zorder=3)
+    # Détection des phases moteur actives
+    is_on = regimes_moteur > 0
+    changes = np.diff(is_on.astype(int))
+    starts = np.where(changes == 1)[0] + 1
+    ends = np.where(changes == -1)[0] + 1
+    # Gestion du cas où ça commence ou finit moteur allumé
+    if is_on[0]: starts = np.insert(starts, 0, 0)
+    if is_on[-1]: ends = np.append(ends, len(regimes_moteur) - 1)
+    # Bornes de vitesse annotées
+    dx = 15  # décalage horizontal
+    dy = 10  # décalage vertical
+    point_size = 60  # taille des points de début/fin
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        if i < len(bornes_vitesse):
+            v_start, v_end = bornes_vitesse[i]
+            x_start, y_start = pos_x_interp[start], pos_y_interp[start]
+            x_end, y_end = pos_x_interp[end], pos_y_interp[end]
+            # Points visibles
+            ax.scatter(x_start, y_start, s=point_size, color='blue', zorder=5)
+            ax.scatter(x_end, y_end, s=point_size, color='orange', zorder=5)
+            # Texte décalé pour éviter de superposer le circuit
+            ax.text(x_start + dx, y_start + dy, f"{v_start:.1f} m/s",
+                    fontsize=10, color='black', ha='left', va='bottom', weight='bold')
+            ax.text(x_end + dx, y_end + dy, f"{v_end:.1f} m/s",
+                    fontsize=10, color='black', ha='left', va='bottom', weight='bold')
+            # flèche
+            ax.annotate('',
+                        xy=(x_end + dx/2, y_end + dy/2),
+                        xytext=(x_end, y_end),
+                        arrowprops=dict(arrowstyle="-", color='gray', lw=1, linestyle='dotted'),
+                        zorder=3)
+            ax.annotate('',
+                        xy=(x_start + dx, y_start + dy),
+                        xytext=(x_start, y_start),
+                        arrowprops=dict(arrowstyle="-", color='gray', lw=1, linestyle='dotted'),
+                        zorder=3)
+
+    # Texte de consommation en haut à droite (95% en x, 95% en y)
+    xlim = ax.get_xlim()
+    ylim = ax.get_ylim()
+    x_text = xlim[0] + 0.95 * (xlim[1] - xlim[0])
+    y_text = ylim[0] + 0.95 * (ylim[1] - ylim[0])
+    if ml_total is not None:
+        ax.text(x_text, y_text, f"Total consumption:\n{ml_total:.1f} ml",
+                fontsize=12, ha='right', va='top', weight='bold',
+                bbox=dict(boxstyle="round,pad=0.3", facecolor='white', alpha=0.8, edgecolor='black'))
+
+    # Configuration finale
+    ax.set_title("Strategy used around the track", fontsize=14)
+    ax.set_xlabel('X (m)')
+    ax.set_ylabel('Y (m)')
+    ax.grid(True, alpha=0.3)
+    ax.legend(loc='upper right', fontsize=12)
+    ax.axis('equal')
+    fig.tight_layout()
+    return fig
+
+def figures_resultat(resultat, piste=None, n_max=N_POINTS_MAX, figure=None):
+    """Figures de plot_results pour un SimulationResult"""
+    c = resultat.channel
+    forces = {
+        'motor': c('force_moteur'), 'aero': c('force_aerodynamique'), 'rolling': c('force_roulement'),
+        'gravity': c('force_gravite'), 'wind': c('force_vent'), 'elec': c('force_electrique'),
+    }
+    return figures_tour(
+        c('temps'), c('position'), c('vitesse'), forces, c('regimes_moteur'), c('ratios_enviolo'),
+        c('consommation_cumul'), c('joules_elec'), c('energie_supercap'),
+        c('moteur_electrique_actif'), c('moteur_thermique_actif'), resultat.metriques.get('consommation_ml'),
+        (resultat.config or {}).get('bornes_vitesse') or (), piste, n_max, figure
+    )
+
+def empreinte_resultat(resultat, n_max=N_POINTS_MAX):
+    """Empreinte SHA-256 des canaux, de la consommation et des bornes d'un résultat (clé du cache de rendu)"""
+    empreinte = hashlib.sha256(resultat.donnees.tobytes())
+    empreinte.update(json.dumps([resultat.canaux, resultat.metriques.get('consommation_ml'),
+                                 (resultat.config or {}).get('bornes_vitesse'), n_max],
+                                default=float).encode())
+    return empreinte.hexdigest()
+
+def _chemins(dossier, cle, formats, figures=FIGURES):
+    return {nom: [os.path.join(dossier, cle, f'{nom}.{fmt}') for fmt in formats] for nom in figures}
+
+def _en_cache(dossier, cle, formats):
+    """Chemins des figures déjà rendues pour `cle`, ou None"""
+    repertoire = os.path.join(dossier, cle)
+    if not os.path.isdir(repertoire):
+        return None
+    presents = set(os.listdir(repertoire))
+    if 'telemetrie.' + formats[0] not in presents:
+        return None
+    chemins = {nom: fichiers for nom, fichiers in _chemins(dossier, cle, formats).items()
+               if all(os.path.basename(f) in presents for f in fichiers)}
+    return chemins if 'telemetrie' in chemins else None
+
+def enregistrer_figures(figures, repertoire, formats=FORMATS, dpi=DPI):
+    """
+    Enregistre les figures {nom: Figure} dans repertoire/<nom>.<format>
+    (écriture atomique : un fichier présent est un fichier complet).
+    Retourne {nom: [chemins]}.
+    """
+    os.makedirs(repertoire, exist_ok=True)
+    chemins = {}
+    for nom, fig in figures.items():
+        chemins[nom] = []
+        for fmt in formats:
+            chemin = os.path.join(repertoire, f'{nom}.{fmt}')
+            temporaire = f'{chemin}.{os.getpid()}.tmp'
+            fig.savefig(temporaire, format=fmt, dpi=dpi)
+            os.replace(temporaire, chemin)
+            chemins[nom].append(chemin)
+    return chemins
+
+def rendre_resultat(resultat, dossier, formats=FORMATS, piste=None, n_max=N_POINTS_MAX, dpi=DPI):
+    """
+    Rend les figures d'un résultat dans dossier/<empreinte>/<figure>.<format>
+    (ou les reprend du cache). Retourne {figure: [chemins]}.
+    """
+    formats = tuple(formats)
+    cle = empreinte_resultat(resultat, n_max)
+    chemins = _en_cache(dossier, cle, formats)
+    if chemins is not None:
+        return chemins
+
+    return enregistrer_figures(figures_resultat(resultat, piste, n_max), os.path.join(dossier, cle),
+                               formats, dpi)
+
+# =============================================================================
+# Pool de rendu en arrière-plan
+# =============================================================================
+
+_PISTE = None
+
+def _initialiser_worker(piste):
+    """Backend Agg et données du circuit du worker"""
+    global _PISTE
+    import matplotlib
+    matplotlib.use('Agg')
+    _PISTE = piste
+
+def _rendre_worker(resultat, dossier, formats, n_max, dpi):
+    return rendre_resultat(resultat, dossier, formats, _PISTE, n_max, dpi)
+
+class PoolRendu:
+    """
+    Pool de processus rendant les figures de résultats en arrière-plan
+
+    soumettre() retourne aussitôt un Future ({figure: [chemins]}) ; les
+    résultats déjà rendus sont servis par le cache sans passer par le pool.
+    """
+
+    def __init__(self, dossier, n_workers=None, piste=None, formats=FORMATS, n_max=N_POINTS_MAX, dpi=DPI):
+        """
+        Args:
+            dossier: dossier des rendus (un sous-dossier par empreinte de résultat)
+            n_workers: nombre de processus (la moitié des cœurs par défaut)
+            piste: (distance, pos_x, pos_y) du circuit, transmis une fois à chaque worker
+            formats: formats de fichier ('png', 'svg', ...)
+            n_max: nombre maximal de points par courbe
+            dpi: résolution des rendus matriciels
+        """
+        self.dossier = dossier
+        self.formats = tuple(formats)
+        self.n_max = n_max
+        self.dpi = dpi
+        self.n_workers = n_workers or max(1, (os.cpu_count() or 2) // 2)
+        # spawn : les workers n'héritent ni de l'état numba ni d'un backend graphique
+        self._executeur = ProcessPoolExecutor(self.n_workers, mp_context=mp.get_context('spawn'),
+                                              initializer=_initialiser_worker, initargs=(piste,))
+
+    def soumettre(self, resultat):
+        """Rendu en arrière-plan d'un résultat ; Future de {figure: [chemins]}"""
+        chemins = _en_cache(self.dossier, empreinte_resultat(resultat, self.n_max), self.formats)
+        if chemins is not None:
+            futur = Future()
+            futur.set_result(chemins)
+            return futur
+        return self._executeur.submit(_rendre_worker, resultat, self.dossier, self.formats,
+                                      self.n_max, self.dpi)
+
+    def rendre_lot(self, resultats):
+        """Rend un lot de résultats ; liste des {figure: [chemins]} dans l'ordre"""
+        return [futur.result() for futur in [self.soumettre(r) for r in resultats]]
+
+    def fermer(self, attendre=True):
+        """Arrête les workers (après les rendus en cours si `attendre`)"""
+        self._executeur.shutdown(wait=attendre)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Résultat de simulation en colonnes
+
+Les canaux de télémétrie d'un tour sont les lignes d'un seul tableau 2-D
+contigu (un canal = une ligne contiguë) : channel() en rend une vue sans
+copie, to_pandas() et to_arrow() construisent leurs colonnes sur le même
+tampon. Les métriques scalaires et la configuration restent accessibles par
+clé comme dans les anciens dictionnaires de résultats
+(result['temps_total'], result['vitesse'], result['forces']['moteur']).
+"""
+
+import numpy as np
+import pandas as pd
+
+# Canaux enregistrés, dans l'ordre des lignes du tableau
+CANAUX = (
+    'temps', 'position', 'vitesse', 'regimes_moteur', 'ratios_enviolo',
+    'consommation_cumul', 'energie_supercap', 'joules_elec',
+    'moteur_thermique_actif', 'moteur_electrique_actif',
+    'force_moteur', 'force_aerodynamique', 'force_roulement', 'force_gravite',
+    'force_vent', 'force_electrique',
+)
+
+# Canaux dérivés, calculés au premier accès
+CANAUX_DERIVES = {
+    'vitesse_kmh': lambda resultat: resultat.channel('vitesse') * 3.6,
+}
+
+# Clés du dictionnaire 'forces' des anciens résultats
+FORCES = ('moteur', 'aerodynamique', 'roulement', 'gravite', 'vent', 'electrique')
+
+
+class SimulationResult:
+    """
+    Canaux (n_canaux, n) en float64, métriques scalaires et configuration
+    d'une simulation réussie
+    """
+    __slots__ = ('donnees', 'canaux', 'metriques', 'config', '_index', '_derives')
+
+    def __init__(self, donnees, metriques, config, canaux=CANAUX):
+        """
+        Args:
+            donnees: tableau (len(canaux), n), copié s'il n'est pas contigu
+            metriques: dictionnaire des grandeurs scalaires (et instants d'événements)
+            config: configuration de la simulation
+            canaux: noms des lignes de `donnees`
+        """
+        self.donnees = np.ascontiguousarray(donnees, dtype=np.float64)
+        self.donnees.flags.writeable = False
+        self.canaux = tuple(canaux)
+        if self.donnees.shape[0] != len(self.canaux):
+            raise ValueError(f"{self.donnees.shape[0]} lignes pour {len(self.canaux)} canaux")
+        self.metriques = metriques
+        self.config = config
+        self._index = {nom: i for i, nom in enumerate(self.canaux)}
+        self._derives = {}
+
+    @classmethod
+    def resume(cls, metriques, config):
+        """Résultat sans télémétrie (enregistrement 'summary')"""
+        return cls(np.empty((0, 0)), metriques, config, canaux=())
+
+    def __len__(self):
+        """Nombre d'échantillons enregistrés"""
+        return self.donnees.shape[1]
+
+    def channel(self, nom):
+        """Canal `nom` : vue en lecture seule sur le tableau, ou canal dérivé"""
+        if nom in self._index:
+            return self.donnees[self._index[nom]]
+        if nom in CANAUX_DERIVES and self.canaux:
+            if nom not in self._derives:
+                valeur = CANAUX_DERIVES[nom](self)
+                valeur.flags.writeable = False
+                self._derives[nom] = valeur
+            return self._derives[nom]
+        raise KeyError(f"Canal inconnu: {nom}")
+
+    @property
+    def forces(self):
+        """Forces (N) par nom, comme dans les anciens résultats"""
+        return {nom: self.channel(f'force_{nom}') for nom in FORCES if f'force_{nom}' in self._index}
+
+    @property
+    def nbytes(self):
+        """Taille des canaux en octets"""
+        return self.donnees.nbytes + sum(v.nbytes for v in self._derives.values())
+
+    def to_pandas(self, canaux=None):
+        """DataFrame des canaux (tous par défaut), colonnes construites sur le tableau sans copie"""
+        canaux = list(canaux or self.canaux)
+        return pd.DataFrame({nom: self.channel(nom) for nom in canaux}, copy=False)
+
+    def to_arrow(self, canaux=None):
+        """Table pyarrow des canaux ; les colonnes partagent le tampon du tableau"""
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("to_arrow() nécessite pyarrow (pip install pyarrow)") from e
+        canaux = list(canaux or self.canaux)
+        return pa.table({nom: pa.array(self.channel(nom)) for nom in canaux})
+
+    # Accès par clé, compatible avec les dictionnaires de résultats
+    def __getitem__(self, cle):
+        if cle in self.metriques:
+            return self.metriques[cle]
+        if cle == 'config':
+            return self.config
+        if cle == 'forces':
+            return self.forces
+        if cle == 'success':
+            return True
+        if cle == 'message':
+            return f"Simulation réussie en {self.metriques['temps_total']:.1f}s"
+        try:
+            return self.channel(cle)
+        except KeyError:
+            raise KeyError(cle) from None
+
+    def get(self, cle, defaut=None):
+        try:
+            return self[cle]
+        except KeyError:
+            return defaut
+
+    def __contains__(self, cle):
+        return self.get(cle) is not None
+
+    def keys(self):
+        derives = [nom for nom in CANAUX_DERIVES if self.canaux]
+        return [*self.metriques, *self.canaux, *derives, 'forces', 'config', 'success', 'message']
+
+    # Sérialisation (cache, pool) : les canaux dérivés sont recalculés
+    def __getstate__(self):
+        return self.donnees, self.metriques, self.config, self.canaux
+
+    def __setstate__(self, etat):
+        donnees, metriques, config, canaux = etat
+        self.__init__(donnees, metriques, config, canaux)
+
+    def __repr__(self):
+        return (f"SimulationResult({len(self.canaux)} canaux x {len(self)} points, "
+                f"temps_total={self.metriques.get('temps_total', float('nan')):.1f}s, "
+                f"consommation_ml={self.metriques.get('consommation_ml', float('nan')):.2f}ml)")
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Configuration commune des tests : modules de simulation/ importables et
+modèle chargé une fois par session (noyaux compilés ou relus du cache numba)
+"""
+
+import os
+import sys
+
+import pytest
+
+DOSSIER_SIMULATION = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  'simulation')
+CHEMIN_MODELE = os.path.join(DOSSIER_SIMULATION, 'modele_simulation_silesia_hybridation_streamlit.py')
+
+if DOSSIER_SIMULATION not in sys.path:
+    sys.path.insert(0, DOSSIER_SIMULATION)
+
+@pytest.fixture(scope='session')
+def modele():
+    """Module du modèle, chargé comme par le wrapper (noyaux prêts)"""
+    from pool_simulation import charger_module
+    module = charger_module(CHEMIN_MODELE)
+    module.warmup()
+    return module
+
+@pytest.fixture(scope='session')
+def circuit(modele):
+    """(distance du circuit, programme de vitesse nominal, temps_max) du modèle"""
+    return modele.donnees_piste().longueur, modele.bornes_vitesse, modele.temps_max
+
+@pytest.fixture(scope='session')
+def wrapper(tmp_path_factory):
+    """Wrapper sur le modèle, cache, registre, exports et rapports dans un dossier temporaire"""
+    pytest.importorskip('streamlit')
+    dossier = tmp_path_factory.mktemp('wrapper')
+    variables = {nom: str(dossier / sous_dossier) for nom, sous_dossier in (
+        ('ETA_ONE_RESULTATS', 'resultats'), ('ETA_ONE_COURSES', 'courses'),
+        ('ETA_ONE_EXPORTS', 'exports'), ('ETA_ONE_RAPPORTS', 'rapports'))}
+    anciennes = {nom: os.environ.get(nom) for nom in variables}
+    os.environ.update(variables)
+    from integration_wrapper import EtaOneSimulationWrapper
+    instance = EtaOneSimulationWrapper(CHEMIN_MODELE)
+    yield instance
+    instance.close_pool()
+    for nom, valeur in anciennes.items():
+        if valeur is None:
+            os.environ.pop(nom, None)
+        else:
+            os.environ[nom] = valeur
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Cache des résultats : clé canonique, aller-retour disque sans pickle,
+succès et échecs des deux niveaux
+"""
+
+import numpy as np
+import pytest
+
+from cache_resultats import CacheResultats, cle_simulation, deserialiser, serialiser
+from resultat_simulation import SimulationResult
+
+BORNES = [(6.5, 8.5), (7.0, 8.8)]
+CONFIG = {'distance_totale': 1321, 'temps_max': 189, 'moteur_elec': True}
+
+def _resultat(n=50, temps_total=175.1):
+    donnees = np.random.default_rng(0).random((3, n))
+    return SimulationResult(donnees, {'temps_total': temps_total, 'consommation_ml': 1.8},
+                            dict(CONFIG), canaux=('temps', 'position', 'vitesse'))
+
+def test_cle_canonique():
+    cle = cle_simulation(BORNES, CONFIG, 'abc')
+    assert cle_simulation([[6.5, 8.5], [7, 8.8]], dict(reversed(CONFIG.items())), 'abc') == cle
+    assert cle_simulation(np.array(BORNES), CONFIG, 'abc') == cle
+    assert cle_simulation(BORNES, {**CONFIG, 'plot': True, 'debug_mode': True}, 'abc') == cle
+    assert cle_simulation(BORNES, {**CONFIG, 'temps_max': 190}, 'abc') != cle
+    assert cle_simulation(BORNES, CONFIG, 'abd') != cle
+    assert cle_simulation(BORNES[::-1], CONFIG, 'abc') != cle
+
+def test_serialisation_sans_pickle():
+    resultat = _resultat()
+    repris = deserialiser(serialiser(resultat))
+    np.testing.assert_array_equal(repris.donnees, resultat.donnees)
+    assert repris.canaux == resultat.canaux
+    assert repris.metriques == resultat.metriques and repris.config == resultat.config
+
+def test_succes_memoire_puis_disque(tmp_path):
+    cache = CacheResultats(str(tmp_path))
+    cle = cle_simulation(BORNES, CONFIG, 'abc')
+    assert cache.lire(cle) is None
+    resultat = _resultat()
+    cache.ecrire(cle, resultat)
+    assert cache.lire(cle) is resultat
+
+    # Autre processus : niveau disque seul
+    autre = CacheResultats(str(tmp_path))
+    repris = autre.lire(cle)
+    np.testing.assert_array_equal(repris.donnees, resultat.donnees)
+    assert autre.lire(cle) is repris
+    statistiques = autre.statistiques()
+    assert (statistiques['succes_disque'], statistiques['succes_memoire'], statistiques['n_disque']) == (1, 1, 1)
+    assert cache.statistiques()['echecs'] == 1
+
+def test_fichier_illisible_traite_comme_absent(tmp_path):
+    cache = CacheResultats(str(tmp_path))
+    cle = cle_simulation(BORNES, CONFIG, 'abc')
+    cache.ecrire(cle, _resultat())
+    with open(cache._chemin(cle), 'wb') as fichier:
+        fichier.write(b'pas un npz')
+    assert CacheResultats(str(tmp_path)).lire(cle) is None
+
+def test_budget_memoire(tmp_path):
+    taille = _resultat().nbytes
+    cache = CacheResultats(str(tmp_path), budget_memoire=2 * taille + 4096)
+    cles = [cle_simulation(BORNES, {**CONFIG, 'temps_max': t}, 'abc') for t in range(3)]
+    for cle in cles:
+        cache.ecrire(cle, _resultat())
+    assert list(cache._memoire) == cles[1:]
+    assert cache.lire(cles[0]) is not None
+    assert cache.statistiques()['succes_disque'] == 1
+
+def test_budget_disque(tmp_path):
+    cache = CacheResultats(str(tmp_path))
+    cles = [cle_simulation(BORNES, {**CONFIG, 'temps_max': t}, 'abc') for t in range(3)]
+    for cle in cles:
+        cache.ecrire(cle, _resultat())
+    taille = cache.statistiques()['taille_disque'] // 3
+    assert cache.nettoyer(2 * taille) == 1
+    nouveau = CacheResultats(str(tmp_path))
+    assert nouveau.statistiques()['n_disque'] == 2
+    assert sum(nouveau.lire(cle) is None for cle in cles) == 1
+
+@pytest.mark.parametrize('temps_total', [175.1, np.float64(175.1)])
+def test_metriques_numpy(tmp_path, temps_total):
+    cache = CacheResultats(str(tmp_path))
+    cache.ecrire('ab' * 32, _resultat(temps_total=temps_total))
+    assert CacheResultats(str(tmp_path)).lire('ab' * 32)['temps_total'] == pytest.approx(175.1)
+
+def test_run_simulation_servi_par_le_cache(wrapper, circuit):
+    distance, bornes, temps_max = circuit
+    options = {'distance_totale': distance, 'temps_max': temps_max, 'record': 'summary'}
+    premier = wrapper.run_simulation(bornes, **options)
+    succes = wrapper.cache.succes_memoire
+    assert wrapper.run_simulation(bornes, **options) is premier
+    assert wrapper.cache.succes_memoire == succes + 1
+
+    # Autre session sur le même dossier : relu du disque, identique
+    cle = wrapper._cache_key(bornes, {**wrapper.default_config, **options})
+    repris = CacheResultats(wrapper.cache.dossier).lire(cle)
+    assert repris.metriques == pytest.approx(premier.metriques)
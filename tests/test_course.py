@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Course sur plusieurs tours : départs arrêtés enchaînés, reprise des tours
+au régime périodique et tours mémorisés du planificateur
+"""
+
+import numpy as np
+import pytest
+
+N_TOURS = 5
+
+@pytest.fixture(scope='module')
+def course(modele, circuit):
+    distance, bornes, temps_max = circuit
+    return modele.simuler_course(N_TOURS, bornes, distance, temps_max, moteur_elec=True)
+
+def test_premier_tour_identique_au_tour_seul(modele, circuit, course):
+    distance, bornes, temps_max = circuit
+    resume = modele.simuler_resume(distance, bornes, temps_max=temps_max, moteur_elec=True)
+    assert course['temps_tours'][0] == resume['temps_total']
+    assert course['ml_tours'][0] == resume['ml_total']
+
+def test_tours_en_departs_arretes(modele, circuit, course):
+    distance, _, temps_max = circuit
+    assert (course['statut'] == 0).all() and (course['temps_tours'] < temps_max).all()
+    # Arrêt en fin de freinage, avant la ligne
+    assert (course['temps_arrivee'] == -1).all()
+    assert (course['distance_tours'] < distance).all()
+    assert np.abs(course['etat_entree'][:, modele.E_VITESSE]).max() < 0.01
+    # Supercaps transmises d'un tour au suivant
+    np.testing.assert_array_equal(course['etat_entree'][1:, modele.E_SUPERCAP],
+                                  course['etat_sortie'][:-1, modele.E_SUPERCAP])
+
+def test_regime_periodique_memorise(modele, circuit, course):
+    distance, bornes, temps_max = circuit
+    assert course['n_integrations'] < N_TOURS
+    repris = course['tour_source'] != np.arange(N_TOURS)
+    assert repris[-1]
+    complete = modele.simuler_course(N_TOURS, bornes, distance, temps_max, tolerance=np.zeros(3),
+                                     moteur_elec=True)
+    assert complete['n_integrations'] == N_TOURS
+    np.testing.assert_allclose(course['temps_tours'], complete['temps_tours'], atol=0.05)
+    np.testing.assert_allclose(course['ml_tours'], complete['ml_tours'], atol=0.002)
+    assert course['ml_total'] == pytest.approx(course['ml_tours'].sum())
+
+def test_planificateur(modele, circuit, course):
+    distance, bornes, temps_max = circuit
+    lentes = [(bas, haut - 0.3) for bas, haut in bornes]
+    planificateur = modele.PlanificateurCourse([bornes, lentes], distance, temps_max, moteur_elec=True)
+    plan = planificateur.planifier(3, 3 * temps_max)
+    assert plan['n_tours_simules'] < plan['n_plans_evalues']
+    assert plan['temps_total'] <= 3 * temps_max
+    # Un seul programme : même course que simuler_course, aux entrées quantifiées près
+    unique = modele.PlanificateurCourse([bornes], distance, temps_max, moteur_elec=True)
+    plan = unique.planifier(N_TOURS, N_TOURS * temps_max)
+    assert plan['plan'] == [0] * N_TOURS
+    assert plan['temps_total'] == pytest.approx(course['temps_total'], abs=0.5)
+    assert plan['ml_total'] == pytest.approx(course['ml_total'], abs=0.02)
+    assert planificateur.planifier(3, 3 * 150.0) is None
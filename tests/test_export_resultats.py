@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Export des résultats : tour en Parquet, CSV et XLSX, jeu de données
+partitionné par lot
+"""
+
+import numpy as np
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+
+from export_resultats import JeuResultats, ecrire_run, exporter_csv, exporter_xlsx, lire_run
+from resultat_simulation import SimulationResult
+
+CANAUX = ('temps', 'position', 'vitesse')
+
+def _resultat(n=40, graine=0, temps_total=175.1):
+    donnees = np.random.default_rng(graine).random((len(CANAUX), n))
+    config = {'bornes_vitesse': [[6.5, 8.5], [7.0, 8.8]], 'temps_max': 189}
+    return SimulationResult(donnees, {'temps_total': temps_total, 'consommation_ml': 1.8,
+                                      'temps_arrivee': -1.0}, config, CANAUX)
+
+def test_parquet_aller_retour(tmp_path):
+    resultat = _resultat()
+    chemin = ecrire_run(resultat, str(tmp_path / 'tour.parquet'), empreinte_donnees='abc')
+    repris = lire_run(chemin)
+    np.testing.assert_array_equal(repris.donnees, resultat.donnees)
+    assert repris.canaux == CANAUX
+    assert repris.metriques == resultat.metriques and repris.config == resultat.config
+
+def test_csv(tmp_path, monkeypatch):
+    import export_resultats
+    monkeypatch.setattr(export_resultats, 'TAILLE_BLOC', 7)
+    resultat = _resultat()
+    chemin = exporter_csv(resultat, str(tmp_path / 'tour.csv'), {'temps': 'Temps (s)', 'vitesse': 'Vitesse (m/s)'})
+    lignes = open(chemin, encoding='utf-8').read().splitlines()
+    assert lignes[0] == '"Temps (s)","Vitesse (m/s)"'
+    assert len(lignes) == len(resultat) + 1
+    valeurs = np.loadtxt(chemin, delimiter=',', skiprows=1)
+    np.testing.assert_allclose(valeurs, resultat.donnees[[0, 2]].T)
+
+def test_xlsx(tmp_path):
+    openpyxl = pytest.importorskip('openpyxl')
+    resultat = _resultat()
+    chemin = exporter_xlsx(resultat, str(tmp_path / 'tour.xlsx'))
+    lignes = list(openpyxl.load_workbook(chemin, read_only=True)['telemetrie'].values)
+    assert list(lignes[0]) == list(CANAUX)
+    np.testing.assert_allclose(np.array(lignes[1:]), resultat.donnees.T)
+
+def test_jeu_de_donnees_par_lot(tmp_path):
+    jeu = JeuResultats(str(tmp_path))
+    resultats = [_resultat(graine=i, temps_total=170.0 + i) for i in range(3)]
+    resume = SimulationResult.resume({'temps_total': 180.0}, {'temps_max': 189})
+    lot = jeu.ajouter_lot([*resultats[:2], {'success': False}], lot='a', empreinte_donnees='abc')
+    jeu.ajouter_lot([resultats[2], resume], lot='a')
+    jeu.ajouter_lot([_resultat(graine=9)], lot='b')
+
+    assert lot == 'a' and jeu.lots() == ['a', 'b']
+    runs = jeu.runs(['a'])
+    assert sorted(runs['run_id']) == ['a-0', 'a-1', 'a-2', 'a-3']
+    assert sorted(runs['temps_total']) == [170.0, 171.0, 172.0, 180.0]
+
+    telemetrie = jeu.telemetrie(run_ids=['a-1'], canaux=['vitesse'])
+    np.testing.assert_array_equal(telemetrie.column('vitesse').to_numpy(), resultats[1]['vitesse'])
+    repris = jeu.resultat('a-2')
+    np.testing.assert_array_equal(repris.donnees, resultats[2].donnees)
+    assert repris.metriques == resultats[2].metriques
+    assert len(jeu.resultat('a-3')) == 0
+    with pytest.raises(KeyError):
+        jeu.resultat('c-0')
+
+def test_canaux_differents_refuses(tmp_path):
+    autre = SimulationResult(np.zeros((1, 4)), {}, {}, canaux=('temps',))
+    with pytest.raises(ValueError):
+        JeuResultats(str(tmp_path)).ajouter_lot([_resultat(), autre])
+
+@pytest.mark.parametrize('extension', ['parquet', 'csv', 'xlsx'])
+def test_export_results(wrapper, circuit, tmp_path, extension):
+    distance, bornes, temps_max = circuit
+    resultat = wrapper.run_simulation(bornes, distance_totale=distance, temps_max=temps_max,
+                                      record='decimated', record_step=1.0)
+    chemin = wrapper.export_results(resultat, str(tmp_path / f'tour.{extension}'))
+    assert chemin is not None
+    if extension == 'parquet':
+        repris = lire_run(chemin)
+        np.testing.assert_array_equal(repris.donnees, resultat.donnees)
+    elif extension == 'csv':
+        from integration_wrapper import EXPORT_COLUMNS
+        valeurs = np.loadtxt(chemin, delimiter=',', skiprows=1)
+        assert valeurs.shape == (len(resultat), len(EXPORT_COLUMNS))
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Intégrateurs du modèle comparés au RK45 de scipy (référence du modèle
+d'origine, solve_ivp max_step=0.005) sur le tour nominal
+"""
+
+import pytest
+
+# Écarts tolérés par rapport à scipy_rk45
+TOLERANCE_DEFAUT = {'temps': 1e-6, 'position': 1e-6, 'ml_total': 1e-8}
+TOLERANCE_HYBRIDE = {'temps': 0.5, 'position': 1.0, 'ml_total': 0.015}
+
+def _tour(modele, circuit, **options):
+    distance, bornes, temps_max = circuit
+    resultat = modele.simuler_vehicule_optimise(distance, bornes, temps_max=temps_max,
+                                                moteur_elec=True, plot=False, **options)
+    return {'temps': resultat[0][-1], 'position': resultat[1][-1], 'ml_total': resultat[-1]}
+
+@pytest.fixture(scope='module')
+def reference(modele, circuit):
+    return _tour(modele, circuit, integrateur='scipy_rk45')
+
+def _verifier(resultat, reference, tolerance):
+    for cle, ecart in tolerance.items():
+        assert resultat[cle] == pytest.approx(reference[cle], abs=ecart), cle
+
+def test_defaut_identique_a_scipy(modele, circuit, reference):
+    _verifier(_tour(modele, circuit), reference, TOLERANCE_DEFAUT)
+
+def test_resume_identique_au_tour_complet(modele, circuit, reference):
+    distance, bornes, temps_max = circuit
+    resume = modele.simuler_resume(distance, bornes, temps_max=temps_max, moteur_elec=True)
+    _verifier({'temps': resume['temps_total'], 'position': resume['distance_finale'],
+               'ml_total': resume['ml_total']}, reference, TOLERANCE_DEFAUT)
+
+def test_lot_identique_au_tour_complet(modele, circuit, reference):
+    distance, bornes, temps_max = circuit
+    lot = modele.simuler_lot([bornes, bornes], {'moteur_elec': True},
+                             distance_totale=distance, temps_max=temps_max)
+    for k in range(2):
+        _verifier({'temps': lot['temps_total'][k], 'position': lot['distance_finale'][k],
+                   'ml_total': lot['ml_total'][k]}, reference, TOLERANCE_DEFAUT)
+
+def test_hybride_proche_de_scipy(modele, circuit, reference):
+    _verifier(_tour(modele, circuit, integrateur='hybride'), reference, TOLERANCE_HYBRIDE)
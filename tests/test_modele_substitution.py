@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Modèle de substitution : factorisation incrémentale, filtrage des tours,
+modèles par conditions et archive
+"""
+
+import numpy as np
+import pytest
+
+from modele_substitution import ModeleSubstitution, ModelesSubstitution
+
+CONDITIONS = {'distance_totale': 1321, 'temps_max': 189, 'vent_active': False, 'vitesse_vent': 0,
+              'wind_angle_global': 0, 'aero_active': True, 'gravite_active': True,
+              'enviolo_on': True, 'moteur_elec': True}
+
+def _resultat(bornes, temps_total=None, consommation_ml=None, **config):
+    """Résultat au format du wrapper, sorties synthétiques régulières par défaut"""
+    v_max = np.mean([haut for _, haut in bornes])
+    return {
+        'success': True,
+        'config': {**CONDITIONS, 'coef_aero': 1.63, 'coef_roul': 1.0, **config, 'bornes_vitesse': bornes},
+        'temps_total': 260.0 - 10.0 * v_max if temps_total is None else temps_total,
+        'consommation_ml': 0.2 * v_max if consommation_ml is None else consommation_ml,
+    }
+
+def _strategies(n, graine=0):
+    rng = np.random.default_rng(graine)
+    return [[(round(float(rng.uniform(6.0, 7.5)), 3), round(float(rng.uniform(8.0, 9.0)), 3))
+             for _ in range(3)] for _ in range(n)]
+
+def test_factorisation_incrementale_egale_a_la_complete():
+    modele = ModeleSubstitution()
+    for bornes in _strategies(12):
+        assert modele.ajouter_resultat(_resultat(bornes))
+        K = modele._noyau(modele.X, modele.X) + modele.bruit * np.eye(len(modele))
+        np.testing.assert_allclose(modele.L @ modele.L.T, K, atol=1e-10)
+
+def test_prediction_proche_des_resultats_appris():
+    modele = ModeleSubstitution()
+    strategies = _strategies(20)
+    for bornes in strategies:
+        modele.ajouter_resultat(_resultat(bornes))
+    moyenne, ecart = modele.predire(strategies[:3], {'coef_aero': 1.63, 'coef_roul': 1.0})
+    attendu = [[_resultat(b)['temps_total'], _resultat(b)['consommation_ml']] for b in strategies[:3]]
+    np.testing.assert_allclose(moyenne, attendu, rtol=1e-3)
+    assert (ecart < 0.1 * np.abs(moyenne)).all()
+
+def test_tours_non_acheves_echecs_et_doublons_ignores():
+    modele = ModeleSubstitution()
+    bornes = _strategies(1)[0]
+    assert modele.ajouter_resultat(_resultat(bornes))
+    assert not modele.ajouter_resultat(_resultat(bornes))
+    assert not modele.ajouter_resultat(_resultat(_strategies(1, 1)[0], temps_total=189.0))
+    assert not modele.ajouter_resultat({**_resultat(_strategies(1, 2)[0]), 'success': False})
+    assert not modele.ajouter_resultat(_resultat([(0.0, 8.0)] * 9))
+    assert len(modele) == 1
+
+def test_un_modele_par_conditions():
+    modeles = ModelesSubstitution()
+    strategies = _strategies(4)
+    modeles.ajouter_resultat(_resultat(strategies[0]))
+    modeles.ajouter_resultat(_resultat(strategies[1], temps_max=200))
+    modeles.ajouter_resultat(_resultat(strategies[2], vent_active=True, vitesse_vent=3.0))
+    assert len(modeles) == 3
+    assert len(modeles.modeles) == 2
+    assert len(modeles.modele(CONDITIONS)) == 2
+
+def test_selection_sans_resultat_dans_ces_conditions():
+    modeles = ModelesSubstitution()
+    modeles.ajouter_resultat(_resultat(_strategies(1)[0]))
+    assert modeles.selectionner(_strategies(5), {**CONDITIONS, 'moteur_elec': False}, n=3) == [0, 1, 2]
+
+def test_archive(tmp_path):
+    modeles = ModelesSubstitution()
+    strategies = _strategies(10)
+    for bornes in strategies:
+        modeles.ajouter_resultat(_resultat(bornes))
+    modeles.ajouter_resultat(_resultat(strategies[0], moteur_elec=False))
+    chemin = tmp_path / 'substitution.npz'
+    modeles.sauvegarder(chemin)
+
+    repris = ModelesSubstitution()
+    assert repris.charger(chemin) == 11
+    assert set(repris.modeles) == set(modeles.modeles)
+    config = {'coef_aero': 1.63, 'coef_roul': 1.0}
+    for attendu, obtenu in zip(modeles.modele(CONDITIONS).predire(strategies, config),
+                               repris.modele(CONDITIONS).predire(strategies, config)):
+        np.testing.assert_allclose(obtenu, attendu, rtol=1e-10)
+    assert not repris.ajouter_resultat(_resultat(strategies[3]))
+
+def test_archive_d_autres_entrees_ignoree(tmp_path):
+    modeles = ModelesSubstitution()
+    modeles.ajouter_resultat(_resultat(_strategies(1)[0]))
+    chemin = tmp_path / 'substitution.npz'
+    modeles.sauvegarder(chemin)
+    assert ModelesSubstitution(n_phases_max=4).charger(chemin) == 0
+    assert ModelesSubstitution(cles_conditions=('distance_totale',)).charger(chemin) == 0
+
+def test_modele_vide():
+    with pytest.raises(RuntimeError):
+        ModeleSubstitution().predire(_strategies(1))
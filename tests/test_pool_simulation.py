@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Pool de simulation : tables publiées en mémoire partagée, rattachées sans
+copie, et tours simulés par les workers identiques aux tours du parent
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from conftest import CHEMIN_MODELE
+from pool_simulation import PoolSimulation, attacher_tables, publier_tables
+
+def _tables(modele, distance):
+    interp_data = modele.InterpolationData()
+    interp_data.load_from_existing_data()
+    return {enviolo: interp_data.to_tables(modele.construire_parametres(distance, enviolo_on=enviolo))
+            for enviolo in (True, False)}
+
+def _feuilles(tables):
+    """Tableaux d'un tuple nommé de tables, dans l'ordre des champs"""
+    if isinstance(tables, np.ndarray):
+        return [tables]
+    if isinstance(tables, tuple):
+        return [a for valeur in tables for a in _feuilles(valeur)]
+    return []
+
+def test_tables_rattachees_sans_copie(modele, circuit):
+    tables = _tables(modele, circuit[0])
+    bloc, publication = publier_tables(tables)
+    try:
+        autre, rattachees = attacher_tables(publication, modele)
+        for enviolo in (True, False):
+            assert type(rattachees[enviolo]) is type(tables[enviolo])
+            originales, vues = _feuilles(tables[enviolo]), _feuilles(rattachees[enviolo])
+            assert len(vues) == len(originales) > 0
+            for originale, vue in zip(originales, vues):
+                np.testing.assert_array_equal(vue, originale)
+                assert not vue.flags.writeable and vue.flags.c_contiguous
+                assert vue.dtype == originale.dtype
+                # Vue sur le bloc partagé : aucune copie propre au processus
+                assert not vue.flags.owndata
+        del rattachees, vues
+        autre.close()
+    finally:
+        bloc.close()
+        bloc.unlink()
+
+def test_tour_sur_tables_rattachees(modele, circuit):
+    distance, bornes, temps_max = circuit
+    bloc, publication = publier_tables(_tables(modele, distance))
+    try:
+        autre, rattachees = attacher_tables(publication, modele)
+        resume = modele.simuler_resume(distance, bornes, temps_max=temps_max, moteur_elec=True,
+                                       tables=rattachees[True])
+        reference = modele.simuler_resume(distance, bornes, temps_max=temps_max, moteur_elec=True)
+        assert resume['temps_total'] == reference['temps_total']
+        assert resume['ml_total'] == reference['ml_total']
+        del rattachees
+        autre.close()
+    finally:
+        bloc.close()
+        bloc.unlink()
+
+def test_pool(modele, circuit):
+    distance, bornes, temps_max = circuit
+    config = {'distance_totale': distance, 'temps_max': temps_max, 'moteur_elec': True, 'resume': True}
+    reference = modele.simuler_resume(distance, bornes, temps_max=temps_max, moteur_elec=True)
+    taches = [(bornes, config), (bornes, {**config, 'integrateur': 'inconnu'}), (bornes, config)]
+
+    with PoolSimulation(CHEMIN_MODELE, n_workers=1, graine=0, module=modele) as pool:
+        nom = pool._publication['nom']
+        resultats = {indice: (statut, valeur) for indice, statut, valeur in pool.executer(taches)}
+        assert sorted(resultats) == [0, 1, 2]
+        for indice in (0, 2):
+            statut, resume = resultats[indice]
+            assert statut == 'ok'
+            assert resume['temps_total'] == reference['temps_total']
+            assert resume['ml_total'] == reference['ml_total']
+        assert resultats[1][0] == 'erreur'
+
+        # Le pool reste utilisable après une erreur
+        assert [statut for _, statut, _ in pool.executer(taches[:1])] == ['ok']
+
+    # Bloc libéré à la fermeture
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=nom)
+    with pytest.raises(RuntimeError):
+        list(pool.executer(taches))
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Registre des courses : enregistrement, filtres, agrégats, pagination et
+télémétrie
+"""
+
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from registre_courses import SOURCE_COURSE, SOURCE_SIMULATION, RegistreCourses
+from resultat_simulation import SimulationResult
+
+def _resultat(temps_total, consommation_ml, n=20):
+    donnees = np.random.default_rng(int(temps_total)).random((2, n))
+    config = {'bornes_vitesse': [[6.5, 8.5]], 'temps_max': 189, 'moteur_elec': True}
+    return SimulationResult(donnees, {'temps_total': temps_total, 'consommation_ml': consommation_ml,
+                                      'efficacite_km_l': 1321 / consommation_ml,
+                                      'distance_finale': 1306.0}, config, ('temps', 'vitesse'))
+
+@pytest.fixture
+def registre(tmp_path):
+    registre = RegistreCourses(str(tmp_path))
+    for jour, strategie, conditions, temps in ((1, 'A', 'sec', 170.0), (2, 'A', 'vent', 175.0),
+                                               (2, 'B', 'sec', 180.0), (3, 'B', 'sec', 185.0)):
+        registre.enregistrer_simulation(_resultat(temps, temps / 100), strategie, conditions,
+                                        date=datetime(2025, 6, jour, 10), empreinte_donnees=f'e{jour % 2}',
+                                        telemetrie=jour != 3)
+    registre.enregistrer_course(date(2025, 6, 3), 'A', 'sec', 178.0, 2.0, 1321.0,
+                                telemetrie=pd.DataFrame({'temps': [0.0, 1.0], 'vitesse': [0.0, 2.5]}))
+    return registre
+
+def test_filtres(registre):
+    assert registre.compter() == 5
+    assert registre.compter(conditions=['sec']) == 4
+    assert registre.compter(strategies=['B'], conditions=['sec']) == 2
+    assert registre.compter(source=SOURCE_COURSE) == 1
+    # Fin incluse : toute la journée pour une date sans heure
+    assert registre.compter(debut=date(2025, 6, 2), fin=date(2025, 6, 2)) == 2
+    assert registre.compter(fin=datetime(2025, 6, 2, 9)) == 1
+
+def test_pagination_et_tri(registre):
+    page = registre.rechercher(limite=2, decalage=1, tri='temps_total', descendant=False)
+    assert list(page['temps_total']) == [175.0, 178.0]
+    assert list(registre.rechercher(limite=1)['date']) == ['2025-06-03T10:00:00']
+    with pytest.raises(ValueError):
+        registre.rechercher(tri='id; DROP TABLE courses')
+
+def test_agregats(registre):
+    agregats = registre.agreger('strategie', source=SOURCE_SIMULATION).set_index('strategie')
+    assert list(agregats['n']) == [2, 2]
+    assert agregats.loc['B', 'temps_moyen'] == pytest.approx(182.5)
+    assert agregats.loc['A', 'temps_min'] == 170.0
+    assert list(registre.agreger('jour')['n']) == [1, 2, 2]
+    with pytest.raises(ValueError):
+        registre.agreger('config')
+    assert registre.resume(conditions=['vent'])['temps_moyen'] == 175.0
+    assert registre.valeurs('conditions') == ['sec', 'vent']
+    assert registre.periode() == (date(2025, 6, 1), date(2025, 6, 3))
+
+def test_telemetrie(registre):
+    pytest.importorskip('pyarrow')
+    lignes = registre.rechercher(tri='temps_total', descendant=False).set_index('temps_total')
+    simulation = registre.telemetrie(lignes.loc[170.0, 'id'])
+    np.testing.assert_array_equal(simulation.donnees, _resultat(170.0, 1.7).donnees)
+    course = registre.telemetrie(lignes.loc[178.0, 'id'])
+    np.testing.assert_array_equal(course['vitesse'], [0.0, 2.5])
+    assert registre.telemetrie(lignes.loc[185.0, 'id']) is None
+    with pytest.raises(KeyError):
+        registre.telemetrie(1000)
+
+def test_resultats_simulation(registre):
+    resultats = registre.resultats_simulation()
+    assert [r['temps_total'] for r in resultats] == [170.0, 175.0, 180.0, 185.0]
+    assert resultats[0]['config']['bornes_vitesse'] == [[6.5, 8.5]]
+    assert [r['temps_total'] for r in registre.resultats_simulation('e1')] == [170.0, 185.0]
+
+def test_registre_vide(tmp_path):
+    registre = RegistreCourses(str(tmp_path))
+    assert registre.periode() == (None, None)
+    assert registre.rechercher().empty
+    assert registre.resume()['n'] == 0
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+SimulationResult : accès par clé des anciens dictionnaires, vues sans copie
+et sérialisation
+"""
+
+import pickle
+
+import numpy as np
+import pytest
+
+from resultat_simulation import CANAUX, FORCES, SimulationResult
+
+METRIQUES = {'temps_total': 175.1, 'consommation_ml': 1.845, 'distance_finale': 1306.1}
+CONFIG = {'distance_totale': 1321, 'temps_max': 189, 'moteur_elec': True}
+
+@pytest.fixture
+def resultat():
+    donnees = np.arange(len(CANAUX) * 5, dtype=np.float64).reshape(len(CANAUX), 5)
+    return SimulationResult(donnees, dict(METRIQUES), dict(CONFIG))
+
+def test_acces_comme_un_dictionnaire(resultat):
+    assert resultat['temps_total'] == METRIQUES['temps_total']
+    assert resultat['config'] is resultat.config
+    assert resultat['success'] is True
+    assert '175.1' in resultat['message']
+    np.testing.assert_array_equal(resultat['vitesse'], resultat.donnees[CANAUX.index('vitesse')])
+    np.testing.assert_allclose(resultat['vitesse_kmh'], resultat['vitesse'] * 3.6)
+    assert set(resultat['forces']) == set(FORCES)
+    np.testing.assert_array_equal(resultat['forces']['moteur'], resultat.channel('force_moteur'))
+    assert 'position' in resultat and 'inconnu' not in resultat
+    assert resultat.get('inconnu', 0) == 0
+    with pytest.raises(KeyError):
+        resultat['inconnu']
+    for cle in resultat.keys():
+        assert resultat.get(cle) is not None, cle
+
+def test_canaux_en_vues_lecture_seule(resultat):
+    vitesse = resultat.channel('vitesse')
+    assert np.shares_memory(vitesse, resultat.donnees)
+    assert not vitesse.flags.writeable
+    with pytest.raises(ValueError):
+        vitesse[0] = 1.0
+    assert np.shares_memory(resultat.to_pandas()['vitesse'].to_numpy(), resultat.donnees)
+
+def test_nombre_de_lignes_verifie():
+    with pytest.raises(ValueError):
+        SimulationResult(np.zeros((3, 5)), METRIQUES, CONFIG)
+
+def test_resume_sans_telemetrie():
+    resume = SimulationResult.resume(dict(METRIQUES), dict(CONFIG))
+    assert len(resume) == 0 and resume.nbytes == 0
+    assert resume['consommation_ml'] == METRIQUES['consommation_ml']
+    assert resume.get('vitesse_kmh') is None
+    assert resume['forces'] == {}
+
+def test_pickle(resultat):
+    resultat.channel('vitesse_kmh')
+    repris = pickle.loads(pickle.dumps(resultat))
+    np.testing.assert_array_equal(repris.donnees, resultat.donnees)
+    assert not repris.donnees.flags.writeable
+    assert repris.canaux == resultat.canaux
+    assert repris.metriques == resultat.metriques and repris.config == resultat.config
+    np.testing.assert_allclose(repris['vitesse_kmh'], resultat['vitesse_kmh'])
+
+def test_to_arrow(resultat):
+    pa = pytest.importorskip('pyarrow')
+    table = resultat.to_arrow(['temps', 'vitesse'])
+    assert table.column_names == ['temps', 'vitesse']
+    assert table.column('vitesse').type == pa.float64()
+    np.testing.assert_array_equal(table.column('vitesse').to_numpy(), resultat['vitesse'])
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+SimulateurIncremental : reprise sur les instantanés de fin de phase
+identique à une intégration complète du même programme
+"""
+
+import numpy as np
+import pytest
+
+def _simulateur(modele, circuit, **options):
+    distance, _, temps_max = circuit
+    return modele.SimulateurIncremental(distance, temps_max, moteur_elec=True, **options)
+
+def _modifier(bornes, phase, ecart=0.3):
+    bornes = [tuple(b) for b in bornes]
+    bas, haut = bornes[phase]
+    bornes[phase] = (bas, haut + ecart)
+    return bornes
+
+def _verifier_identiques(resultat, complet):
+    for obtenu, attendu in zip(resultat[:3], complet[:3]):
+        np.testing.assert_array_equal(obtenu, attendu)
+    assert resultat[3:] == complet[3:]
+
+@pytest.mark.parametrize('phase', [1, 3, 4])
+def test_reprise_identique_au_tour_complet(modele, circuit, phase):
+    bornes = circuit[1]
+    simulateur = _simulateur(modele, circuit)
+    simulateur.simuler(bornes)
+    modifiees = _modifier(bornes, phase)
+    resultat = simulateur.simuler(modifiees)
+    assert simulateur.t_repris > 0.0
+    _verifier_identiques(resultat, _simulateur(modele, circuit).simuler(modifiees))
+
+def test_identique_au_resume_hybride(modele, circuit):
+    distance, bornes, temps_max = circuit
+    simulateur = _simulateur(modele, circuit)
+    simulateur.simuler(bornes)
+    modifiees = _modifier(bornes, 3)
+    t, y, _, _, statut = simulateur.simuler(modifiees)
+    resume = modele.simuler_resume(distance, modifiees, temps_max=temps_max, integrateur='hybride',
+                                   moteur_elec=True)
+    assert statut == 0
+    assert t[-1] == resume['temps_total']
+    assert y[-1, modele.E_POSITION] == resume['distance_finale']
+
+def test_sans_phase_commune_pas_de_reprise(modele, circuit):
+    bornes = circuit[1]
+    simulateur = _simulateur(modele, circuit)
+    simulateur.simuler(bornes)
+    simulateur.simuler(_modifier(bornes, 0))
+    assert simulateur.t_repris == 0.0 and simulateur.n_integrations == 2
+
+def test_memoire_limitee(modele, circuit):
+    bornes = circuit[1]
+    simulateur = _simulateur(modele, circuit, memoire=2)
+    for ecart in (0.1, 0.2, 0.3):
+        simulateur.simuler(_modifier(bornes, 4, ecart))
+    assert len(simulateur.references) == 2
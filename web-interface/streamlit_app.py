@@ -20,6 +20,10 @@ import subprocess
 import sys
 import os
 
+# Modules du dossier simulation/ (registre des simulations et des courses)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'simulation'))
+from registre_courses import RegistreCourses
+
 # Configuration de la page
 st.set_page_config(
     page_title="Eta-One Racing",
@@ -62,6 +66,11 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_run_store():
+    """Registre des simulations et des courses, partagé par les sessions"""
+    return RegistreCourses()
+
 # Titre principal
 st.markdown('<h1 class="main-header">🏁 Eta-One Racing - Système Intégré</h1>', unsafe_allow_html=True)
 
@@ -577,178 +586,214 @@ elif page == "🔧 Optimisation":
 elif page == "📊 Analyses":
     st.header("📈 Analyses et Comparaisons")
     
-    # Comparaison de stratégies
-    st.subheader("⚖️ Comparaison de Stratégies")
-    
-    # Données simulées pour comparaison
-    strategies = ['Économie', 'Normal', 'Attaque', 'Optimisé']
-    temps_data = [195.2, 185.3, 178.9, 182.1]
-    conso_data = [38.5, 42.5, 48.2, 40.1]
-    efficacite_data = [425.8, 387.2, 341.5, 410.3]
-    
-    df_comparison = pd.DataFrame({
-        'Stratégie': strategies,
-        'Temps (s)': temps_data,
-        'Consommation (ml)': conso_data,
-        'Efficacité (km/l)': efficacite_data
-    })
+    # Registre des simulations et des courses : les filtres sont des requêtes
+    # indexées, agrégées et paginées par sqlite
+    registre = get_run_store()
+    debut_registre, fin_registre = registre.periode()
     
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        # Graphique radar
-        fig_radar = go.Figure()
-        
-        # Normalisation des données pour le radar
-        temps_norm = [(200-t)/200*100 for t in temps_data]  # Plus c'est bas, mieux c'est
-        conso_norm = [(60-c)/60*100 for c in conso_data]    # Plus c'est bas, mieux c'est
-        efficacite_norm = [e/max(efficacite_data)*100 for e in efficacite_data]  # Plus c'est haut, mieux c'est
-        
-        for i, strategy in enumerate(strategies):
-            fig_radar.add_trace(go.Scatterpolar(
-                r=[temps_norm[i], conso_norm[i], efficacite_norm[i]],
-                theta=['Rapidité', 'Économie', 'Efficacité'],
-                fill='toself',
-                name=strategy
-            ))
+    if debut_registre is None:
+        st.info("Aucune simulation ni course enregistrée : les simulations lancées par le wrapper "
+                "et les courses réelles du registre apparaîtront ici.")
+    else:
+        # Filtrages
+        st.subheader("🔎 Filtres")
+        col_f1, col_f2, col_f3, col_f4 = st.columns(4)
+        with col_f1:
+            conditions_disponibles = registre.valeurs('conditions')
+            condition_filter = st.multiselect("Filtrer par conditions",
+                                             conditions_disponibles,
+                                             default=conditions_disponibles)
+        with col_f2:
+            strategies_disponibles = registre.valeurs('strategie')
+            strategy_filter = st.multiselect("Filtrer par stratégie",
+                                            strategies_disponibles,
+                                            default=strategies_disponibles)
+        with col_f3:
+            date_range = st.date_input("Période",
+                                      value=(debut_registre, fin_registre),
+                                      min_value=debut_registre,
+                                      max_value=fin_registre)
+        with col_f4:
+            source_filter = st.selectbox("Source", ["Toutes", "Simulations", "Courses réelles"])
+        
+        filtres = {
+            'conditions': condition_filter,
+            'strategies': strategy_filter,
+            'debut': date_range[0],
+            'fin': date_range[-1],
+            'source': {'Simulations': 'simulation', 'Courses réelles': 'course'}.get(source_filter)
+        }
         
-        fig_radar.update_layout(
-            polar=dict(
-                radialaxis=dict(
-                    visible=True,
-                    range=[0, 100]
-                )),
-            showlegend=True,
-            title="Comparaison Multi-Critères"
-        )
+        # Comparaison de stratégies
+        st.markdown("---")
+        st.subheader("⚖️ Comparaison de Stratégies")
         
-        st.plotly_chart(fig_radar, use_container_width=True)
-    
-    with col2:
-        # Tableau de comparaison
-        st.dataframe(df_comparison, use_container_width=True)
+        df_comparison = registre.agreger('strategie', **filtres)
+        df_comparison = df_comparison.sort_values('efficacite_moyenne', ascending=False).head(8)
+        
+        col1, col2 = st.columns(2)
         
-        # Recommandation
+        with col1:
+            # Graphique radar
+            fig_radar = go.Figure()
+            
+            # Normalisation des données pour le radar
+            temps_data = df_comparison['temps_moyen'].tolist()
+            conso_data = df_comparison['consommation_moyenne'].tolist()
+            efficacite_data = df_comparison['efficacite_moyenne'].tolist()
+            temps_norm = [(200-t)/200*100 for t in temps_data]  # Plus c'est bas, mieux c'est
+            conso_norm = [(60-c)/60*100 for c in conso_data]    # Plus c'est bas, mieux c'est
+            efficacite_norm = [e/max(efficacite_data)*100 for e in efficacite_data] if efficacite_data else []  # Plus c'est haut, mieux c'est
+            
+            for i, strategy in enumerate(df_comparison['strategie']):
+                fig_radar.add_trace(go.Scatterpolar(
+                    r=[temps_norm[i], conso_norm[i], efficacite_norm[i]],
+                    theta=['Rapidité', 'Économie', 'Efficacité'],
+                    fill='toself',
+                    name=strategy
+                ))
+            
+            fig_radar.update_layout(
+                polar=dict(
+                    radialaxis=dict(
+                        visible=True,
+                        range=[0, 100]
+                    )),
+                showlegend=True,
+                title="Comparaison Multi-Critères"
+            )
+            
+            st.plotly_chart(fig_radar, use_container_width=True)
+        
+        with col2:
+            # Tableau de comparaison
+            df_display_comparison = df_comparison[['strategie', 'n', 'temps_moyen', 'consommation_moyenne',
+                                                   'efficacite_moyenne']].rename(columns={
+                'strategie': 'Stratégie',
+                'n': 'Nb',
+                'temps_moyen': 'Temps (s)',
+                'consommation_moyenne': 'Consommation (ml)',
+                'efficacite_moyenne': 'Efficacité (km/l)'
+            }).round(1)
+            st.dataframe(df_display_comparison, use_container_width=True)
+            
+            # Recommandation
+            st.markdown("---")
+            st.subheader("🎯 Recommandation")
+            
+            if len(df_display_comparison):
+                best_overall = df_display_comparison.iloc[0]
+                st.success(f"✅ **Stratégie recommandée: {best_overall['Stratégie']}**")
+                st.info(f"Temps: {best_overall['Temps (s)']}s | Consommation: {best_overall['Consommation (ml)']}ml | Efficacité: {best_overall['Efficacité (km/l)']}km/l")
+        
+        # Historique des courses
         st.markdown("---")
-        st.subheader("🎯 Recommandation")
+        st.subheader("📜 Historique des Courses")
+        
+        # Moyennes par jour et par conditions, calculées par sqlite
+        df_jours = registre.agreger('jour', **filtres)
+        df_conditions = registre.agreger('conditions', **filtres)
+        
+        # Graphique d'évolution temporelle
+        fig_evolution = make_subplots(
+            rows=2, cols=2,
+            subplot_titles=('Évolution du Temps', 'Évolution de la Consommation', 
+                           'Évolution de l\'Efficacité', 'Performance par Conditions'),
+            specs=[[{"secondary_y": False}, {"secondary_y": False}],
+                   [{"secondary_y": False}, {"secondary_y": False}]]
+        )
         
-        best_overall = df_comparison.loc[df_comparison['Efficacité (km/l)'].idxmax()]
-        st.success(f"✅ **Stratégie recommandée: {best_overall['Stratégie']}**")
-        st.info(f"Temps: {best_overall['Temps (s)']}s | Consommation: {best_overall['Consommation (ml)']}ml | Efficacité: {best_overall['Efficacité (km/l)']}km/l")
-    
-    # Historique des courses
-    st.markdown("---")
-    st.subheader("📜 Historique des Courses")
-    
-    # Données d'historique simulées
-    dates = pd.date_range('2025-01-01', periods=20, freq='W')
-    historique_data = {
-        'Date': dates,
-        'Temps (s)': np.random.normal(185, 8, 20),
-        'Consommation (ml)': np.random.normal(43, 4, 20),
-        'Conditions': np.random.choice(['Sec', 'Humide', 'Venteux'], 20),
-        'Stratégie': np.random.choice(['Économie', 'Normal', 'Attaque'], 20)
-    }
-    
-    df_historique = pd.DataFrame(historique_data)
-    df_historique['Efficacité (km/l)'] = 16500 / df_historique['Consommation (ml)']
-    
-    # Graphique d'évolution temporelle
-    fig_evolution = make_subplots(
-        rows=2, cols=2,
-        subplot_titles=('Évolution du Temps', 'Évolution de la Consommation', 
-                       'Évolution de l\'Efficacité', 'Performance par Conditions'),
-        specs=[[{"secondary_y": False}, {"secondary_y": False}],
-               [{"secondary_y": False}, {"type": "box"}]]
-    )
-    
-    # Temps
-    fig_evolution.add_trace(
-        go.Scatter(x=df_historique['Date'], y=df_historique['Temps (s)'],
-                  mode='lines+markers', name='Temps', line=dict(color='blue')),
-        row=1, col=1
-    )
-    
-    # Consommation
-    fig_evolution.add_trace(
-        go.Scatter(x=df_historique['Date'], y=df_historique['Consommation (ml)'],
-                  mode='lines+markers', name='Consommation', line=dict(color='red')),
-        row=1, col=2
-    )
-    
-    # Efficacité
-    fig_evolution.add_trace(
-        go.Scatter(x=df_historique['Date'], y=df_historique['Efficacité (km/l)'],
-                  mode='lines+markers', name='Efficacité', line=dict(color='green')),
-        row=2, col=1
-    )
-    
-    # Box plot par conditions
-    for condition in df_historique['Conditions'].unique():
-        data_condition = df_historique[df_historique['Conditions'] == condition]
+        # Temps
+        fig_evolution.add_trace(
+            go.Scatter(x=df_jours['jour'], y=df_jours['temps_moyen'],
+                      mode='lines+markers', name='Temps', line=dict(color='blue')),
+            row=1, col=1
+        )
+        
+        # Consommation
+        fig_evolution.add_trace(
+            go.Scatter(x=df_jours['jour'], y=df_jours['consommation_moyenne'],
+                      mode='lines+markers', name='Consommation', line=dict(color='red')),
+            row=1, col=2
+        )
+        
+        # Efficacité
+        fig_evolution.add_trace(
+            go.Scatter(x=df_jours['jour'], y=df_jours['efficacite_moyenne'],
+                      mode='lines+markers', name='Efficacité', line=dict(color='green')),
+            row=2, col=1
+        )
+        
+        # Efficacité moyenne et extrêmes par conditions
         fig_evolution.add_trace(
-            go.Box(y=data_condition['Efficacité (km/l)'], name=condition),
+            go.Bar(x=df_conditions['conditions'], y=df_conditions['efficacite_moyenne'],
+                   error_y=dict(type='data', symmetric=False,
+                                array=df_conditions['efficacite_max'] - df_conditions['efficacite_moyenne'],
+                                arrayminus=df_conditions['efficacite_moyenne'] - df_conditions['efficacite_min'])),
             row=2, col=2
         )
-    
-    fig_evolution.update_layout(
-        height=600,
-        title_text="Historique des Performances",
-        showlegend=False
-    )
-    
-    st.plotly_chart(fig_evolution, use_container_width=True)
-    
-    # Tableau détaillé de l'historique
-    st.subheader("📋 Détail des Courses")
-    
-    # Filtrages
-    col_f1, col_f2, col_f3 = st.columns(3)
-    with col_f1:
-        condition_filter = st.multiselect("Filtrer par conditions", 
-                                         df_historique['Conditions'].unique(),
-                                         default=df_historique['Conditions'].unique())
-    with col_f2:
-        strategy_filter = st.multiselect("Filtrer par stratégie",
-                                        df_historique['Stratégie'].unique(),
-                                        default=df_historique['Stratégie'].unique())
-    with col_f3:
-        date_range = st.date_input("Période", 
-                                  value=(df_historique['Date'].min().date(), 
-                                        df_historique['Date'].max().date()),
-                                  min_value=df_historique['Date'].min().date(),
-                                  max_value=df_historique['Date'].max().date())
-    
-    # Application des filtres
-    df_filtered = df_historique[
-        (df_historique['Conditions'].isin(condition_filter)) &
-        (df_historique['Stratégie'].isin(strategy_filter)) &
-        (df_historique['Date'].dt.date >= date_range[0]) &
-        (df_historique['Date'].dt.date <= date_range[1])
-    ]
-    
-    # Formatage pour l'affichage
-    df_display = df_filtered.copy()
-    df_display['Date'] = df_display['Date'].dt.strftime('%Y-%m-%d')
-    df_display['Temps (s)'] = df_display['Temps (s)'].round(1)
-    df_display['Consommation (ml)'] = df_display['Consommation (ml)'].round(1)
-    df_display['Efficacité (km/l)'] = df_display['Efficacité (km/l)'].round(1)
-    
-    st.dataframe(df_display, use_container_width=True)
-    
-    # Statistiques résumées
-    col_s1, col_s2, col_s3, col_s4 = st.columns(4)
-    with col_s1:
-        st.metric("🏃 Temps Moyen", f"{df_filtered['Temps (s)'].mean():.1f}s",
-                 f"{df_filtered['Temps (s)'].mean() - df_historique['Temps (s)'].mean():.1f}s")
-    with col_s2:
-        st.metric("⛽ Conso Moyenne", f"{df_filtered['Consommation (ml)'].mean():.1f}ml",
-                 f"{df_filtered['Consommation (ml)'].mean() - df_historique['Consommation (ml)'].mean():.1f}ml")
-    with col_s3:
-        st.metric("📈 Efficacité Moy", f"{df_filtered['Efficacité (km/l)'].mean():.1f}km/l",
-                 f"{df_filtered['Efficacité (km/l)'].mean() - df_historique['Efficacité (km/l)'].mean():.1f}km/l")
-    with col_s4:
-        st.metric("📊 Nb Courses", len(df_filtered), f"{len(df_filtered) - len(df_historique)}")
+        
+        fig_evolution.update_layout(
+            height=600,
+            title_text="Historique des Performances",
+            showlegend=False
+        )
+        
+        st.plotly_chart(fig_evolution, use_container_width=True)
+        
+        # Tableau détaillé de l'historique, une page à la fois
+        st.subheader("📋 Détail des Courses")
+        
+        n_filtered = registre.compter(**filtres)
+        taille_page = 50
+        n_pages = max(1, (n_filtered + taille_page - 1) // taille_page)
+        col_p1, col_p2 = st.columns([1, 3])
+        with col_p1:
+            page_table = st.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1)
+        with col_p2:
+            tri = st.selectbox("Trier par", ['date', 'efficacite_km_l', 'temps_total', 'consommation_ml'])
+        
+        df_display = registre.rechercher(limite=taille_page, decalage=(page_table - 1) * taille_page,
+                                         tri=tri, descendant=(tri != 'consommation_ml' and tri != 'temps_total'),
+                                         **filtres)
+        df_display = df_display.rename(columns={
+            'date': 'Date',
+            'source': 'Source',
+            'strategie': 'Stratégie',
+            'conditions': 'Conditions',
+            'temps_total': 'Temps (s)',
+            'consommation_ml': 'Consommation (ml)',
+            'efficacite_km_l': 'Efficacité (km/l)',
+            'distance': 'Distance (m)'
+        }).set_index('id')
+        df_display['Temps (s)'] = df_display['Temps (s)'].round(1)
+        df_display['Consommation (ml)'] = df_display['Consommation (ml)'].round(1)
+        df_display['Efficacité (km/l)'] = df_display['Efficacité (km/l)'].round(1)
+        
+        st.dataframe(df_display, use_container_width=True)
+        st.caption(f"{n_filtered} lignes, page {page_table}/{n_pages}")
+        
+        # Statistiques résumées (filtrées et sur tout le registre)
+        resume_filtre = registre.resume(**filtres)
+        resume_total = registre.resume()
+        
+        def _ecart(cle):
+            if resume_filtre[cle] is None:
+                return 0.0
+            return resume_filtre[cle] - resume_total[cle]
+        
+        col_s1, col_s2, col_s3, col_s4 = st.columns(4)
+        with col_s1:
+            st.metric("🏃 Temps Moyen", f"{resume_filtre['temps_moyen'] or 0:.1f}s",
+                     f"{_ecart('temps_moyen'):.1f}s")
+        with col_s2:
+            st.metric("⛽ Conso Moyenne", f"{resume_filtre['consommation_moyenne'] or 0:.1f}ml",
+                     f"{_ecart('consommation_moyenne'):.1f}ml")
+        with col_s3:
+            st.metric("📈 Efficacité Moy", f"{resume_filtre['efficacite_moyenne'] or 0:.1f}km/l",
+                     f"{_ecart('efficacite_moyenne'):.1f}km/l")
+        with col_s4:
+            st.metric("📊 Nb Courses", resume_filtre['n'], f"{resume_filtre['n'] - resume_total['n']}")
 
 # =============================================================================
 # FOOTER ET FONCTIONS UTILITAIRES